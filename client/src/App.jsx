@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import Header from './components/Header';
 import ChatArea from './components/ChatArea';
 import UploadModal from './components/UploadModal';
-import { checkHealth, getStatus, uploadPDF, sendChatMessage, resetSystem } from './api';
+import { checkHealth, getStatus, uploadPDF, streamChatMessage, resetSystem } from './api';
 import './index.css';
 
 function App() {
@@ -240,12 +240,20 @@ function App() {
         throw new Error('Server is not responding properly');
       }
 
-      const response = await sendChatMessage(message);
+      let started = false;
+      const showPartial = (content) => {
+        if (!started) {
+          started = true;
+          setIsLoading(false);
+          setMessages((prev) => [...prev, { role: 'assistant', content, timestamp: new Date() }]);
+        } else {
+          setMessages((prev) => [...prev.slice(0, -1), { ...prev[prev.length - 1], content }]);
+        }
+      };
+
+      const response = await streamChatMessage(message, showPartial);
       if (response.status === 'success') {
-        setMessages((prev) => [
-          ...prev,
-          { role: 'assistant', content: response.response, timestamp: new Date() },
-        ]);
+        showPartial(response.response);
       } else {
         throw new Error(response.error || 'Failed to get response from server');
       }
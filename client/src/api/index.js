@@ -1,5 +1,15 @@
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'https://ai-planet-qbtv.onrender.com';
 
+// One chat session per browser tab so conversations don't mix on the server
+const getSessionId = () => {
+  let sessionId = sessionStorage.getItem('chatSessionId');
+  if (!sessionId) {
+    sessionId = crypto.randomUUID();
+    sessionStorage.setItem('chatSessionId', sessionId);
+  }
+  return sessionId;
+};
+
 export const checkHealth = async () => {
   try {
     const response = await fetch(`${API_BASE_URL}/health`);
@@ -40,6 +50,26 @@ export const getStatus = async () => {
   }
 };
 
+export const getJob = async (jobId) => {
+  const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Failed to get job status');
+  }
+
+  return await response.json();
+};
+
+const waitForJob = async (jobId, intervalMs = 1000) => {
+  for (;;) {
+    const job = await getJob(jobId);
+    if (job.status === 'completed') return job;
+    if (job.status === 'failed') throw new Error(job.error || 'Failed to process PDF');
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 export const uploadPDF = async (file) => {
   try {
     const formData = new FormData();
@@ -55,7 +85,11 @@ export const uploadPDF = async (file) => {
       throw new Error(error.detail || 'Failed to upload PDF');
     }
 
-    return await response.json();
+    const result = await response.json();
+    if (result.job_id) {
+      await waitForJob(result.job_id);
+    }
+    return { ...result, status: 'success' };
   } catch (error) {
     console.error('Upload failed:', error);
     throw error;
@@ -69,7 +103,7 @@ export const sendChatMessage = async (message) => {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ message }),
+      body: JSON.stringify({ message, session_id: getSessionId() }),
     });
 
     if (!response.ok) {
@@ -84,6 +118,50 @@ export const sendChatMessage = async (message) => {
   }
 };
 
+// Streams the answer over Server-Sent Events, calling onToken with the text so far
+export const streamChatMessage = async (message, onToken) => {
+  const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ message, session_id: getSessionId() }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Failed to send message');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? 'null');
+      if (event === 'token') {
+        answer += data;
+        onToken(answer);
+      } else if (event === 'done') {
+        return { status: 'success', response: data.answer, sources: data.sources };
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'Failed to generate response');
+      }
+    }
+  }
+
+  return { status: 'success', response: answer, sources: [] };
+};
+
 export const resetSystem = async () => {
   try {
     const response = await fetch(`${API_BASE_URL}/reset`, {
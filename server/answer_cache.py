@@ -0,0 +1,177 @@
+from typing_extensions import Any, Dict, List, Optional, Sequence, Tuple
+
+from collections import OrderedDict
+import hashlib
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+
+def history_digest(messages: Sequence[Any]) -> str:
+    """
+    Digest of the conversation a question is asked in; "" for a first turn.
+
+    Answers depend on the history as well as the question ("what about the
+    second one?"), so it is part of every cache key.
+    """
+    if not messages:
+        return ""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(f"{message.type}\0{message.content}\0".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class AnswerCache:
+    """
+    A TTL/LRU cache of generated answers keyed by corpus version, conversation
+    history (see :func:`history_digest`) and question.
+
+    Lookups match the normalised question exactly and, when a
+    ``similarity_threshold`` is configured, fall back to the cached question
+    whose embedding is most similar, as long as it clears the threshold.
+    Entries from older corpus versions or other histories are never returned.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: Optional[float] = None
+    ):
+        """
+        Args:
+            max_entries (int): Maximum number of cached answers
+            ttl_seconds (float): Lifetime of a cached answer
+            similarity_threshold (Optional[float]): Minimum cosine similarity for
+                a near-duplicate question to count as a hit; exact matching only
+                when None
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # (corpus_version, history digest, normalised question) -> (expires_at, value, embedding)
+        self._entries: "OrderedDict[Tuple[int, str, str], Tuple[float, Dict[str, Any], Optional[np.ndarray]]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[Tuple[int, str, str]] = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None
+
+    def get(
+        self,
+        corpus_version: int,
+        question: str,
+        embedding: Optional[List[float]] = None,
+        history: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached answer.
+
+        Args:
+            corpus_version (int): Version of the document set the answer must match
+            question (str): The question asked
+            embedding (Optional[List[float]]): Question embedding for
+                near-duplicate matching
+            history (str): :func:`history_digest` of the conversation so far
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached value, or None on a miss
+        """
+        key = (corpus_version, history, normalize_question(question))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry[1]
+
+            if self.semantic and embedding is not None:
+                match = self._nearest(corpus_version, history, embedding, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match][1]
+
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        corpus_version: int,
+        question: str,
+        value: Dict[str, Any],
+        embedding: Optional[List[float]] = None,
+        history: str = ""
+    ) -> None:
+        """Cache an answer for a question under the given corpus version and history digest."""
+        key = (corpus_version, history, normalize_question(question))
+        vector = None
+        if self.semantic and embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the hit rate."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _nearest(
+        self, corpus_version: int, history: str, embedding: List[float], now: float
+    ) -> Optional[Tuple[int, str, str]]:
+        if self._matrix is None:
+            self._matrix_keys = [key for key, entry in self._entries.items() if entry[2] is not None]
+            self._matrix = (
+                np.stack([self._entries[key][2] for key in self._matrix_keys])
+                if self._matrix_keys else np.empty((0, 0), dtype=np.float32)
+            )
+        if len(self._matrix_keys) == 0:
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self._matrix @ query
+        for index in np.argsort(-scores):
+            if scores[index] < self.similarity_threshold:
+                break
+            key = self._matrix_keys[index]
+            entry = self._entries.get(key)
+            if key[0] == corpus_version and key[1] == history and entry is not None and entry[0] > now:
+                return key
+        return None
@@ -1,4 +1,13 @@
+import os
+
+# Only /tmp is writable on Vercel; the index and embedding cache survive
+# for as long as the function instance stays warm
+os.environ.setdefault("VECTOR_INDEX_DIR", "/tmp/index")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "/tmp/cache/embeddings.sqlite")
+# Build the agent on the first RAG request instead of during every cold start
+os.environ.setdefault("WARM_START", "false")
+
 from main import app
 
 # This is the Vercel serverless function handler
-handler = app 
\ No newline at end of file
+handler = app
@@ -0,0 +1,192 @@
+"""
+Throughput of ``POST /chat/batch`` against answering the same questions one
+request at a time through ``/chat``.
+
+The app runs under uvicorn against the local stub OpenAI server, with a fresh
+PDF directory, index and embedding cache, and ``--documents`` synthetic PDFs
+are indexed first. Then ``--questions`` distinct questions are answered by:
+
+    sequential -- one ``/chat`` request after another, each in its own
+                  session, as a client looping over a question list would
+    concurrent -- the same, from ``--concurrency`` clients at once
+    batch      -- a single ``/chat/batch`` request with ``max_concurrency``
+                  set to ``--concurrency``, its NDJSON lines read as they
+                  arrive
+
+Each mode runs on a fresh server so the answer cache cannot serve one mode
+from another's answers. The report has wall time, questions per second,
+the time to the first and last answer, per-question latency for the
+per-request modes, and the upstream requests the stub counted, which shows
+the batch embedding all its questions in a few requests.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_chat_batch --questions 500 --concurrency 8
+    python -m benchmarks.bench_chat_batch --chat-latency 0.2 --server-env RETRIEVAL_MODE=dense --output batch.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from typing import List
+
+import httpx
+import numpy as np
+
+from benchmarks.bench_e2e import Server, _git_commit, _latency_summary, run_uploads
+from benchmarks.stub_openai import running_stub
+from benchmarks.synthetic_pdf import WORDS, write_synthetic_pdf
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    return [f"Question {i}: what does the report say about " + " ".join(rng.choice(WORDS, 4)) + "?" for i in range(count)]
+
+
+async def _stub_counters(base_url: str) -> dict:
+    async with httpx.AsyncClient(timeout=30) as client:
+        return (await client.get(base_url[:-len("/v1")] + "/stats")).json()
+
+
+async def run_per_request(client: httpx.AsyncClient, questions: List[str], concurrency: int) -> dict:
+    """Answer ``questions`` through ``/chat`` from ``concurrency`` clients, each taking the next question."""
+    latencies: List[float] = []
+    finished: List[float] = []
+    errors = 0
+    remaining = iter(enumerate(questions))
+    started = time.perf_counter()
+
+    async def chat_client():
+        nonlocal errors
+        for i, question in remaining:
+            request_started = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={"message": question, "session_id": f"batch-bench-{i}"})
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - request_started)
+                finished.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(chat_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "answered": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "questions_per_second": round(len(latencies) / elapsed, 2),
+        "first_answer_seconds": round(min(finished), 3) if finished else None,
+        "latency": _latency_summary(latencies),
+    }
+
+
+async def run_batch(client: httpx.AsyncClient, questions: List[str], concurrency: int) -> dict:
+    """Answer ``questions`` with one ``/chat/batch`` request, timing each NDJSON line as it arrives."""
+    finished: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    payload = {"questions": questions, "max_concurrency": concurrency}
+    async with client.stream("POST", "/chat/batch", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if json.loads(line)["status"] == "success":
+                finished.append(time.perf_counter() - started)
+            else:
+                errors += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "answered": len(finished),
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "questions_per_second": round(len(finished) / elapsed, 2),
+        "first_answer_seconds": round(finished[0], 3) if finished else None,
+    }
+
+
+async def run_mode(mode: str, server: Server, base_url: str, pdf_paths: List[str], questions: List[str], args) -> dict:
+    await asyncio.to_thread(server.wait_ready)
+    async with httpx.AsyncClient(base_url=server.url, timeout=3600) as client:
+        upload = await run_uploads(client, pdf_paths, args.upload_concurrency)
+        before = await _stub_counters(base_url)
+        if mode == "batch":
+            result = await run_batch(client, questions, args.concurrency)
+        else:
+            result = await run_per_request(client, questions, 1 if mode == "sequential" else args.concurrency)
+        after = await _stub_counters(base_url)
+        status = (await client.get("/status")).json()
+    return {
+        "mode": mode,
+        **result,
+        "upstream": {name: after[name] - before.get(name, 0) for name in after},
+        "chunks_indexed": status.get("chunks_indexed"),
+        "upload_seconds": upload.get("seconds"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="uvicorn application to benchmark")
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8, help="clients, or the batch's max_concurrency")
+    parser.add_argument("--modes", nargs="+", default=["sequential", "concurrent", "batch"])
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--chat-latency", type=float, default=0.05)
+    parser.add_argument(
+        "--server-env", nargs="*", default=[], metavar="NAME=VALUE",
+        help="extra environment for the server, e.g. RETRIEVAL_MODE=dense"
+    )
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    server_env.setdefault("BATCH_MAX_CONCURRENCY", str(args.concurrency))
+    questions = make_questions(args.questions)
+    runs = []
+    with tempfile.TemporaryDirectory() as source_dir:
+        pdf_paths = [
+            write_synthetic_pdf(os.path.join(source_dir, f"batch-{i:04d}.pdf"), pages=args.pages, seed=i)
+            for i in range(args.documents)
+        ]
+        with running_stub(embedding_latency=args.embedding_latency, chat_latency=args.chat_latency) as base_url:
+            for mode in args.modes:
+                with tempfile.TemporaryDirectory() as workdir:
+                    server = Server(args.app, base_url, workdir, server_env)
+                    try:
+                        runs.append(asyncio.run(run_mode(mode, server, base_url, pdf_paths, questions, args)))
+                    finally:
+                        server.stop()
+                print(f"{mode}: {runs[-1]['questions_per_second']} questions/s", flush=True)
+
+    sequential = next((run for run in runs if run["mode"] == "sequential"), None)
+    for run in runs:
+        if sequential and sequential["questions_per_second"]:
+            run["speedup_vs_sequential"] = round(run["questions_per_second"] / sequential["questions_per_second"], 2)
+
+    report = {
+        "benchmark": "chat_batch",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
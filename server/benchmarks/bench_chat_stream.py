@@ -0,0 +1,68 @@
+"""
+Compare time-to-first-byte of the blocking ``ask`` path with the streaming
+``astream_ask`` path for answers of different lengths.
+
+Uses fake embeddings and a fake chat model that emits tokens with a fixed
+delay, so the only variable is answer length. The answer, retrieval and
+query embedding caches are turned off, so neither path is served from a
+cache filled by the other.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_chat_stream --lengths 10 100 500 --token-delay 0.01
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.fakes import FakeStreamingChatModel
+
+CV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pdfs", "Akshay_Fullstack_AI_CV.pdf")
+
+
+async def measure(agent, question: str) -> dict:
+    started = time.perf_counter()
+    agent.ask(f"{question} (blocking)", session_id="blocking")
+    blocking = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_token = None
+    async for event in agent.astream_ask(f"{question} (streaming)", session_id="streaming"):
+        if first_token is None and event["event"] == "token":
+            first_token = time.perf_counter() - started
+    streaming_total = time.perf_counter() - started
+
+    return {
+        "blocking_ttfb_ms": round(blocking * 1000, 1),
+        "streaming_ttfb_ms": round(first_token * 1000, 1),
+        "streaming_total_ms": round(streaming_total * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    # Every call must generate its answer; a cache hit would skip the model
+    for name in ("ANSWER_CACHE_SIZE", "RETRIEVAL_CACHE_SIZE", "QUERY_EMBEDDING_CACHE_SIZE"):
+        os.environ[name] = "0"
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from my_rag import MyRAGAgent
+
+    agent = MyRAGAgent(openai_api_key="sk-benchmark", embeddings=DeterministicFakeEmbedding(size=256))
+    agent.load_documents([CV_PATH])
+
+    results = []
+    for length in args.lengths:
+        agent.llm = FakeStreamingChatModel(answer_tokens=length, token_delay=args.token_delay)
+        question = f"What projects are listed? [{length} tokens]"
+        results.append({"answer_tokens": length, **asyncio.run(measure(agent, question))})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
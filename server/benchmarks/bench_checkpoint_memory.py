@@ -0,0 +1,75 @@
+"""
+Measure memory growth per chat turn for each checkpointer mode.
+
+Runs a number of turns through ``MyRAGAgent.ask`` with fake embeddings and a
+fake chat model and reports traced Python memory growth per turn after a
+warm-up, with the answer and retrieval caches turned off so only the
+checkpointer and chat history grow. Bounded modes should stay flat; the
+legacy "memory" mode grows with every turn because each checkpoint keeps the
+retrieved context documents.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_checkpoint_memory --turns 200
+"""
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from itertools import cycle
+
+from checkpointing import CHECKPOINT_MODES
+
+CV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pdfs", "Akshay_Fullstack_AI_CV.pdf")
+
+
+def run(mode: str, turns: int, warmup: int, sessions: int) -> dict:
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from my_rag import MyRAGAgent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["CHECKPOINT_MODE"] = mode
+        os.environ["CHECKPOINT_ARCHIVE_PATH"] = os.path.join(tmp, "checkpoints.sqlite")
+        # The answer and retrieval caches grow with every new question too
+        for name in ("ANSWER_CACHE_SIZE", "RETRIEVAL_CACHE_SIZE", "QUERY_EMBEDDING_CACHE_SIZE"):
+            os.environ[name] = "0"
+        agent = MyRAGAgent(
+            openai_api_key="sk-benchmark",
+            embeddings=DeterministicFakeEmbedding(size=256)
+        )
+        agent.llm = GenericFakeChatModel(messages=cycle([AIMessage(content="answer " * 100)]))
+        agent.load_documents([CV_PATH])
+
+        for turn in range(warmup):
+            agent.ask(f"warm-up question {turn}", session_id=f"session-{turn % sessions}")
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        for turn in range(turns):
+            agent.ask(f"question {turn}", session_id=f"session-{turn % sessions}")
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "mode": mode,
+            "turns": turns,
+            "bytes_per_turn": round((after - before) / turns),
+            "checkpoints": agent.get_checkpoint_stats(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=list(CHECKPOINT_MODES), choices=CHECKPOINT_MODES)
+    args = parser.parse_args()
+
+    print(json.dumps([run(mode, args.turns, args.warmup, args.sessions) for mode in args.modes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
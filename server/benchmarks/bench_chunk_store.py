@@ -0,0 +1,190 @@
+"""
+Compare the footprint of chunk storage in the version 1 store format (one
+JSON record per chunk, metadata and overlapping text repeated) with the
+compact format (row table, shared-overlap text buffer, interned metadata).
+
+Chunks are split from synthetic pages exactly as ingestion splits them and
+carry the metadata PyPDFLoader attaches to every page. Vectors are the same
+in both formats and are left out of the comparison. The report covers:
+
+    bytes per chunk     -- size of the chunk files, which is what the page
+                           cache holds once they are hot
+    materialised heap   -- Python heap for holding every chunk as a Document,
+                           as an in-memory store would
+    open heap           -- Python heap of an opened compact store (the
+                           interned metadata; everything else is mapped)
+    full scan           -- reading every chunk text, as the lexical index does
+                           on startup
+    top-k reads         -- materialising 4 random chunks, as a query does
+    migration           -- converting the version 1 files in place
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_chunk_store --chunks 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.synthetic_pdf import WORDS
+
+DIM = 8
+LEGACY_FILES = ("records.jsonl", "offsets.i64")
+COMPACT_FILES = ("rows.bin", "texts.bin", "ids.bin", "metadata.jsonl")
+
+
+class _NoEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+
+def build_chunks(count: int, pages_per_document: int = 200, seed: int = 0):
+    """Split synthetic pages with PyPDFLoader-style metadata until ``count`` chunks exist."""
+    from my_rag import _make_text_splitter
+
+    rng = random.Random(seed)
+    splitter = _make_text_splitter(1000, 200)
+    chunks = []
+    page_number = 0
+    while len(chunks) < count:
+        document, page = divmod(page_number, pages_per_document)
+        text = "\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))) for _ in range(45))
+        metadata = {
+            "producer": "Microsoft® Word for Microsoft 365",
+            "creator": "Microsoft® Word for Microsoft 365",
+            "creationdate": "2024-03-18T10:21:44+00:00",
+            "author": "Research Team",
+            "moddate": "2024-03-18T10:21:44+00:00",
+            "source": f"/app/server/pdfs/quarterly-report-{document:04d}.pdf",
+            "total_pages": pages_per_document,
+            "page": page,
+            "page_label": str(page + 1),
+        }
+        chunks.extend(splitter.split_documents([Document(page_content=text, metadata=metadata)]))
+        page_number += 1
+    return chunks[:count]
+
+
+def write_legacy_store(path: str, chunks) -> None:
+    """Write ``chunks`` in the version 1 format, as the store used to."""
+    os.makedirs(path, exist_ok=True)
+    offsets = np.empty((len(chunks), 2), dtype=np.int64)
+    with open(os.path.join(path, "records.jsonl"), "wb") as f:
+        for i, chunk in enumerate(chunks):
+            record = {"id": f"{i:032x}", "text": chunk.page_content, "metadata": chunk.metadata}
+            line = json.dumps(record).encode("utf-8") + b"\n"
+            offsets[i] = (f.tell(), len(line))
+            f.write(line)
+    offsets.tofile(os.path.join(path, "offsets.i64"))
+    np.zeros((len(chunks), DIM), dtype=np.float32).tofile(os.path.join(path, "vectors.f32"))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"dim": DIM, "version": 1}, f)
+
+
+def _size(path: str, names) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in names if os.path.exists(os.path.join(path, name)))
+
+
+def _traced(fn):
+    """Run ``fn`` and return its result and the Python heap it left allocated."""
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def legacy_documents(path: str):
+    with open(os.path.join(path, "records.jsonl"), "rb") as f:
+        return [
+            Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+            for record in map(json.loads, f)
+        ]
+
+
+def legacy_scan(path: str) -> int:
+    offsets = np.fromfile(os.path.join(path, "offsets.i64"), dtype=np.int64).reshape(-1, 2)
+    total = 0
+    with open(os.path.join(path, "records.jsonl"), "rb") as f:
+        for start, length in offsets.tolist():
+            total += len(json.loads(os.pread(f.fileno(), length, start))["text"])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--reads", type=int, default=2000, help="random top-4 reads to time")
+    args = parser.parse_args()
+
+    from vector_store import MmapVectorStore
+
+    chunks = build_chunks(args.chunks)
+    text_bytes = sum(len(chunk.page_content.encode("utf-8")) for chunk in chunks)
+    rng = np.random.default_rng(0)
+    queries = rng.integers(0, len(chunks), size=(args.reads, 4))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store")
+        write_legacy_store(path, chunks)
+        del chunks
+        legacy_bytes = _size(path, LEGACY_FILES)
+        documents, materialised_heap = _traced(lambda: legacy_documents(path))
+        del documents
+
+        started = time.perf_counter()
+        legacy_scan(path)
+        legacy_scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        MmapVectorStore(_NoEmbeddings(), path)
+        migration_seconds = time.perf_counter() - started
+        store, open_heap = _traced(lambda: MmapVectorStore(_NoEmbeddings(), path))
+        compact_bytes = _size(path, COMPACT_FILES)
+
+        started = time.perf_counter()
+        for start in range(0, len(store), 1024):
+            store.get_texts(start, start + 1024)
+        compact_scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for rows in queries.tolist():
+            [store.get_document(row) for row in rows]
+        top_k_us = (time.perf_counter() - started) / args.reads * 1e6
+
+    per_100k = 100000 / args.chunks
+    report = {
+        "chunks": args.chunks,
+        "text_mb": round(text_bytes / 2 ** 20, 1),
+        "legacy": {
+            "bytes_per_chunk": round(legacy_bytes / args.chunks),
+            "files_mb_per_100k_chunks": round(legacy_bytes * per_100k / 2 ** 20, 1),
+            "materialised_heap_mb_per_100k_chunks": round(materialised_heap * per_100k / 2 ** 20, 1),
+            "full_scan_seconds": round(legacy_scan_seconds, 2),
+        },
+        "compact": {
+            "bytes_per_chunk": round(compact_bytes / args.chunks),
+            "files_mb_per_100k_chunks": round(compact_bytes * per_100k / 2 ** 20, 1),
+            "open_heap_mb": round(open_heap / 2 ** 20, 2),
+            "interned_metadata_dicts": len(store.snapshot().metadata),
+            "full_scan_seconds": round(compact_scan_seconds, 2),
+            "top_4_read_us": round(top_k_us, 1),
+            "migration_seconds": round(migration_seconds, 2),
+        },
+        "files_saved": f"{1 - compact_bytes / legacy_bytes:.0%}",
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Keep cold-start cost visible: import time of the app module and time from
+process start to the first successful ``/health`` response.
+
+The import phase runs ``python -X importtime`` in fresh interpreters and
+reports the cumulative import time of the app module, its slowest top-level
+imports, and which heavy RAG dependencies were loaded eagerly (there should
+be none). The server phase starts uvicorn and times the first ``/health``
+and the first ``/status`` (which builds the RAG agent). Both run with
+``WARM_START=false``, as on Vercel.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --budget-ms 1500   # exit 1 when over budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.stub_openai import free_port
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = (
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "langchain_community",
+    "langgraph",
+    "pypdf",
+    "my_rag",
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    env["WARM_START"] = "false"
+    return env
+
+
+def measure_import(module: str) -> dict:
+    """Import ``module`` in a fresh interpreter under ``-X importtime``."""
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SERVER_DIR, env=_env(), capture_output=True, text=True, check=True
+    )
+    top_level = []
+    total_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # Top-level imports are not indented under another package
+        if not line.rsplit("|", 1)[1].startswith("  "):
+            top_level.append((name, int(cumulative)))
+        if name == module:
+            total_us = int(cumulative)
+    return {
+        "import_ms": round((total_us or 0) / 1000, 1),
+        "slowest_imports_ms": {name: round(us / 1000, 1) for name, us in sorted(top_level, key=lambda x: -x[1])[:8]},
+        "heavy_modules_loaded": json.loads(result.stdout.strip().splitlines()[-1]),
+    }
+
+
+def measure_server(app: str) -> dict:
+    """Start uvicorn and time the first /health and the first /status response."""
+    port = free_port()
+    # Build the client up front: creating one per poll costs more than the poll
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=_env()
+    )
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                if client.get("/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline or process.poll() is not None:
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.005)
+        health_seconds = time.perf_counter() - started
+
+        status_started = time.perf_counter()
+        client.get("/status")
+        status_seconds = time.perf_counter() - status_started
+    finally:
+        client.close()
+        process.terminate()
+        process.wait()
+
+    return {
+        "first_health_seconds": round(health_seconds, 3),
+        "first_status_seconds": round(status_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module imported in the import phase")
+    parser.add_argument("--app", default="main:app", help="uvicorn application for the server phase")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, help="fail when the median import time exceeds this")
+    args = parser.parse_args()
+
+    imports = [measure_import(args.module) for _ in range(args.runs)]
+    servers = [measure_server(args.app) for _ in range(args.runs)]
+    import_ms = statistics.median(run["import_ms"] for run in imports)
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_import_ms": import_ms,
+        "median_first_health_seconds": statistics.median(run["first_health_seconds"] for run in servers),
+        "median_first_status_seconds": statistics.median(run["first_status_seconds"] for run in servers),
+        "slowest_imports_ms": imports[-1]["slowest_imports_ms"],
+        "heavy_modules_loaded": imports[-1]["heavy_modules_loaded"],
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.budget_ms is not None and import_ms > args.budget_ms:
+        print(f"Import time {import_ms}ms exceeds the budget of {args.budget_ms}ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+End-to-end benchmark of the HTTP API against the local stub OpenAI server.
+
+The stub (``benchmarks.stub_openai``) and the app run under uvicorn in
+subprocesses, with a fresh PDF directory, vector index and embedding cache,
+so nothing leaves the machine and runs are repeatable. Two phases follow:
+
+    upload -- ``--documents`` synthetic PDFs of ``--pages`` pages each are
+              posted to ``/upload-pdf``, ``--upload-concurrency`` at a time,
+              and their ingestion jobs polled until they finish
+    chat   -- for each ``--concurrency`` level, that many clients send
+              ``--requests`` questions in total to ``/chat`` (``/chat/stream``
+              with ``--stream``), each client in its own session
+
+The JSON report has throughput and p50/p95/p99 latency per phase, the
+server's peak RSS (``VmHWM``, Linux only) and per-stage timings taken from
+the difference in ``/metrics`` across each phase. Stage p95 values are the
+upper bound of the histogram bucket holding the 95th percentile. With
+``--output`` the report is also written to a file so runs can be compared
+over time.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_e2e --documents 10 --pages 50 --concurrency 1 8 32
+    python -m benchmarks.bench_e2e --chat-latency 0.3 --token-delay 0.01 --stream --output e2e.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.stub_openai import free_port, running_stub
+from benchmarks.synthetic_pdf import WORDS, write_synthetic_pdf
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$")
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+Samples = Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]
+
+
+def _read_status_kb(pid: int, field: str) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _mb(kb: Optional[int]) -> Optional[float]:
+    return round(kb / 1024, 1) if kb is not None else None
+
+
+def _latency_summary(seconds: List[float]) -> dict:
+    if not seconds:
+        return {}
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+    return {
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "max_ms": round(max(seconds) * 1000, 1),
+    }
+
+
+def parse_metrics(text: str) -> Samples:
+    """Parse the Prometheus text format into ``{(name, sorted labels): value}``."""
+    samples: Samples = {}
+    for line in text.splitlines():
+        match = SAMPLE_PATTERN.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        key = tuple(sorted(LABEL_PATTERN.findall(labels or "")))
+        samples[(name, key)] = float(value)
+    return samples
+
+
+def stage_timings(before: Samples, after: Samples) -> Dict[str, dict]:
+    """Per-stage count, mean and bucketed p95 of the observations made between two scrapes."""
+    stages: Dict[str, dict] = {}
+    for (name, labels), count in after.items():
+        if name != "rag_stage_duration_seconds_count":
+            continue
+        count -= before.get((name, labels), 0.0)
+        if count <= 0:
+            continue
+        stage = dict(labels)["stage"]
+        total = after[("rag_stage_duration_seconds_sum", labels)] - before.get(("rag_stage_duration_seconds_sum", labels), 0.0)
+        buckets = sorted(
+            (float(dict(bucket_labels)["le"]), value - before.get((bucket_name, bucket_labels), 0.0))
+            for (bucket_name, bucket_labels), value in after.items()
+            if bucket_name == "rag_stage_duration_seconds_bucket" and dict(bucket_labels).get("stage") == stage
+        )
+        p95 = next((bound for bound, cumulative in buckets if cumulative >= 0.95 * count), math.inf)
+        stages[stage] = {
+            "count": int(count),
+            "total_seconds": round(total, 3),
+            "mean_ms": round(total / count * 1000, 2),
+            "p95_ms": round(p95 * 1000, 1) if p95 != math.inf else None,
+        }
+    return dict(sorted(stages.items()))
+
+
+class Server:
+    """The app under uvicorn in a subprocess, with its state in a temporary directory."""
+
+    def __init__(self, app: str, base_url: str, workdir: str, env: Dict[str, str], workers: int = 1):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        server_env = dict(os.environ)
+        server_env.update({
+            "OPENAI_API_KEY": "sk-stub",
+            "OPENAI_BASE_URL": base_url,
+            "WARM_START": "false",
+            "PDFS_DIR": os.path.join(workdir, "pdfs"),
+            "VECTOR_INDEX_DIR": os.path.join(workdir, "index"),
+            "EMBEDDING_CACHE_PATH": os.path.join(workdir, "cache", "embeddings.sqlite"),
+        })
+        server_env.update(env)
+        command = [sys.executable, "-m", "uvicorn", app, "--port", str(self.port), "--log-level", "warning"]
+        if workers > 1:
+            command += ["--workers", str(workers)]
+        self.process = subprocess.Popen(command, cwd=SERVER_DIR, env=server_env)
+
+    def wait_ready(self, timeout: float = 120) -> None:
+        deadline = time.time() + timeout
+        with httpx.Client(base_url=self.url, timeout=timeout) as client:
+            while True:
+                try:
+                    # /ready builds the agent, so it is not charged to the first upload
+                    if client.get("/ready").status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                if time.time() > deadline or self.process.poll() is not None:
+                    raise RuntimeError("Server failed to start")
+                time.sleep(0.1)
+
+    def rss_kb(self, field: str = "VmRSS") -> Optional[int]:
+        return _read_status_kb(self.process.pid, field)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+async def _scrape(client: httpx.AsyncClient) -> Samples:
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    return parse_metrics(response.text)
+
+
+async def run_uploads(client: httpx.AsyncClient, paths: List[str], concurrency: int) -> dict:
+    """Upload every PDF, wait for its ingestion job, and time both."""
+    semaphore = asyncio.Semaphore(concurrency)
+    upload_seconds: List[float] = []
+    indexed_seconds: List[float] = []
+    statuses: Dict[str, int] = {}
+    rejected = 0
+
+    async def upload(path: str):
+        nonlocal rejected
+        async with semaphore:
+            started = time.perf_counter()
+            while True:
+                with open(path, "rb") as handle:
+                    response = await client.post(
+                        "/upload-pdf", files={"file": (os.path.basename(path), handle, "application/pdf")}
+                    )
+                if response.status_code != 429:
+                    break
+                # The ingestion queue is full; back off as the server asks, but briefly
+                rejected += 1
+                await asyncio.sleep(min(1.0, float(response.headers.get("retry-after", "1"))))
+            upload_seconds.append(time.perf_counter() - started)
+            job_id = response.json().get("job_id") if response.status_code == 202 else None
+            status = "failed" if response.status_code != 202 else "completed"
+            while job_id:
+                job = (await client.get(f"/jobs/{job_id}")).json()
+                if job["status"] in ("completed", "failed"):
+                    status = job["status"]
+                    break
+                await asyncio.sleep(0.05)
+            indexed_seconds.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(path) for path in paths))
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": len(paths),
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "queue_full_retries": rejected,
+        "seconds": round(elapsed, 2),
+        "documents_per_second": round(len(paths) / elapsed, 2),
+        "upload_latency": _latency_summary(upload_seconds),
+        "time_to_indexed": _latency_summary(indexed_seconds),
+    }
+
+
+async def run_chat_level(client: httpx.AsyncClient, concurrency: int, requests: int, stream: bool, seed: int) -> dict:
+    """Send ``requests`` questions from ``concurrency`` clients, each asking back to back."""
+    per_client = max(1, requests // concurrency)
+    latencies: List[float] = []
+    first_token: List[float] = []
+    errors = 0
+    cached = 0
+
+    async def chat_client(client_id: int):
+        nonlocal errors, cached
+        rng = np.random.default_rng(seed * 100003 + client_id)
+        session_id = f"e2e-{seed}-{concurrency}-{client_id}"
+        for _ in range(per_client):
+            question = "What does the report say about " + " ".join(rng.choice(WORDS, 4)) + "?"
+            payload = {"message": question, "session_id": session_id}
+            started = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", "/chat/stream", json=payload) as response:
+                        ok = response.status_code == 200
+                        seen_token = False
+                        async for line in response.aiter_lines():
+                            if line == "event: token" and not seen_token:
+                                seen_token = True
+                                first_token.append(time.perf_counter() - started)
+                            elif line == "event: error":
+                                ok = False
+                else:
+                    response = await client.post("/chat", json=payload)
+                    ok = response.status_code == 200
+                    cached += ok and response.json().get("cached", False)
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat_client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "concurrency": concurrency,
+        "requests": per_client * concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency": _latency_summary(latencies),
+    }
+    if stream:
+        result["time_to_first_token"] = _latency_summary(first_token)
+    else:
+        result["cached_answers"] = int(cached)
+    return result
+
+
+async def run_phases(server: Server, pdf_paths: List[str], args) -> dict:
+    async with httpx.AsyncClient(base_url=server.url, timeout=600) as client:
+        idle_rss_kb = server.rss_kb()
+        before = await _scrape(client)
+        upload = await run_uploads(client, pdf_paths, args.upload_concurrency)
+        after = await _scrape(client)
+        upload["stages"] = stage_timings(before, after)
+        upload["rss_after_mb"] = _mb(server.rss_kb())
+
+        levels = []
+        for seed, concurrency in enumerate(args.concurrency):
+            before = await _scrape(client)
+            level = await run_chat_level(client, concurrency, args.requests, args.stream, seed)
+            after = await _scrape(client)
+            level["stages"] = stage_timings(before, after)
+            levels.append(level)
+
+        status = (await client.get("/status")).json()
+
+    return {
+        "upload": upload,
+        "chat": levels,
+        "server": {
+            "idle_rss_mb": _mb(idle_rss_kb),
+            "peak_rss_mb": _mb(server.rss_kb("VmHWM")),
+            "chunks_indexed": status.get("chunks_indexed"),
+            "prompt": status.get("prompt"),
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="uvicorn application to benchmark")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="chat requests per concurrency level")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument(
+        "--server-env", nargs="*", default=[], metavar="NAME=VALUE",
+        help="extra environment for the server, e.g. RETRIEVAL_MODE=dense"
+    )
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    with tempfile.TemporaryDirectory() as workdir:
+        source_dir = os.path.join(workdir, "source")
+        os.makedirs(source_dir)
+        # Distinct seeds give distinct files, so none is skipped as a duplicate
+        pdf_paths = [
+            write_synthetic_pdf(os.path.join(source_dir, f"e2e-{i:04d}.pdf"), pages=args.pages, seed=i)
+            for i in range(args.documents)
+        ]
+        with running_stub(
+            embedding_latency=args.embedding_latency,
+            chat_latency=args.chat_latency,
+            token_delay=args.token_delay,
+            answer_tokens=args.answer_tokens
+        ) as base_url:
+            server = Server(args.app, base_url, workdir, server_env)
+            try:
+                server.wait_ready()
+                results = asyncio.run(run_phases(server, pdf_paths, args))
+            finally:
+                server.stop()
+
+    report = {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compare document embedding throughput: the original single
+``OpenAIEmbeddings.embed_documents`` call (serial batches, the OpenAI client's
+own retries) against ``EmbeddingPipeline`` (concurrent batches, RPM
+throttling and per-batch retries).
+
+Each scenario runs against its own local stub OpenAI server:
+
+    latency     -- every embeddings request takes ``--embedding-latency``
+    rate-limits -- as above, plus random 429s (``--error-rate``) and a
+                   requests-per-minute limit (``--rpm-limit``); the pipeline is
+                   given the same RPM budget
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_embedding_pipeline --texts 4000 --embedding-latency 0.2
+"""
+import argparse
+import json
+import random
+import time
+
+import httpx
+
+from benchmarks.stub_openai import running_stub
+
+MODES = ("serial", "pipeline")
+
+
+def synthetic_chunks(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    words = ["invoice", "warranty", "clause", "section", "delivery", "payment", "schedule", "party",
+             "liability", "notice", "term", "renewal", "amount", "period", "agreement", "service"]
+    return [f"chunk {i}: " + " ".join(rng.choice(words) for _ in range(130)) for i in range(count)]
+
+
+def run_mode(mode: str, base_url: str, texts: list, args, rpm_budget: int) -> dict:
+    from langchain_openai import OpenAIEmbeddings
+    from embedding_pipeline import EmbeddingPipeline
+
+    stats_url = base_url.rsplit("/v1", 1)[0] + "/stats"
+    before = httpx.get(stats_url).json()
+
+    if mode == "serial":
+        # What add_documents did before: one call, batches sent one after another
+        embeddings = OpenAIEmbeddings(
+            model="text-embedding-3-large", api_key="sk-stub", base_url=base_url,
+            check_embedding_ctx_length=False, chunk_size=args.batch_size
+        )
+    else:
+        embeddings = EmbeddingPipeline(
+            OpenAIEmbeddings(
+                model="text-embedding-3-large", api_key="sk-stub", base_url=base_url,
+                check_embedding_ctx_length=False, max_retries=0
+            ),
+            batch_size=args.batch_size,
+            max_concurrency=args.concurrency,
+            requests_per_minute=rpm_budget or None
+        )
+
+    started = time.perf_counter()
+    error = None
+    try:
+        vectors = embeddings.embed_documents(texts)
+        embedded = len(vectors)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"[:200]
+        embedded = 0
+    elapsed = time.perf_counter() - started
+
+    after = httpx.get(stats_url).json()
+    result = {
+        "mode": mode,
+        "texts": len(texts),
+        "embedded": embedded,
+        "seconds": round(elapsed, 2),
+        "texts_per_second": round(embedded / elapsed, 1),
+        "requests": after["embedding_requests"] - before["embedding_requests"],
+        "rate_limited": after["rate_limited"] - before["rate_limited"],
+        "error": error,
+    }
+    if mode == "pipeline":
+        result["pipeline"] = embeddings.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=4000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--embedding-latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--rpm-limit", type=int, default=600)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    texts = synthetic_chunks(args.texts)
+    scenarios = {
+        "latency": {"embedding_latency": args.embedding_latency},
+        "rate-limits": {
+            "embedding_latency": args.embedding_latency,
+            "error_rate": args.error_rate,
+            "rpm_limit": args.rpm_limit,
+        },
+    }
+
+    results = []
+    for scenario, options in scenarios.items():
+        with running_stub(**options) as base_url:
+            for mode in args.modes:
+                rpm_budget = options.get("rpm_limit", 0)
+                results.append({"scenario": scenario, **run_mode(mode, base_url, texts, args, rpm_budget)})
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
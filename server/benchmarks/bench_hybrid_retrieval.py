@@ -0,0 +1,183 @@
+"""
+Compare retrieval quality and latency of the three retrieval modes (dense,
+lexical, hybrid) on a synthetic corpus.
+
+Each chunk is written about one topic and mentions a unique part number and
+section id. The embeddings are a local stand-in for a semantic model: words
+map to concepts, so synonyms embed alike, while identifiers such as part
+numbers are blurred away, as real embedding models tend to do. Two query sets
+probe each weakness:
+
+    exact-term -- "part XR-2041-B" style lookups of an identifier in one chunk
+    paraphrase -- a chunk's content words replaced by synonyms
+
+Quality is recall@k and MRR of the one relevant chunk; latency covers the
+whole ``MyRAGAgent.retrieve`` call including a simulated embedding round-trip
+of ``--embedding-latency`` seconds.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_hybrid_retrieval --chunks 20000 --queries 200
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.fakes import FakeStreamingChatModel
+
+MODES = ("dense", "lexical", "hybrid")
+TOPICS = 200
+CONCEPTS_PER_TOPIC = 12
+
+
+class ConceptEmbeddings(Embeddings):
+    """Bag-of-concepts embeddings: each word (or its synonym) adds its concept's random direction."""
+
+    def __init__(self, concept_of: dict, concepts: int, dim: int = 256, query_latency: float = 0.0):
+        rng = np.random.default_rng(0)
+        self.concept_of = concept_of
+        self.directions = rng.standard_normal((concepts, dim)).astype(np.float32)
+        self.query_latency = query_latency
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.directions.shape[1], dtype=np.float32)
+        for word in text.lower().split():
+            concept = self.concept_of.get(word.strip(".,?"))
+            if concept is not None:
+                vector += self.directions[concept]
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.query_latency)
+        return self._embed(text)
+
+
+def build_corpus(chunks: int, seed: int = 0):
+    """Return chunk texts, per-chunk (part number, section id, words), and the word -> concept map."""
+    rng = random.Random(seed)
+    concept_of = {}
+    synonyms = {}
+    concepts = TOPICS * CONCEPTS_PER_TOPIC
+    for concept in range(concepts):
+        word, synonym = f"term{concept}a", f"term{concept}b"
+        concept_of[word] = concept_of[synonym] = concept
+        synonyms[word] = synonym
+
+    texts, facts = [], []
+    for i in range(chunks):
+        topic = rng.randrange(TOPICS)
+        words = [f"term{topic * CONCEPTS_PER_TOPIC + rng.randrange(CONCEPTS_PER_TOPIC)}a" for _ in range(60)]
+        # Rare words make a chunk distinguishable from others on the same topic
+        words += [f"term{rng.randrange(concepts)}a" for _ in range(12)]
+        rng.shuffle(words)
+        part = f"{rng.choice('ABCDEFGHKLMNPRSTX')}{rng.choice('ABCDEFGHKLMNPRSTX')}-{i:05d}-{rng.choice('ABC')}"
+        section = f"{rng.randint(1, 20)}.{rng.randint(1, 20)}.{i}"
+        texts.append(f"Section {section}. Part {part}: " + " ".join(words))
+        facts.append((part, section, words))
+    return texts, facts, concept_of, synonyms, concepts
+
+
+def build_queries(facts, synonyms, count: int, seed: int = 1):
+    rng = random.Random(seed)
+    targets = rng.sample(range(len(facts)), count)
+    exact = []
+    paraphrase = []
+    for row in targets:
+        part, section, words = facts[row]
+        if rng.random() < 0.5:
+            exact.append((f"What is the warranty on part {part}?", row))
+        else:
+            exact.append((f"What does section {section} say?", row))
+        distinctive = rng.sample(words[-12:] + words[:12], 10)
+        paraphrase.append((" ".join(synonyms[word] for word in distinctive), row))
+    return {"exact-term": exact, "paraphrase": paraphrase}
+
+
+def evaluate(agent, queries, k: int) -> dict:
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    for question, expected_row in queries:
+        expected_id = agent.vector_store.get_id(expected_row)
+        started = time.perf_counter()
+        docs = agent.retrieve(question, k=k)
+        latencies.append(time.perf_counter() - started)
+        ids = [doc.id for doc in docs]
+        if expected_id in ids:
+            hits += 1
+            reciprocal_ranks += 1.0 / (ids.index(expected_id) + 1)
+    return {
+        f"recall@{k}": round(hits / len(queries), 3),
+        "mrr": round(reciprocal_ranks / len(queries), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    from lexical_index import LexicalIndex
+    from my_rag import MyRAGAgent
+
+    texts, facts, concept_of, synonyms, concepts = build_corpus(args.chunks)
+    query_sets = build_queries(facts, synonyms, args.queries)
+    embeddings = ConceptEmbeddings(concept_of, concepts, query_latency=args.embedding_latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = MyRAGAgent(
+            openai_api_key="sk-benchmark",
+            llm=FakeStreamingChatModel(),
+            embeddings=embeddings,
+            vector_store_path=tmp
+        )
+        started = time.perf_counter()
+        for start in range(0, len(texts), 1024):
+            agent.vector_store.add_texts(texts[start:start + 1024])
+        ingest_seconds = time.perf_counter() - started
+
+        rebuilt = LexicalIndex()
+        view = agent.vector_store.snapshot()
+        started = time.perf_counter()
+        rebuilt.sync(len(view.rows), lambda start, end: agent.vector_store.get_texts(start, end, view))
+        rebuild_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        agent.lexical_index.save()
+        save_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        LexicalIndex(agent.lexical_index.path).load()
+        load_seconds = time.perf_counter() - started
+
+        results = []
+        for mode in MODES:
+            agent.retrieval_mode = mode
+            for name, queries in query_sets.items():
+                results.append({"mode": mode, "queries": name, **evaluate(agent, queries, args.k)})
+
+        report = {
+            "chunks": args.chunks,
+            "embedding_latency_ms": args.embedding_latency * 1000,
+            "ingest_seconds_including_lexical_index": round(ingest_seconds, 2),
+            "lexical_rebuild_seconds": round(rebuild_seconds, 2),
+            "lexical_snapshot_save_seconds": round(save_seconds, 2),
+            "lexical_snapshot_load_seconds": round(load_seconds, 2),
+            "lexical_terms": agent.lexical_index.term_count,
+            "results": results,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
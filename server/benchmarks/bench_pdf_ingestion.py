@@ -0,0 +1,100 @@
+"""
+Compare peak RSS and wall time of PDF ingestion: the original eager path
+(``PyPDFLoader.load`` + one ``split_documents`` + one ``add_documents``)
+against the streaming ``MyRAGAgent.load_documents`` path.
+
+Each mode runs in a fresh subprocess so peak RSS is measured in isolation.
+Embeddings are deterministic fakes, so no network access is needed.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_pdf_ingestion --pages 500
+    python -m benchmarks.bench_pdf_ingestion --pages 100 --files 4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+MODES = ("baseline", "streaming")
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_baseline(agent, paths):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    docs = []
+    for path in paths:
+        docs.extend(PyPDFLoader(path).load())
+    splits = agent.text_splitter.split_documents(docs)
+    agent.vector_store.add_documents(splits)
+
+
+def _run_streaming(agent, paths):
+    agent.load_documents(paths)
+
+
+def run_mode(mode: str, paths, dim: int) -> dict:
+    """Ingest ``paths`` with the given mode and return timing and memory figures."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from my_rag import MyRAGAgent
+
+    agent = MyRAGAgent(
+        openai_api_key=os.getenv("OPENAI_API_KEY", "sk-benchmark"),
+        embeddings=DeterministicFakeEmbedding(size=dim)
+    )
+    rss_before = _peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "baseline":
+        _run_baseline(agent, paths)
+    else:
+        _run_streaming(agent, paths)
+    return {
+        "mode": mode,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_before_ingest_mb": round(rss_before, 1),
+        "chunks": len(agent.vector_store),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500, help="pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=1, help="number of synthetic PDFs")
+    parser.add_argument("--dim", type=int, default=64, help="fake embedding dimension")
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, args.paths, args.dim)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            write_synthetic_pdf(os.path.join(tmp, f"synthetic_{i}.pdf"), pages=args.pages, seed=i)
+            for i in range(args.files)
+        ]
+        results = []
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_pdf_ingestion",
+                 "--run-mode", mode, "--dim", str(args.dim), *paths],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps({"pages": args.pages, "files": args.files, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
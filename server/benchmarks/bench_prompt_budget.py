@@ -0,0 +1,113 @@
+"""
+Compare prompt size of the previous prompt construction (every chunk cut at
+800 characters, the last 10 messages in full) with the token-budgeted
+``ContextBuilder`` over a multi-turn conversation with long answers.
+
+Chunks come from a synthetic PDF split exactly as ingestion splits it. Each
+turn retrieves a chunk, its overlapping neighbour and two random chunks, as
+top-4 results often do, and appends an answer of ``--answer-chars`` to the
+history. Token counts use tiktoken when its encoding is available and the
+4-characters-per-token estimate otherwise (see ``exact_token_counts``).
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_prompt_budget --turns 30 --answer-chars 4000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.synthetic_pdf import WORDS, write_synthetic_pdf
+
+
+def legacy_prompt(question, context_docs, messages) -> str:
+    """The prompt as it was built before the context builder."""
+    docs_content = "\n\n".join(
+        f"Document {i+1}:\n{doc.page_content[:800]}..."
+        if len(doc.page_content) > 800
+        else f"Document {i+1}:\n{doc.page_content}"
+        for i, doc in enumerate(context_docs)
+    )
+    history_text = "\n".join(f"{msg.type.capitalize()}: {msg.content}" for msg in messages[-10:])
+    context_section = f"Relevant Information:\n{docs_content}\n\n" if docs_content else ""
+    history_section = f"Recent Conversation:\n{history_text}\n\n" if history_text else ""
+    return (
+        "You are a helpful AI assistant that answers questions based on provided documents and conversation context.\n\n"
+        f"{context_section}{history_section}Current Question: {question}\n\nInstructions:\n"
+        "- Answer the question clearly and helpfully\n- Use information from the provided documents when relevant\n"
+        "- If the documents don't contain relevant information, say so clearly\n"
+        "- Be concise but comprehensive\n- Maintain conversation context when appropriate\n\nAnswer:"
+    )
+
+
+def _summary(samples, digits: int = 1) -> dict:
+    return {
+        "mean": round(statistics.mean(samples), digits),
+        "p95": round(sorted(samples)[int(0.95 * (len(samples) - 1))], digits),
+        "max": round(max(samples), digits),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--answer-chars", type=int, default=4000)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--history-budget", type=int, default=1000)
+    args = parser.parse_args()
+
+    from context_builder import ContextBuilder, TokenCounter
+    from my_rag import _split_pdf
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = write_synthetic_pdf(os.path.join(tmp, "doc.pdf"), pages=50)
+        _, chunks, _ = _split_pdf(pdf_path, chunk_size=1000, chunk_overlap=200)
+
+    counter = TokenCounter()
+    builder = ContextBuilder(counter, max_prompt_tokens=args.budget, max_history_tokens=args.history_budget)
+    rng = random.Random(0)
+    messages = []
+    legacy_tokens, budgeted_tokens, legacy_ms, budgeted_ms, merged = [], [], [], [], 0
+
+    for turn in range(args.turns):
+        # Chunks are split per page, so a chunk and the next one share text unless the page ends
+        row = rng.randrange(len(chunks) - 1)
+        docs = [chunks[row], chunks[row + 1]] + rng.sample(chunks, 2)
+        question = f"Question {turn}: what does the report say about " + " ".join(rng.sample(WORDS, 4)) + "?"
+
+        started = time.perf_counter()
+        legacy = legacy_prompt(question, docs, messages)
+        legacy_ms.append((time.perf_counter() - started) * 1000)
+        legacy_tokens.append(counter.count(legacy, cache=False))
+
+        started = time.perf_counter()
+        prompt = builder.build(question, docs, messages)
+        budgeted_ms.append((time.perf_counter() - started) * 1000)
+        budgeted_tokens.append(prompt.stats["prompt_tokens"])
+        merged += prompt.stats["chunks_deduplicated"]
+
+        answer = " ".join(rng.choice(WORDS) for _ in range(args.answer_chars // 7))[:args.answer_chars]
+        messages += [HumanMessage(content=question), AIMessage(content=answer)]
+
+    print(json.dumps({
+        "turns": args.turns,
+        "answer_chars": args.answer_chars,
+        "budget_tokens": args.budget,
+        "exact_token_counts": counter.exact,
+        "legacy": {"prompt_tokens": _summary(legacy_tokens), "build_ms": _summary(legacy_ms, 3)},
+        "budgeted": {
+            "prompt_tokens": _summary(budgeted_tokens),
+            "build_ms": _summary(budgeted_ms, 3),
+            "chunks_merged": merged,
+        },
+        "prompt_tokens_saved": f"{1 - sum(budgeted_tokens) / sum(legacy_tokens):.0%}",
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
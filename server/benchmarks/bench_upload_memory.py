@@ -0,0 +1,168 @@
+"""
+Compare server peak RSS for concurrent PDF uploads: the original handler,
+which reads the whole upload into memory with ``await file.read()``, against
+the chunked ``uploads.save_upload`` path.
+
+Each mode serves a minimal app with just the upload route from a fresh
+uvicorn subprocess, so peak RSS (``VmHWM``, Linux only) is measured in
+isolation. The client streams the same file from disk for every request.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_upload_memory --uploads 20 --size-mb 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("buffered", "streaming")
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+
+def _read_status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/{pid}/status")
+
+
+def create_app(mode: str, upload_dir: str):
+    from fastapi import FastAPI, File, HTTPException, UploadFile
+
+    from uploads import UploadLimitMiddleware, UploadTooLargeError, save_upload
+
+    app = FastAPI()
+
+    if mode == "buffered":
+        @app.post("/upload-pdf")
+        async def upload_buffered(file: UploadFile = File(...)):
+            content = await file.read()
+            if len(content) > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail="File too large")
+            await file.seek(0)
+            path = os.path.join(upload_dir, file.filename)
+            with open(path, "wb") as buffer:
+                buffer.write(content)
+            return {"size_bytes": len(content)}
+    else:
+        app.add_middleware(UploadLimitMiddleware, paths=["/upload-pdf"], max_bytes=MAX_UPLOAD_BYTES)
+
+        @app.post("/upload-pdf")
+        async def upload_streaming(file: UploadFile = File(...)):
+            path = os.path.join(upload_dir, file.filename)
+            try:
+                size_bytes, sha256 = await save_upload(file, path, MAX_UPLOAD_BYTES)
+            except UploadTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            return {"size_bytes": size_bytes, "sha256": sha256}
+
+    return app
+
+
+def serve(mode: str, port: int, upload_dir: str):
+    import uvicorn
+
+    uvicorn.run(create_app(mode, upload_dir), host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen):
+    deadline = time.time() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                raise RuntimeError("Upload server failed to start")
+            time.sleep(0.1)
+
+
+async def _upload_all(port: int, source: str, uploads: int) -> list:
+    import httpx
+
+    async def upload(client, index: int) -> int:
+        with open(source, "rb") as handle:
+            response = await client.post(
+                f"http://127.0.0.1:{port}/upload-pdf",
+                files={"file": (f"upload-{index}.pdf", handle, "application/pdf")}
+            )
+        return response.status_code
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        return await asyncio.gather(*(upload(client, i) for i in range(uploads)))
+
+
+def run_mode(mode: str, source: str, uploads: int) -> dict:
+    """Serve ``mode`` in a subprocess, upload ``source`` concurrently and report server memory."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as upload_dir:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_upload_memory",
+             "--serve", mode, "--port", str(port), "--upload-dir", upload_dir],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        try:
+            _wait_for_port(port, process)
+            idle_rss_kb = _read_status_kb(process.pid, "VmRSS")
+            started = time.perf_counter()
+            statuses = asyncio.run(_upload_all(port, source, uploads))
+            elapsed = time.perf_counter() - started
+            peak_rss_kb = _read_status_kb(process.pid, "VmHWM")
+        finally:
+            process.terminate()
+            process.wait()
+
+    return {
+        "mode": mode,
+        "uploads": uploads,
+        "statuses": sorted(set(statuses)),
+        "seconds": round(elapsed, 2),
+        "idle_rss_mb": round(idle_rss_kb / 1024, 1),
+        "peak_rss_mb": round(peak_rss_kb / 1024, 1),
+        "peak_growth_mb": round((peak_rss_kb - idle_rss_kb) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--serve", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--upload-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.upload_dir)
+        return
+
+    # Stay just under the limit so both handlers accept the upload
+    size = min(args.size_mb * 1024 * 1024, MAX_UPLOAD_BYTES - 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "upload.pdf")
+        with open(source, "wb") as handle:
+            handle.write(b"%PDF-1.4\n")
+            remaining = size - 9
+            while remaining > 0:
+                block = os.urandom(min(remaining, 1024 * 1024))
+                handle.write(block)
+                remaining -= len(block)
+
+        print(json.dumps([run_mode(mode, source, args.uploads) for mode in args.modes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
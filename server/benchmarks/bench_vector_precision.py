@@ -0,0 +1,156 @@
+"""
+Benchmark first-pass vector search over truncated and int8-quantized copies
+of the embeddings, re-ranked at full precision, against exact float32 search.
+
+Each mode is a ``SearchEngine`` configuration:
+
+    float32      -- exact search over the full float32 matrix (the baseline)
+    trunc-N      -- first pass over the leading N dimensions, renormalised
+    int8         -- first pass over all dimensions quantized to int8
+    int8-trunc-N -- both
+
+For each mode the report has the memory a search scans (the full matrix for
+the baseline, the compressed copy otherwise; re-ranking only reads
+``k * rerank_factor`` full rows per query), the time to build the copy,
+p50/p99 query latency, and recall@k against the baseline, with and without
+the full-precision re-rank.
+
+By default the vectors are synthetic, clustered around topics, with variance
+decaying over the dimensions (``--spectrum-decay``) the way it does in
+text-embedding-3 vectors, whose leading dimensions carry the most
+information; 0 gives isotropic vectors, the worst case for truncation.
+``--index`` uses the vectors of a real index directory instead (its
+``vectors.f32`` and ``meta.json``), with queries drawn from perturbed rows.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_vector_precision --sizes 20000 100000 --dim 3072
+    python -m benchmarks.bench_vector_precision --index index --truncate 256 512 1024
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from retrieval import SearchEngine
+
+
+def synthetic_embeddings(path: str, n: int, dim: int, decay: float, n_topics: int = 1000, seed: int = 0) -> np.memmap:
+    """Write normalised clustered vectors with a decaying variance spectrum to ``path`` and map them."""
+    rng = np.random.default_rng(seed)
+    spectrum = ((1 + np.arange(dim) / 32) ** -decay).astype(np.float32)
+    topics = rng.standard_normal((n_topics, dim), dtype=np.float32) * spectrum
+    matrix = np.memmap(path, dtype=np.float32, mode="w+", shape=(n, dim))
+    for start in range(0, n, 16384):
+        stop = min(n, start + 16384)
+        block = topics[rng.integers(0, n_topics, stop - start)]
+        block += 0.8 * rng.standard_normal(block.shape, dtype=np.float32) * spectrum
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        matrix[start:stop] = block
+    matrix.flush()
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(n, dim))
+
+
+def index_embeddings(index_dir: str) -> np.memmap:
+    with open(os.path.join(index_dir, "meta.json")) as f:
+        dim = json.load(f)["dim"]
+    path = os.path.join(index_dir, "vectors.f32")
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(os.path.getsize(path) // (4 * dim), dim))
+
+
+def make_queries(matrix: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Corpus rows nudged by noise of about 30% of their norm, renormalised."""
+    rng = np.random.default_rng(seed)
+    dim = matrix.shape[1]
+    queries = np.asarray(matrix[np.sort(rng.integers(0, len(matrix), count))], dtype=np.float32)
+    queries += rng.standard_normal(queries.shape, dtype=np.float32) * (0.3 / np.sqrt(dim))
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def _percentiles(samples) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)) * 1000, 3),
+        "p99_ms": round(float(np.percentile(samples, 99)) * 1000, 3),
+    }
+
+
+def run_mode(name: str, matrix: np.ndarray, queries: np.ndarray, expected, k: int, **engine_args) -> dict:
+    # Exact first pass only, so recall reflects the compression and not IVF
+    engine = SearchEngine(ann_threshold=len(matrix) + 1, **engine_args)
+    started = time.perf_counter()
+    engine.update(matrix)
+    build_seconds = time.perf_counter() - started
+    compressed = engine._compressed
+
+    times, hits, first_pass_hits = [], 0, 0
+    for query, truth in zip(queries, expected):
+        started = time.perf_counter()
+        rows, _ = engine.search(matrix, query, k)
+        times.append(time.perf_counter() - started)
+        hits += len(truth & set(rows.tolist()))
+        if compressed is not None:
+            first_pass = np.argpartition(-compressed.scores(compressed.project(query), len(matrix)), k - 1)[:k]
+            first_pass_hits += len(truth & set(first_pass.tolist()))
+
+    result = {
+        "mode": name,
+        "scanned_mb": round((compressed.nbytes if compressed is not None else matrix.nbytes) / 2 ** 20, 1),
+        **_percentiles(times),
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+    }
+    if compressed is not None:
+        result["build_seconds"] = round(build_seconds, 2)
+        result[f"recall@{k}_without_rerank"] = round(first_pass_hits / (k * len(queries)), 4)
+        result["rerank_candidates"] = k * engine.rerank_factor
+    return result
+
+
+def run(matrix: np.ndarray, args) -> dict:
+    queries = make_queries(matrix, args.queries)
+    exact = SearchEngine(ann_threshold=len(matrix) + 1)
+    expected = [set(exact.search(matrix, query, args.k)[0].tolist()) for query in queries]
+    baseline = run_mode("float32", matrix, queries, expected, args.k)
+
+    modes = [baseline]
+    for dim in args.truncate:
+        modes.append(run_mode(f"trunc-{dim}", matrix, queries, expected, args.k,
+                              first_pass_dim=dim, rerank_factor=args.rerank_factor))
+    modes.append(run_mode("int8", matrix, queries, expected, args.k,
+                          first_pass_int8=True, rerank_factor=args.rerank_factor))
+    for dim in args.truncate:
+        modes.append(run_mode(f"int8-trunc-{dim}", matrix, queries, expected, args.k,
+                              first_pass_dim=dim, first_pass_int8=True, rerank_factor=args.rerank_factor))
+    for mode in modes:
+        mode["scanned_vs_float32"] = round(mode["scanned_mb"] / baseline["scanned_mb"], 3)
+        mode["p50_vs_float32"] = round(mode["p50_ms"] / baseline["p50_ms"], 2)
+    return {"vectors": len(matrix), "dim": matrix.shape[1], "modes": modes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--spectrum-decay", type=float, default=0.5)
+    parser.add_argument("--index", help="benchmark the vectors of this index directory instead")
+    parser.add_argument("--truncate", type=int, nargs="+", default=[256, 512])
+    parser.add_argument("--rerank-factor", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.index:
+        results = [run(index_embeddings(args.index), args)]
+    else:
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in args.sizes:
+                matrix = synthetic_embeddings(os.path.join(tmp, f"vectors-{n}.f32"), n, args.dim, args.spectrum_decay)
+                results.append(run(matrix, args))
+                del matrix
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
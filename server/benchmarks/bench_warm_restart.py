@@ -0,0 +1,91 @@
+"""
+Measure time-to-ready after a restart with a directory of existing PDFs.
+
+Three restarts are simulated in order, each constructing a fresh
+``MyRAGAgent`` and running the same ``startup.warm_restart`` the server runs
+at startup, until every startup job has finished:
+
+    cold              -- no index and no embedding cache
+    cached-embeddings -- index directory wiped, embedding cache kept
+    persisted-index   -- index and embedding cache both kept
+
+Embeddings come from the local stub OpenAI server, so the embedding request
+counts show how much work each restart actually repeats.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_warm_restart --pdfs 200 --embedding-latency 0.05
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.stub_openai import running_stub
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+SCENARIOS = ("cold", "cached-embeddings", "persisted-index")
+
+
+def restart(base_url: str, pdfs_dir: str, index_dir: str, cache_path: str, workers: int) -> dict:
+    from ingestion import IngestionQueue
+    from my_rag import MyRAGAgent
+    from startup import warm_restart
+
+    started = time.perf_counter()
+    agent = MyRAGAgent(
+        openai_api_key="sk-stub",
+        openai_base_url=base_url,
+        embedding_cache_path=cache_path,
+        vector_store_path=index_dir
+    )
+    queue = IngestionQueue(max_workers=workers)
+    jobs = warm_restart(agent, queue, pdfs_dir)
+    while not all(job.done for job in jobs):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    queue.shutdown()
+
+    return {
+        "seconds_to_ready": round(elapsed, 2),
+        "documents": len(agent.documents),
+        "chunks": agent.get_document_count(),
+        "failed_jobs": sum(1 for job in jobs if job.error),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=3, help="pages per PDF")
+    parser.add_argument("--workers", type=int, default=2, help="ingestion workers")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdfs_dir = os.path.join(tmp, "pdfs")
+        index_dir = os.path.join(tmp, "index")
+        cache_path = os.path.join(tmp, "cache", "embeddings.sqlite")
+        os.makedirs(pdfs_dir)
+        for i in range(args.pdfs):
+            write_synthetic_pdf(os.path.join(pdfs_dir, f"doc-{i:04d}.pdf"), pages=args.pages, seed=i)
+
+        results = []
+        with running_stub(embedding_latency=args.embedding_latency) as base_url:
+            stats_url = base_url.rsplit("/v1", 1)[0] + "/stats"
+            for scenario in SCENARIOS:
+                if scenario == "cached-embeddings":
+                    shutil.rmtree(index_dir)
+                before = httpx.get(stats_url).json()["embedding_requests"]
+                result = restart(base_url, pdfs_dir, index_dir, cache_path, args.workers)
+                result["embedding_requests"] = httpx.get(stats_url).json()["embedding_requests"] - before
+                results.append({"scenario": scenario, "pdfs": args.pdfs, **result})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Scaling benchmark for multi-worker deployments, where every worker process
+maps the same on-disk index and one of them (the writer) does all indexing.
+
+For each ``--workers`` count the app runs under ``uvicorn --workers N``
+against the local stub OpenAI server, with a fresh PDF directory, index and
+embedding cache. Then:
+
+    upload      -- ``--documents`` synthetic PDFs are posted to whichever
+                   worker accepts the connection and indexed by the writer
+    propagation -- time from the last job finishing until every worker's
+                   ``/status`` reports the same chunk count
+    chat        -- ``--concurrency`` clients send ``--requests`` questions to
+                   ``/chat``; throughput is compared with the single worker
+                   run as scaling efficiency (``rps_N / (N * rps_1)``)
+    memory      -- summed RSS and PSS of the workers. PSS splits shared pages
+                   between the processes mapping them, so it shows the index
+                   being held once rather than once per worker (Linux only)
+
+The upstream model latency is simulated with ``asyncio.sleep`` in the stub,
+so chat throughput measures the app's own CPU cost per request; more
+workers only help up to the number of cores available.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --documents 20 --pages 20
+    python -m benchmarks.bench_workers --workers 1 4 --concurrency 64 --requests 2000 --output workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.bench_e2e import Server, _git_commit, _read_status_kb, run_chat_level, run_uploads
+from benchmarks.stub_openai import running_stub
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of ``pid`` (the uvicorn workers of its supervisor)."""
+    pids = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def pss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def worker_memory(server: Server, workers: int) -> Dict[str, Optional[float]]:
+    pids = child_pids(server.process.pid) if workers > 1 else [server.process.pid]
+    rss = [_read_status_kb(pid, "VmRSS") for pid in pids]
+    pss = [pss_kb(pid) for pid in pids]
+    return {
+        "processes": len(pids),
+        "rss_total_mb": round(sum(rss) / 1024, 1) if pids and None not in rss else None,
+        "pss_total_mb": round(sum(pss) / 1024, 1) if pids and None not in pss else None,
+    }
+
+
+async def _worker_statuses(url: str, count: int) -> List[dict]:
+    """``/status`` from ``count`` new connections, which the kernel spreads over the workers."""
+    async def fetch():
+        async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+            return (await client.get("/status")).json()
+    return await asyncio.gather(*(fetch() for _ in range(count)))
+
+
+async def wait_all_ready(url: str, workers: int, timeout: float = 120) -> None:
+    """Wait until every worker has built its agent (``/status`` builds it on first use)."""
+    deadline = time.monotonic() + timeout
+    ready = set()
+    while len(ready) < workers:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Only {len(ready)} of {workers} workers became ready")
+        for status in await _worker_statuses(url, workers * 4):
+            if status["rag_agent_ready"]:
+                ready.add(status["worker"]["pid"] if status.get("worker") else None)
+
+
+async def wait_converged(url: str, workers: int, timeout: float = 60) -> float:
+    """Seconds until every worker reports the same chunk count."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        chunks: Dict[Optional[int], int] = {}
+        for status in await _worker_statuses(url, workers * 4):
+            chunks[status["worker"]["pid"] if status.get("worker") else None] = status["chunks_indexed"]
+        if len(chunks) >= workers and len(set(chunks.values())) == 1:
+            return time.perf_counter() - started
+        await asyncio.sleep(0.05)
+    raise RuntimeError("Workers did not converge on the same index")
+
+
+async def run_worker_count(server: Server, workers: int, pdf_paths: List[str], args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    await asyncio.to_thread(server.wait_ready)
+    await wait_all_ready(server.url, workers)
+    async with httpx.AsyncClient(base_url=server.url, timeout=600, limits=limits) as client:
+        upload = await run_uploads(client, pdf_paths, args.upload_concurrency)
+        propagation = await wait_converged(server.url, workers)
+        idle_memory = worker_memory(server, workers)
+        chat = await run_chat_level(client, args.concurrency, args.requests, False, workers)
+        status = (await client.get("/status")).json()
+    return {
+        "workers": workers,
+        "upload": upload,
+        "propagation_seconds": round(propagation, 3),
+        "chat": chat,
+        "memory_after_upload": idle_memory,
+        "memory_after_chat": worker_memory(server, workers),
+        "chunks_indexed": status.get("chunks_indexed"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="uvicorn application to benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=1024, help="chat requests per worker count")
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--server-env", nargs="*", default=[], metavar="NAME=VALUE",
+        help="extra environment for the server, e.g. RETRIEVAL_MODE=dense"
+    )
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server_env = dict(item.split("=", 1) for item in args.server_env)
+    # Answers would otherwise be served from the cache after the first run of a question
+    server_env.setdefault("ANSWER_CACHE_SIZE", "0")
+    runs = []
+    with tempfile.TemporaryDirectory() as source_dir:
+        pdf_paths = [
+            write_synthetic_pdf(os.path.join(source_dir, f"workers-{i:04d}.pdf"), pages=args.pages, seed=i)
+            for i in range(args.documents)
+        ]
+        with running_stub(embedding_latency=args.embedding_latency, chat_latency=args.chat_latency) as base_url:
+            for workers in args.workers:
+                with tempfile.TemporaryDirectory() as workdir:
+                    env = dict(server_env, MULTI_WORKER="true" if workers > 1 else "false")
+                    server = Server(args.app, base_url, workdir, env, workers=workers)
+                    try:
+                        runs.append(asyncio.run(run_worker_count(server, workers, pdf_paths, args)))
+                    finally:
+                        server.stop()
+                print(f"{workers} workers: {runs[-1]['chat']['requests_per_second']} req/s", flush=True)
+
+    baseline = next((run for run in runs if run["workers"] == 1), None)
+    for run in runs:
+        if baseline and baseline["chat"]["requests_per_second"]:
+            run["scaling_efficiency"] = round(
+                run["chat"]["requests_per_second"] / (run["workers"] * baseline["chat"]["requests_per_second"]), 2
+            )
+
+    report = {
+        "benchmark": "workers",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
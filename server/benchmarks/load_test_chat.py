@@ -0,0 +1,81 @@
+"""
+Load test the chat pipeline against the local stub OpenAI server.
+
+Each simulated client sends questions back to back from a single event loop,
+as concurrent requests would inside one uvicorn worker. The "sync" mode calls
+the blocking ``ask`` from the loop, which is what the ``/chat`` handler used to
+do; the "async" mode awaits ``aask``. The answer and retrieval caches are
+turned off, so every request costs a chat and an embedding call. Reports
+requests/sec per concurrency level for both.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.load_test_chat --concurrency 1 10 100 --chat-latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.stub_openai import running_stub
+
+CV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pdfs", "Akshay_Fullstack_AI_CV.pdf")
+
+
+async def run_level(agent, mode: str, concurrency: int, requests: int) -> dict:
+    per_client = max(1, requests // concurrency)
+
+    async def client(client_id: int):
+        for turn in range(per_client):
+            question = f"What does the document say about topic {turn}?"
+            if mode == "sync":
+                agent.ask(question, session_id=f"{mode}-{concurrency}-{client_id}")
+            else:
+                await agent.aask(question, session_id=f"{mode}-{concurrency}-{client_id}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    total = per_client * concurrency
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(total / elapsed, 2),
+    }
+
+
+async def run(base_url: str, args) -> list:
+    from my_rag import MyRAGAgent
+
+    # Clients repeat each other's questions; every request must reach the
+    # stub server rather than a cache
+    for name in ("ANSWER_CACHE_SIZE", "RETRIEVAL_CACHE_SIZE", "QUERY_EMBEDDING_CACHE_SIZE"):
+        os.environ[name] = "0"
+    agent = MyRAGAgent(openai_api_key="sk-stub", openai_base_url=base_url)
+    agent.load_documents([CV_PATH])
+
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            results.append(await run_level(agent, mode, concurrency, args.requests))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--chat-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with running_stub(chat_latency=args.chat_latency, embedding_latency=args.embedding_latency) as base_url:
+        results = asyncio.run(run(base_url, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
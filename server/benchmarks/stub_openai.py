@@ -0,0 +1,234 @@
+"""
+A local stub of the OpenAI embeddings and chat completions APIs.
+
+Embeddings are deterministic pseudo-random unit vectors derived from a hash of
+each input, and chat completions return a fixed number of filler tokens, with
+optional streaming. Latencies are configurable so benchmarks can model a
+remote API without network access or cost, and the embeddings endpoint can
+answer 429 at random or once a requests-per-minute limit is exceeded.
+
+Usage (from the ``server`` directory):
+    python -m benchmarks.stub_openai --port 9100 --chat-latency 0.2 --token-delay 0.01
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=sk-stub uvicorn main:app
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def fake_embedding(text, dim: int) -> np.ndarray:
+    """Deterministic unit vector for a string (or list of token ids)."""
+    seed = hashlib.sha256(json.dumps(text).encode("utf-8")).digest()[:8]
+    vector = np.random.default_rng(int.from_bytes(seed, "little")).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(
+    dim: int = 256,
+    embedding_latency: float = 0.0,
+    chat_latency: float = 0.0,
+    token_delay: float = 0.0,
+    answer_tokens: int = 50,
+    error_rate: float = 0.0,
+    rpm_limit: int = 0
+) -> FastAPI:
+    """
+    Build the stub application.
+
+    Args:
+        dim (int): Embedding dimension
+        embedding_latency (float): Seconds added to every embeddings request
+        chat_latency (float): Seconds before the first chat token
+        token_delay (float): Seconds between streamed chat tokens
+        answer_tokens (int): Number of tokens in every chat answer
+        error_rate (float): Fraction of embeddings requests answered with 429
+        rpm_limit (int): Embeddings requests per minute before answering 429,
+            refilled continuously with one second of burst; unlimited when 0
+    """
+    app = FastAPI(title="Stub OpenAI API")
+    app.state.counters = {
+        "embedding_requests": 0,
+        "embedded_inputs": 0,
+        "chat_requests": 0,
+        "rate_limited": 0,
+    }
+    bucket = {"tokens": max(1.0, rpm_limit / 60), "updated": time.monotonic()}
+
+    def rate_limited(retry_after: float) -> JSONResponse:
+        app.state.counters["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": f"{retry_after:.3f}"},
+            content={"error": {
+                "message": "Rate limit reached for requests",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }},
+        )
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        if rpm_limit:
+            now = time.monotonic()
+            rate = rpm_limit / 60
+            bucket["tokens"] = min(max(1.0, rate), bucket["tokens"] + (now - bucket["updated"]) * rate)
+            bucket["updated"] = now
+            if bucket["tokens"] < 1:
+                return rate_limited((1 - bucket["tokens"]) / rate)
+            bucket["tokens"] -= 1
+        if random.random() < error_rate:
+            return rate_limited(0.2)
+        app.state.counters["embedding_requests"] += 1
+        app.state.counters["embedded_inputs"] += len(inputs)
+        await asyncio.sleep(embedding_latency)
+        data = []
+        for index, text in enumerate(inputs):
+            vector = fake_embedding(text, body.get("dimensions") or dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub-embedding"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.counters["chat_requests"] += 1
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "stub-chat")
+        tokens = [f"token{i} " for i in range(answer_tokens)]
+        usage = {"prompt_tokens": 1, "completion_tokens": answer_tokens, "total_tokens": answer_tokens + 1}
+
+        if not body.get("stream"):
+            await asyncio.sleep(chat_latency + token_delay * answer_tokens)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        async def stream():
+            await asyncio.sleep(chat_latency)
+            for token in tokens:
+                await asyncio.sleep(token_delay)
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.counters
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_stub(**options):
+    """
+    Run the stub in a subprocess for the duration of a ``with`` block.
+
+    Keyword arguments are passed as command line options, e.g.
+    ``running_stub(chat_latency=0.2)``. Yields the ``/v1`` base URL.
+    """
+    port = free_port()
+    args = [sys.executable, "-m", "benchmarks.stub_openai", "--port", str(port)]
+    for name, value in options.items():
+        args += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(args, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    raise RuntimeError("Stub OpenAI server failed to start")
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/v1"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--embedding-latency", type=float, default=0.0)
+    parser.add_argument("--chat-latency", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--answer-tokens", type=int, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm-limit", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(
+        dim=args.dim,
+        embedding_latency=args.embedding_latency,
+        chat_latency=args.chat_latency,
+        token_delay=args.token_delay,
+        answer_tokens=args.answer_tokens,
+        error_rate=args.error_rate,
+        rpm_limit=args.rpm_limit,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Generate synthetic text PDFs for offline benchmarks.
+
+Usage:
+    python -m benchmarks.synthetic_pdf out.pdf --pages 500
+"""
+import argparse
+import random
+from typing import List
+
+WORDS = (
+    "retrieval augmented generation document vector embedding chunk index query "
+    "answer context model token latency throughput memory section table figure "
+    "report analysis result method dataset training evaluation metric baseline "
+    "system server client request response cache storage batch stream worker"
+).split()
+
+
+def _page_lines(rng: random.Random, lines_per_page: int, page_number: int) -> List[str]:
+    lines = [f"Section {page_number}.1 part number PN-{page_number:05d}"]
+    for _ in range(lines_per_page - 1):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))))
+    return lines
+
+
+def write_synthetic_pdf(path: str, pages: int = 500, lines_per_page: int = 45, seed: int = 0) -> str:
+    """
+    Write a PDF with ``pages`` pages of pseudo-random English-like text.
+
+    Args:
+        path (str): Output file path
+        pages (int): Number of pages to generate
+        lines_per_page (int): Lines of text on each page
+        seed (int): Seed for the word generator so runs are reproducible
+
+    Returns:
+        str: The output path
+    """
+    rng = random.Random(seed)
+    # Object 1: catalog, 2: page tree, 3: font, then a (page, content) pair per page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page_number in range(1, pages + 1):
+        text = "\n".join(f"({line}) Tj T*" for line in _page_lines(rng, lines_per_page, page_number))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}\nET".encode("latin-1")
+        page_id = len(objects) + 1
+        content_id = page_id + 1
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode("latin-1")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--lines-per-page", type=int, default=45)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_synthetic_pdf(args.path, args.pages, args.lines_per_page, args.seed)
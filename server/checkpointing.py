@@ -0,0 +1,162 @@
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from langgraph.checkpoint.memory import InMemorySaver
+from typing_extensions import Deque, Dict, Optional, Set, Tuple
+
+from collections import defaultdict, deque
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_MODES = ("bounded", "sqlite", "none", "memory")
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    An in-memory checkpointer that keeps only the latest ``max_checkpoints``
+    checkpoints of each thread.
+
+    Older checkpoints, their pending writes and any channel blobs no longer
+    referenced by a kept checkpoint are dropped, or archived to a local SQLite
+    file when ``archive_path`` is set. The RAG graph has no ``DeltaChannel``
+    state, so pruning intermediate checkpoints never breaks reconstruction.
+    """
+
+    def __init__(self, max_checkpoints: int = 2, archive_path: Optional[str] = None):
+        """
+        Args:
+            max_checkpoints (int): Checkpoints kept in memory per thread and namespace
+            archive_path (Optional[str]): SQLite file receiving pruned checkpoints
+        """
+        super().__init__()
+        self.max_checkpoints = max(1, max_checkpoints)
+        self.archive_path = archive_path
+        # (thread_id, checkpoint_ns) -> ids and channel versions of kept checkpoints, oldest first
+        self._history: Dict[Tuple[str, str], Deque[Tuple[str, ChannelVersions]]] = defaultdict(deque)
+        # (thread_id, checkpoint_ns) -> blob keys written for that thread
+        self._blob_keys: Dict[Tuple[str, str], Set[tuple]] = defaultdict(set)
+        self._pruned = 0
+        self._lock = threading.Lock()
+        self._archive = None
+        if archive_path:
+            os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+            self._archive = sqlite3.connect(archive_path, check_same_thread=False)
+            self._archive.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, payload BLOB, "
+                "PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+            )
+            self._archive.commit()
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Save a checkpoint, then prune the thread down to ``max_checkpoints``."""
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            key = (thread_id, checkpoint_ns)
+            self._blob_keys[key].update((thread_id, checkpoint_ns, k, v) for k, v in new_versions.items())
+            self._history[key].append((checkpoint["id"], dict(checkpoint["channel_versions"])))
+            if len(self._history[key]) > self.max_checkpoints:
+                self._prune(thread_id, checkpoint_ns)
+            return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint, write and blob of a thread."""
+        with self._lock:
+            for key in [key for key in self._history if key[0] == thread_id]:
+                _, checkpoint_ns = key
+                for checkpoint_id, _ in self._history.pop(key):
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                for blob_key in self._blob_keys.pop(key, ()):
+                    self.blobs.pop(blob_key, None)
+            self.storage.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of threads, checkpoints and blobs held in memory."""
+        with self._lock:
+            return {
+                "threads": len(self.storage),
+                "checkpoints": sum(len(history) for history in self._history.values()),
+                "blobs": len(self.blobs),
+                "pruned": self._pruned,
+            }
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        key = (thread_id, checkpoint_ns)
+        history = self._history[key]
+        archived = []
+        while len(history) > self.max_checkpoints:
+            checkpoint_id, _ = history.popleft()
+            saved = self.storage[thread_id][checkpoint_ns].pop(checkpoint_id, None)
+            writes = self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            if self._archive is not None and saved is not None:
+                archived.append((thread_id, checkpoint_ns, checkpoint_id, saved, writes))
+            self._pruned += 1
+
+        live = {(thread_id, checkpoint_ns, channel, version)
+                for _, versions in history for channel, version in versions.items()}
+        stale = self._blob_keys[key] - live
+        blobs = {}
+        for blob_key in stale:
+            blob = self.blobs.pop(blob_key, None)
+            if blob is not None:
+                blobs[blob_key] = blob
+        self._blob_keys[key] = self._blob_keys[key] & live
+
+        if archived:
+            self._archive.executemany(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+                [(t, ns, cid, pickle.dumps({"checkpoint": saved, "writes": writes, "blobs": blobs}))
+                 for t, ns, cid, saved, writes in archived]
+            )
+            self._archive.commit()
+
+
+ARCHIVE_FILENAME = "checkpoints.sqlite"
+
+
+def make_checkpointer(
+    mode: str = "bounded",
+    max_checkpoints: int = 2,
+    archive_path: Optional[str] = None,
+    data_dir: Optional[str] = None
+):
+    """
+    Build the checkpointer for the conversation graph.
+
+    Args:
+        mode (str): "bounded" keeps the latest ``max_checkpoints`` per thread in
+            memory, "sqlite" additionally archives older ones to ``archive_path``,
+            "none" disables checkpointing and "memory" keeps every checkpoint
+        max_checkpoints (int): Checkpoints kept per thread in the bounded modes
+        archive_path (Optional[str]): SQLite archive file for the "sqlite" mode;
+            ``checkpoints.sqlite`` in ``data_dir`` when omitted
+        data_dir (Optional[str]): Directory holding the agent's data
+
+    Returns:
+        The checkpointer, or None when checkpointing is disabled
+    """
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Unknown checkpoint mode: {mode}. Expected one of {CHECKPOINT_MODES}")
+    if mode == "none":
+        return None
+    if mode == "memory":
+        return InMemorySaver()
+    if mode == "sqlite":
+        if not archive_path and data_dir:
+            archive_path = os.path.join(data_dir, ARCHIVE_FILENAME)
+        if not archive_path:
+            raise ValueError("The sqlite checkpoint mode requires an archive path or a data directory")
+        return BoundedMemorySaver(max_checkpoints=max_checkpoints, archive_path=archive_path)
+    return BoundedMemorySaver(max_checkpoints=max_checkpoints)
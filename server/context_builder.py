@@ -0,0 +1,298 @@
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from typing_extensions import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import functools
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PROMPT_HEADER = (
+    "You are a helpful AI assistant that answers questions based on provided documents "
+    "and conversation context.\n\n"
+)
+PROMPT_FOOTER = """
+
+Instructions:
+- Answer the question clearly and helpfully
+- Use information from the provided documents when relevant
+- If the documents don't contain relevant information, say so clearly
+- Be concise but comprehensive
+- Maintain conversation context when appropriate
+
+Answer:"""
+
+CONTEXT_LABEL = "Relevant Information:\n"
+HISTORY_LABEL = "Recent Conversation:\n"
+
+# Never keep a truncated passage shorter than this; it costs tokens without informing the answer
+MIN_TRUNCATED_TOKENS = 32
+
+
+class TokenCounter:
+    """
+    Counts tokens locally with tiktoken.
+
+    The encoding is loaded on first use. When it cannot be loaded (tiktoken
+    missing, or its encoding file cannot be downloaded) tokens are estimated
+    at four characters each, which is close for English text.
+    """
+
+    def __init__(self, encoding_name: str = "o200k_base", cache_size: int = 8192):
+        """
+        Args:
+            encoding_name (str): tiktoken encoding; o200k_base is the gpt-4o family's
+            cache_size (int): Number of texts whose token counts are memoised
+        """
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        # Chunk texts and history messages repeat across turns; str caches its
+        # hash, so a repeated lookup costs far less than re-encoding
+        self._cached_count = functools.lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(
+                            f"tiktoken encoding {self.encoding_name} unavailable ({e}); "
+                            "estimating 4 characters per token"
+                        )
+                    self._loaded = True
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from the tokenizer rather than an estimate."""
+        return self.encoding is not None
+
+    def count(self, text: str, cache: bool = True) -> int:
+        """
+        Count the tokens in ``text``.
+
+        Args:
+            text (str): Text to count
+            cache (bool): Memoise the count; texts seen only once, like whole
+                prompts, should not take up the cache
+
+        Returns:
+            int: Number of tokens
+        """
+        return self._cached_count(text) if cache else self._count(text)
+
+    def _count(self, text: str) -> int:
+        encoding = self.encoding
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of ``text`` that fits in ``max_tokens``."""
+        encoding = self.encoding
+        if encoding is None:
+            return text[:max_tokens * 4]
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+class BuiltPrompt(NamedTuple):
+    """A packed prompt and what went into it."""
+    text: str
+    stats: Dict[str, int]
+
+
+def _overlap(left: str, right: str, min_overlap: int, max_overlap: int) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``."""
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def deduplicate_chunks(docs: List[Document], max_overlap: int, min_overlap: int = 20) -> List[Document]:
+    """
+    Merge chunks that repeat each other's text.
+
+    The splitter makes neighbouring chunks of a page share up to
+    ``chunk_overlap`` characters, so when both are retrieved they are stitched
+    into one passage rather than sending the shared text twice. Identical
+    chunks, and chunks contained in another, are dropped. Passages keep the
+    position of their most relevant chunk.
+
+    Args:
+        docs (List[Document]): Retrieved chunks, most relevant first
+        max_overlap (int): Longest shared text to look for, normally the splitter's overlap
+        min_overlap (int): Shortest shared text treated as an overlap
+
+    Returns:
+        List[Document]: The merged passages, most relevant first
+    """
+    passages: List[Document] = []
+    for doc in docs:
+        text = doc.page_content
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        for i, passage in enumerate(passages):
+            if (passage.metadata.get("source"), passage.metadata.get("page")) != key:
+                continue
+            kept = passage.page_content
+            if text in kept:
+                break
+            if kept in text:
+                merged = text
+            else:
+                size = _overlap(kept, text, min_overlap, max_overlap)
+                if size:
+                    merged = kept + text[size:]
+                else:
+                    size = _overlap(text, kept, min_overlap, max_overlap)
+                    if not size:
+                        continue
+                    merged = text + kept[size:]
+            passages[i] = Document(id=passage.id, page_content=merged, metadata=passage.metadata)
+            break
+        else:
+            passages.append(doc)
+    return passages
+
+
+class ContextBuilder:
+    """
+    Assembles the generation prompt within a token budget.
+
+    The fixed instructions and the question are always included. Recent
+    conversation history is added newest first up to ``max_history_tokens``,
+    then retrieved passages, most relevant first, fill what remains of
+    ``max_prompt_tokens``. A message or passage that does not fit whole is
+    truncated once to the space left, and everything after it is dropped.
+    """
+
+    def __init__(
+        self,
+        counter: Optional[TokenCounter] = None,
+        max_prompt_tokens: int = 3000,
+        max_history_tokens: int = 1000,
+        max_history_messages: int = 10,
+        chunk_overlap: int = 200
+    ):
+        """
+        Args:
+            counter (Optional[TokenCounter]): Token counter; o200k_base when omitted
+            max_prompt_tokens (int): Budget for the whole prompt
+            max_history_tokens (int): Share of the budget conversation history may use
+            max_history_messages (int): Most recent messages considered for history
+            chunk_overlap (int): Overlap between neighbouring chunks, used for deduplication
+        """
+        self.counter = counter or TokenCounter()
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_history_tokens = max_history_tokens
+        self.max_history_messages = max_history_messages
+        self.chunk_overlap = chunk_overlap
+        self._lock = threading.Lock()
+        self._totals = {"requests": 0, "prompt_tokens": 0, "max_prompt_tokens": 0, "tokens_trimmed": 0}
+
+    def build(self, question: str, context_docs: List[Document], messages: List[BaseMessage]) -> BuiltPrompt:
+        """
+        Pack a prompt for ``question``.
+
+        Args:
+            question (str): The current question
+            context_docs (List[Document]): Retrieved chunks, most relevant first
+            messages (List[BaseMessage]): Conversation history, oldest first
+
+        Returns:
+            BuiltPrompt: The prompt text and token accounting: ``prompt_tokens``,
+            ``context_tokens``, ``history_tokens``, ``chunks_used``,
+            ``chunks_deduplicated``, ``history_messages`` and ``tokens_trimmed``
+            (tokens of candidate content left out)
+        """
+        count = self.counter.count
+        question_section = f"Current Question: {question}"
+        remaining = (
+            self.max_prompt_tokens
+            - count(PROMPT_HEADER) - count(PROMPT_FOOTER) - count(question_section)
+            - count(CONTEXT_LABEL) - count(HISTORY_LABEL)
+        )
+
+        recent = messages[-self.max_history_messages:] if self.max_history_messages else []
+        history_lines, history_tokens, history_trimmed = self._pack(
+            [f"{msg.type.capitalize()}: {msg.content}" for msg in reversed(recent)],
+            min(self.max_history_tokens, remaining)
+        )
+        history_lines.reverse()
+        remaining -= history_tokens
+
+        passages = deduplicate_chunks(context_docs, self.chunk_overlap)
+        context_parts, context_tokens, context_trimmed = self._pack(
+            [f"Document {i + 1}:\n{passage.page_content}" for i, passage in enumerate(passages)],
+            remaining
+        )
+
+        context_section = CONTEXT_LABEL + "\n\n".join(context_parts) + "\n\n" if context_parts else ""
+        history_section = HISTORY_LABEL + "\n".join(history_lines) + "\n\n" if history_lines else ""
+        text = f"{PROMPT_HEADER}{context_section}{history_section}{question_section}{PROMPT_FOOTER}"
+
+        stats = {
+            "prompt_tokens": count(text, cache=False),
+            "context_tokens": context_tokens,
+            "history_tokens": history_tokens,
+            "chunks_used": len(context_parts),
+            "chunks_deduplicated": len(context_docs) - len(passages),
+            "history_messages": len(history_lines),
+            "tokens_trimmed": history_trimmed + context_trimmed,
+        }
+        with self._lock:
+            self._totals["requests"] += 1
+            self._totals["prompt_tokens"] += stats["prompt_tokens"]
+            self._totals["max_prompt_tokens"] = max(self._totals["max_prompt_tokens"], stats["prompt_tokens"])
+            self._totals["tokens_trimmed"] += stats["tokens_trimmed"]
+        return BuiltPrompt(text, stats)
+
+    def _pack(self, parts: List[str], budget: int) -> Tuple[List[str], int, int]:
+        """
+        Take ``parts`` in order while they fit in ``budget``.
+
+        Every part is charged one extra token for the separator that follows
+        it. The first part that does not fit is truncated to the space left,
+        if that is worth keeping, and every later part is dropped.
+
+        Returns:
+            Tuple[List[str], int, int]: The packed parts, their tokens and the tokens left out
+        """
+        packed: List[str] = []
+        used = 0
+        trimmed = 0
+        full = False
+        for part in parts:
+            tokens = self.counter.count(part) + 1
+            if not full and tokens <= budget - used:
+                packed.append(part)
+                used += tokens
+                continue
+            if not full and budget - used >= MIN_TRUNCATED_TOKENS:
+                part = self.counter.truncate(part, budget - used - 1)
+                packed.append(part)
+                used += self.counter.count(part) + 1
+                tokens -= self.counter.count(part) + 1
+            full = True
+            trimmed += tokens
+        return packed, used, trimmed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the budget, the tokenizer in use and prompt token totals."""
+        with self._lock:
+            totals = dict(self._totals)
+        requests = totals["requests"]
+        return {
+            "budget_tokens": self.max_prompt_tokens,
+            "exact_token_counts": self.counter.exact,
+            **totals,
+            "avg_prompt_tokens": round(totals["prompt_tokens"] / requests, 1) if requests else 0.0,
+        }
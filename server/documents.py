@@ -0,0 +1,239 @@
+from typing_extensions import Any, Dict, List, Optional, Tuple
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> Tuple[int, str]:
+    """
+    Hash a file in fixed-size chunks.
+
+    Returns:
+        Tuple[int, str]: The size in bytes and the SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+class DocumentRecord:
+    """
+    One indexed document and the vector store rows holding its chunks.
+    """
+
+    def __init__(
+        self,
+        sha256: str,
+        filename: str,
+        path: str,
+        size_bytes: int,
+        chunk_ranges: Optional[List[List[int]]] = None,
+        pages: int = 0,
+        added_at: Optional[float] = None
+    ):
+        """
+        Args:
+            sha256 (str): SHA-256 digest of the file content
+            filename (str): Name the document was uploaded as
+            path (str): Location of the file on disk
+            size_bytes (int): File size
+            chunk_ranges (Optional[List[List[int]]]): ``[start, end)`` row ranges
+                of the document's chunks in the vector store
+            pages (int): Number of pages parsed
+            added_at (Optional[float]): When the document was indexed
+        """
+        # Documents are identified by their content
+        self.id = sha256[:16]
+        self.sha256 = sha256
+        self.filename = filename
+        self.path = path
+        self.size_bytes = size_bytes
+        self.chunk_ranges = chunk_ranges or []
+        self.pages = pages
+        self.added_at = added_at or time.time()
+
+    @property
+    def chunks(self) -> int:
+        return sum(end - start for start, end in self.chunk_ranges)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable snapshot of the record."""
+        return {
+            "document_id": self.id,
+            "sha256": self.sha256,
+            "filename": self.filename,
+            "path": self.path,
+            "size_bytes": self.size_bytes,
+            "chunk_ranges": [list(r) for r in self.chunk_ranges],
+            "chunks": self.chunks,
+            "pages": self.pages,
+            "added_at": self.added_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DocumentRecord":
+        return cls(
+            sha256=data["sha256"],
+            filename=data["filename"],
+            path=data["path"],
+            size_bytes=data["size_bytes"],
+            chunk_ranges=data["chunk_ranges"],
+            pages=data.get("pages", 0),
+            added_at=data.get("added_at"),
+        )
+
+
+class DocumentRegistry:
+    """
+    The set of indexed documents, keyed by content hash, persisted as a small
+    JSON file next to the vector store.
+
+    Each document records the vector store row ranges of its chunks, so a
+    document can be replaced or deleted without touching any other rows.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Load (or create) a registry.
+
+        Args:
+            path (Optional[str]): JSON file the registry is persisted to; kept in
+                memory only when omitted
+        """
+        self.path = path
+        self._documents: Dict[str, DocumentRecord] = {}
+        self._lock = threading.Lock()
+        # (mtime, size) of the file as last read or written
+        self._stamp: Optional[Tuple[int, int]] = None
+        if path and os.path.exists(path):
+            self._load()
+            logger.info(f"Loaded {len(self._documents)} documents from {path}")
+
+    def _load(self) -> None:
+        with open(self.path) as f:
+            stat = os.fstat(f.fileno())
+            documents = {}
+            for data in json.load(f)["documents"]:
+                record = DocumentRecord.from_dict(data)
+                documents[record.id] = record
+        self._documents = documents
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def reload(self) -> bool:
+        """
+        Re-read the registry if another process has rewritten its file.
+
+        Returns:
+            bool: Whether the registry was re-read
+        """
+        if not self.path:
+            return False
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if not self._documents:
+                    return False
+                self._documents = {}
+                self._stamp = None
+                return True
+            if (stat.st_mtime_ns, stat.st_size) == self._stamp:
+                return False
+            self._load()
+            return True
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def get(self, document_id: str) -> Optional[DocumentRecord]:
+        return self._documents.get(document_id)
+
+    def find_by_hash(self, sha256: str) -> Optional[DocumentRecord]:
+        record = self._documents.get(sha256[:16])
+        return record if record is not None and record.sha256 == sha256 else None
+
+    def find_by_filename(self, filename: str) -> Optional[DocumentRecord]:
+        for record in self._documents.values():
+            if record.filename == filename:
+                return record
+        return None
+
+    def list(self) -> List[DocumentRecord]:
+        """Return every document, oldest first."""
+        return sorted(self._documents.values(), key=lambda record: record.added_at)
+
+    @property
+    def total_chunks(self) -> int:
+        return sum(record.chunks for record in self._documents.values())
+
+    def add(self, record: DocumentRecord) -> None:
+        """Register a document, replacing any record with the same id."""
+        with self._lock:
+            self._documents[record.id] = record
+            self._save()
+
+    def remove(self, document_id: str) -> Optional[DocumentRecord]:
+        """Unregister a document and return its record, if it was registered."""
+        with self._lock:
+            record = self._documents.pop(document_id, None)
+            if record is not None:
+                self._save()
+            return record
+
+    def remap(self, remap: np.ndarray) -> None:
+        """
+        Renumber every chunk range after the vector store was compacted.
+
+        Args:
+            remap (np.ndarray): For every old row its new index, or -1 if deleted
+        """
+        with self._lock:
+            for record in self._documents.values():
+                rows = np.concatenate(
+                    [remap[start:end] for start, end in record.chunk_ranges] or [np.empty(0, dtype=np.int64)]
+                )
+                rows = rows[rows >= 0]
+                record.chunk_ranges = _to_ranges(rows)
+            self._save()
+
+    def clear(self) -> None:
+        """Unregister every document."""
+        with self._lock:
+            self._documents.clear()
+            self._save()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"documents": [record.to_dict() for record in self.list()]}, f)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+
+
+def _to_ranges(rows: np.ndarray) -> List[List[int]]:
+    """Collapse sorted row indices into ``[start, end)`` ranges."""
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(rows)]])
+    return [[int(rows[s]), int(rows[e - 1]) + 1] for s, e in zip(starts, ends)]
@@ -0,0 +1,184 @@
+from langchain_core.embeddings import Embeddings
+from typing_extensions import Dict, List, Optional
+
+from array import array
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from embedding_pipeline import PartialEmbeddingError
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    An embeddings wrapper that stores document embeddings in an on-disk SQLite
+    cache keyed by a hash of the model name and chunk text, so unchanged chunks
+    are never sent to the embedding API twice.
+
+    The cache is bounded by size and evicts the least recently used entries.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        path: str,
+        model_name: Optional[str] = None,
+        max_bytes: int = 512 * 1024 * 1024
+    ):
+        """
+        Open (or create) the embedding cache.
+
+        Args:
+            underlying (Embeddings): Embeddings model used on cache misses
+            path (str): Path of the SQLite cache file
+            model_name (Optional[str]): Name mixed into every cache key; defaults
+                to the underlying model's ``model`` attribute
+            max_bytes (int): Upper bound on the size of stored vectors
+        """
+        self.underlying = underlying
+        self.path = path
+        self.model_name = model_name or getattr(underlying, "model", type(underlying).__name__)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+        logger.info(f"Embedding cache opened at {path} ({self._size_bytes} bytes)")
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, serving previously seen chunks from the cache.
+
+        Args:
+            texts (List[str]): Chunk texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per input text
+        """
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(keys)
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        miss_count = sum(1 for key in keys if key not in found)
+        with self._lock:
+            self.hits += len(keys) - miss_count
+            self.misses += miss_count
+
+        if missing:
+            missing_keys = list(missing.keys())
+            try:
+                vectors = self.underlying.embed_documents(list(missing.values()))
+            except PartialEmbeddingError as e:
+                # Keep the batches that made it so a retry only re-embeds the rest
+                self._store({missing_keys[i]: vector for i, vector in e.completed.items()})
+                raise
+            new_entries = dict(zip(missing_keys, vectors))
+            self._store(new_entries)
+            found.update(new_entries)
+
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query. Queries are not cached."""
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query asynchronously. Queries are not cached."""
+        return await self.underlying.aembed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries in batched requests. Queries are not cached."""
+        return self.underlying.embed_queries(texts)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and the current cache size."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well under SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, entries: Dict[str, List[float]]) -> None:
+        now = time.time()
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in entries.items()]
+        with self._lock:
+            # Rows that are replaced no longer count towards the size
+            replaced = 0
+            keys = list(entries)
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            self._size_bytes += sum(len(row[1]) for row in rows) - replaced
+            if self._size_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used ASC")
+        evicted = []
+        for key, size in cursor:
+            if self._size_bytes <= target:
+                break
+            evicted.append((key,))
+            self._size_bytes -= size
+        cursor.close()
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} entries from embedding cache")
@@ -0,0 +1,296 @@
+from langchain_core.embeddings import Embeddings
+from typing_extensions import Dict, List, Optional
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import random
+import threading
+import time
+
+import httpx
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for throttling: about four characters per token."""
+    return len(text) // 4 + 1
+
+
+class PartialEmbeddingError(Exception):
+    """
+    Raised when some batches could not be embedded after every retry.
+
+    ``completed`` maps the index of every text that was embedded to its vector,
+    so callers can keep that work.
+    """
+
+    def __init__(self, message: str, completed: Dict[int, List[float]]):
+        super().__init__(message)
+        self.completed = completed
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously at ``rate_per_minute``.
+
+    Providers enforce per-minute limits over shorter windows, so the default
+    burst is one second's worth rather than a whole minute's.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute (float): Tokens added per minute
+            capacity (Optional[float]): Maximum burst; defaults to one second's worth
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Block until ``amount`` tokens are available and take them.
+
+        Requests larger than the capacity are let through once the bucket is
+        full, so they are slowed down rather than blocked forever.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait, if the error carries a Retry-After header."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    # Connection failures and timeouts from the OpenAI client or httpx
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)) or \
+        type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+class EmbeddingPipeline(Embeddings):
+    """
+    An embeddings wrapper that splits document embedding into batches and runs
+    them with bounded concurrency, throttled to a tokens-per-minute and
+    requests-per-minute budget.
+
+    A batch that fails with a rate limit or a transient error is retried on its
+    own with exponential backoff (honouring ``Retry-After``), while the other
+    batches carry on. A rate limit also pauses every worker for the requested
+    time, so concurrent batches do not keep hitting the limit. Query embeddings
+    get the same retries but skip the throttle, so chat latency does not
+    depend on ingestion load.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        tokens_per_minute: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0
+    ):
+        """
+        Args:
+            underlying (Embeddings): Embeddings model that embeds each batch
+            batch_size (int): Number of texts per embedding request
+            max_concurrency (int): Maximum number of requests in flight
+            tokens_per_minute (Optional[int]): Token budget; unlimited when None
+            requests_per_minute (Optional[int]): Request budget; unlimited when None
+            max_retries (int): Retries per batch before giving up
+            backoff_base (float): First retry delay in seconds, doubled on every attempt
+            backoff_max (float): Upper bound on a single retry delay
+        """
+        self.underlying = underlying
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.model = getattr(underlying, "model", type(underlying).__name__)
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents in concurrent, throttled batches.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per input text
+
+        Raises:
+            PartialEmbeddingError: If a batch still fails after every retry; the
+                embeddings of the batches that succeeded are attached
+        """
+        if not texts:
+            return []
+        starts = list(range(0, len(texts), self.batch_size))
+        if len(starts) == 1:
+            return self._embed_batch(texts)
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        errors = []
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(starts)),
+            thread_name_prefix="embed"
+        ) as pool:
+            futures = {
+                start: pool.submit(self._embed_batch, texts[start:start + self.batch_size])
+                for start in starts
+            }
+            for start, future in futures.items():
+                try:
+                    results[start:start + self.batch_size] = future.result()
+                except Exception as e:
+                    errors.append(e)
+
+        if errors:
+            completed = {i: vector for i, vector in enumerate(results) if vector is not None}
+            logger.error(f"{len(errors)} of {len(starts)} embedding batches failed: {errors[0]}")
+            raise PartialEmbeddingError(
+                f"{len(errors)} of {len(starts)} embedding batches failed: {errors[0]}",
+                completed
+            ) from errors[0]
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, retrying transient errors. Queries are never throttled."""
+        attempt = 0
+        while True:
+            try:
+                with timed("embed_query"):
+                    return self.underlying.embed_query(text)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, "Query embedding")
+                attempt += 1
+                time.sleep(delay)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query asynchronously, retrying transient errors."""
+        attempt = 0
+        while True:
+            try:
+                with timed("embed_query"):
+                    return await self.underlying.aembed_query(text)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, "Query embedding")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed many queries with one request per ``batch_size`` of them, retrying
+        transient errors. Like single queries they are never throttled.
+        """
+        results: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            attempt = 0
+            while True:
+                with self._lock:
+                    self.requests += 1
+                try:
+                    with timed("embed_query_batch"):
+                        results.extend(self.underlying.embed_documents(batch))
+                    break
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, f"Query embedding batch of {len(batch)}")
+                    attempt += 1
+                    time.sleep(delay)
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """Return request, retry and throttling counters."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+            }
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(text) for text in batch)
+        attempt = 0
+        while True:
+            waited = max(0.0, self._paused_until - time.monotonic())
+            if waited:
+                time.sleep(waited)
+            if self._requests is not None:
+                waited += self._requests.acquire()
+            if self._tokens is not None:
+                waited += self._tokens.acquire(tokens)
+            with self._lock:
+                self.requests += 1
+                self.throttled_seconds += waited
+
+            try:
+                with timed("embed"):
+                    return self.underlying.embed_documents(batch)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, f"Embedding batch of {len(batch)}")
+                attempt += 1
+                time.sleep(delay)
+
+    def _retry_delay(self, error: Exception, attempt: int, what: str) -> float:
+        """Return how long to wait before retrying, or re-raise ``error`` if it should not be retried."""
+        if attempt >= self.max_retries or not _is_retryable(error):
+            raise error
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = _retry_after(error)
+        with self._lock:
+            self.retries += 1
+            if getattr(error, "status_code", None) == 429:
+                self.rate_limited += 1
+                # Hold every worker back until the server's window reopens
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        if retry_after:
+            delay = max(delay, retry_after)
+        logger.warning(f"{what} failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+        return delay
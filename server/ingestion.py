@@ -0,0 +1,180 @@
+from typing_extensions import Any, Callable, Dict, List, Optional
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept another job."""
+
+
+class IngestionJob:
+    """
+    Tracks the lifecycle and progress of a single document ingestion job.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self, filename: str, job_id: Optional[str] = None):
+        """
+        Create a new job in the queued state.
+
+        Args:
+            filename (str): Name of the file being ingested
+            job_id (Optional[str]): Id to use instead of a new random one
+        """
+        self.id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.status = self.QUEUED
+        self.error: Optional[str] = None
+        self.progress = {
+            "pages_parsed": 0,
+            "chunks_split": 0,
+            "chunks_embedded": 0,
+        }
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def advance(self, stage: str, count: int) -> None:
+        """
+        Add to one of the progress counters.
+
+        Args:
+            stage (str): One of "pages_parsed", "chunks_split" or "chunks_embedded"
+            count (int): Number of items processed since the last update
+        """
+        with self._lock:
+            self.progress[stage] = self.progress.get(stage, 0) + count
+
+    @property
+    def done(self) -> bool:
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable snapshot of the job."""
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "filename": self.filename,
+                "status": self.status,
+                "error": self.error,
+                "progress": dict(self.progress),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class IngestionQueue:
+    """
+    A bounded queue that runs ingestion jobs on a fixed-size worker pool so that
+    PDF parsing and embedding never block the event loop.
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, max_finished_jobs: int = 100):
+        """
+        Initialize the worker pool.
+
+        Args:
+            max_workers (int): Number of jobs processed concurrently
+            max_pending (int): Number of jobs allowed to wait for a free worker
+            max_finished_jobs (int): Number of finished jobs kept for status lookups
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        filename: str,
+        func: Callable[[IngestionJob], None],
+        job_id: Optional[str] = None
+    ) -> IngestionJob:
+        """
+        Schedule an ingestion job.
+
+        Args:
+            filename (str): Name of the file being ingested
+            func (Callable[[IngestionJob], None]): Work to run; receives the job so it can report progress
+            job_id (Optional[str]): Id of the job, when it was already handed out
+                (for example by another worker process)
+
+        Returns:
+            IngestionJob: The newly queued job
+
+        Raises:
+            QueueFullError: If every worker is busy and the pending queue is full
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Ingestion queue is full, please retry later")
+
+        job = IngestionJob(filename, job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_finished()
+
+        try:
+            self._executor.submit(self._run, job, func)
+        except Exception:
+            self._slots.release()
+            raise
+
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestionJob]:
+        """Every job still tracked, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending_count(self) -> int:
+        """Number of jobs that are queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and optionally wait for running ones."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: IngestionJob, func: Callable[[IngestionJob], None]) -> None:
+        job.status = IngestionJob.RUNNING
+        job.started_at = time.time()
+        record_stage("ingestion_queue_wait", job.started_at - job.created_at)
+        try:
+            func(job)
+            job.status = IngestionJob.COMPLETED
+            logger.info(f"Ingestion job {job.id} completed")
+        except Exception as e:
+            job.error = str(e)
+            job.status = IngestionJob.FAILED
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            self._slots.release()
+
+    def _prune_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,317 @@
+from typing_extensions import Callable, Dict, Iterable, List, Optional, Tuple
+
+from array import array
+from collections import Counter
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Words joined by "-", ".", "/" or "_" stay one token, so part numbers
+# ("XR-2041-B") and section ids ("4.2.1") can be matched exactly
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./_][a-z0-9]+)*")
+SPLIT_PATTERN = re.compile(r"[-./_]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i in is it its of on or "
+    "that the their there this to was were what when where which who why will with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase and split text into index terms.
+
+    Compound tokens are kept whole and also emitted part by part, so
+    "XR-2041-B" matches both the exact id and a query for "XR 2041".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if SPLIT_PATTERN.search(token):
+            terms.extend(part for part in SPLIT_PATTERN.split(token) if part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """
+    An in-memory BM25 inverted index over vector store rows.
+
+    Each term maps to a compact ``array('i')`` of interleaved ``(row, term
+    frequency)`` pairs, appended to as chunks are indexed. Rows are the vector
+    store's row numbers, so search honours its tombstones and
+    :meth:`remap` follows its compactions.
+
+    The index is snapshotted to ``path`` once enough rows were added since the
+    last snapshot; on startup rows past the snapshot are re-indexed from the
+    store, so the index never has to be rebuilt from scratch. Snapshots record
+    the chunk id of their last row, so one that no longer matches the store
+    can be detected and discarded.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path (Optional[str]): Snapshot file; the index is not persisted when omitted
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 document length normalisation
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, array] = {}
+        self._lengths = array("i")
+        self._total_length = 0
+        self._saved_rows = 0
+        self.last_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of rows indexed."""
+        return len(self._lengths)
+
+    @property
+    def term_count(self) -> int:
+        return len(self._postings)
+
+    def add(self, start: int, texts: List[str], last_id: Optional[str] = None) -> None:
+        """
+        Index ``texts`` as rows ``start, start + 1, ...``.
+
+        Rows skipped since the last add (e.g. chunks of a failed load) are
+        indexed as empty.
+
+        Args:
+            start (int): Row of the first text
+            texts (List[str]): Chunk texts
+            last_id (Optional[str]): Chunk id of the last row, recorded in snapshots
+        """
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            if start < len(self._lengths):
+                raise ValueError(f"Rows from {start} are already indexed")
+            self._lengths.extend([0] * (start - len(self._lengths)))
+            for row, counts in enumerate(tokenized, start):
+                for term, tf in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = array("i")
+                    postings.append(row)
+                    postings.append(tf)
+                length = sum(counts.values())
+                self._lengths.append(length)
+                self._total_length += length
+            if last_id is not None:
+                self.last_id = last_id
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        deleted: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows and BM25 scores of the top ``k`` matches, best first.
+
+        Args:
+            query (str): Query text
+            k (int): Number of results
+            deleted (Optional[np.ndarray]): Boolean mask of rows to skip
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row indices and scores; rows that
+            share no term with the query are never returned
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if n == 0 or not terms:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            # Copy under the lock: appends may reallocate the arrays
+            postings = [
+                np.array(self._postings[term], dtype=np.int32).reshape(-1, 2)
+                for term in terms if term in self._postings
+            ]
+            lengths = np.array(self._lengths, dtype=np.float32)
+            average_length = self._total_length / n or 1.0
+
+        scores = np.zeros(n, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+        for pairs in postings:
+            rows, tf = pairs[:, 0], pairs[:, 1].astype(np.float32)
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+        if deleted is not None:
+            masked = min(n, len(deleted))
+            scores[:masked][deleted[:masked]] = 0
+        matches = np.flatnonzero(scores)
+        k = min(k, len(matches))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return top.astype(np.int64), scores[top]
+
+    def sync(
+        self,
+        row_count: int,
+        read_texts: Callable[[int, int], List[str]],
+        last_id: Optional[str] = None,
+        skip: Optional[np.ndarray] = None
+    ) -> int:
+        """
+        Index rows ``len(self), ..., row_count - 1`` by reading them from the store.
+
+        Args:
+            row_count (int): Number of rows in the vector store
+            read_texts (Callable[[int, int], List[str]]): Returns the chunk texts
+                stored at rows ``[start, end)``
+            last_id (Optional[str]): Chunk id of row ``row_count - 1``
+            skip (Optional[np.ndarray]): Boolean mask of deleted rows, indexed as empty
+
+        Returns:
+            int: Number of rows indexed
+        """
+        start = len(self)
+        for block in range(start, row_count, 1024):
+            end = min(row_count, block + 1024)
+            texts = read_texts(block, end)
+            if skip is not None:
+                texts = ["" if skip[row] else text for row, text in enumerate(texts, block)]
+            self.add(block, texts, last_id=last_id if end == row_count else None)
+        return max(0, row_count - start)
+
+    def remap(self, remap: np.ndarray, last_id: Optional[str] = None) -> None:
+        """
+        Renumber rows after a vector store compaction, dropping deleted ones.
+
+        Args:
+            remap (np.ndarray): For every old row its new index, or -1 if it was deleted
+            last_id (Optional[str]): Chunk id of the new last row
+        """
+        with self._lock:
+            for term in list(self._postings):
+                pairs = np.array(self._postings[term], dtype=np.int32).reshape(-1, 2)
+                pairs = pairs[pairs[:, 0] < len(remap)]
+                pairs[:, 0] = remap[pairs[:, 0]]
+                pairs = pairs[pairs[:, 0] >= 0]
+                if len(pairs):
+                    self._postings[term] = array("i", pairs.tobytes())
+                else:
+                    del self._postings[term]
+            old_lengths = np.array(self._lengths, dtype=np.int32)
+            keep = remap[:len(old_lengths)] >= 0
+            lengths = np.zeros(int(remap.max()) + 1 if len(remap) else 0, dtype=np.int32)
+            lengths[remap[:len(old_lengths)][keep]] = old_lengths[keep]
+            self._lengths = array("i", lengths.tobytes())
+            self._total_length = int(lengths.sum())
+            self._saved_rows = 0
+            self.last_id = last_id
+
+    def clear(self, remove_snapshot: bool = True) -> None:
+        """
+        Drop every indexed row and, unless ``remove_snapshot`` is False, the snapshot.
+        """
+        with self._lock:
+            self._postings = {}
+            self._lengths = array("i")
+            self._total_length = 0
+            self._saved_rows = 0
+            self.last_id = None
+        if remove_snapshot and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def maybe_save(self, min_growth: float = 0.25) -> bool:
+        """Snapshot the index once it has grown by ``min_growth`` since the last snapshot."""
+        if not self.path or len(self) - self._saved_rows < max(256, min_growth * self._saved_rows):
+            return False
+        self.save()
+        return True
+
+    def save(self) -> None:
+        """Write the index to ``path`` as flat arrays, atomically."""
+        if not self.path:
+            return
+        with self._lock:
+            terms = list(self._postings)
+            bounds = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum([len(self._postings[term]) for term in terms], out=bounds[1:])
+            postings = np.empty(int(bounds[-1]), dtype=np.int32)
+            for term, start, end in zip(terms, bounds[:-1], bounds[1:]):
+                postings[start:end] = self._postings[term]
+            lengths = np.array(self._lengths, dtype=np.int32)
+            rows = len(lengths)
+            last_id = self.last_id or ""
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+                bounds=bounds,
+                postings=postings,
+                lengths=lengths,
+                last_id=np.frombuffer(last_id.encode("utf-8"), dtype=np.uint8)
+            )
+        os.replace(tmp_path, self.path)
+        self._saved_rows = rows
+        logger.info(f"Saved lexical index with {rows} rows and {len(terms)} terms to {self.path}")
+
+    def load(self) -> bool:
+        """
+        Load the snapshot at ``path``, if there is one.
+
+        Returns:
+            bool: Whether a snapshot was loaded
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                terms = json.loads(data["terms"].tobytes().decode("utf-8"))
+                bounds = data["bounds"]
+                postings = data["postings"]
+                lengths = data["lengths"]
+                last_id = data["last_id"].tobytes().decode("utf-8")
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable lexical index at {self.path}: {e}")
+            return False
+        with self._lock:
+            self._postings = {
+                term: array("i", postings[start:end].tobytes())
+                for term, start, end in zip(terms, bounds[:-1], bounds[1:])
+            }
+            self._lengths = array("i", lengths.tobytes())
+            self._total_length = int(lengths.sum())
+            self._saved_rows = len(lengths)
+            self.last_id = last_id or None
+        logger.info(f"Loaded lexical index with {len(lengths)} rows and {len(terms)} terms from {self.path}")
+        return True
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Iterable[int]], k: int = 60) -> List[int]:
+    """
+    Merge several rankings of row ids with reciprocal rank fusion.
+
+    Each id scores ``sum(1 / (k + rank))`` over the rankings it appears in, so
+    ids ranked well by any ranking rise without having to compare raw scores.
+
+    Args:
+        rankings (Iterable[Iterable[int]]): Row ids, best first, one ranking per retriever
+        k (int): Damping constant; larger values flatten the rank contributions
+
+    Returns:
+        List[int]: Every id, best fused score first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -1,19 +1,26 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import os
+import json
+import base64
+import uuid
 import shutil
-from typing import List
-from my_rag import MyRAGAgent
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+from ingestion import IngestionJob, IngestionQueue, QueueFullError
+from metrics import REGISTRY, CallbackMetric, TraceMiddleware
+from speech import SpeechStreams, TooManyStreamsError, load_recognizer
+from startup import warm_restart
+from uploads import UploadLimitMiddleware, UploadTooLargeError, save_upload
+from workers import WorkerCoordinator
 import logging
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-from database import get_db, engine
-import models
-from auth import get_current_user, verify_google_token, create_access_token, get_or_create_user
-from datetime import timedelta
 
 # Load environment variables
 load_dotenv()
@@ -22,12 +29,37 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Re-index the PDFs already on disk in the background before reporting ready"""
+    stop_sync = threading.Event()
+    if coordinator is not None:
+        threading.Thread(target=_sync_workers, args=(stop_sync,), name="worker-sync", daemon=True).start()
+    if os.getenv("WARM_START", "true").lower() == "true":
+        try:
+            agent = await asyncio.to_thread(get_rag_agent)
+            # With several workers only the writer re-indexes
+            if agent is not None and not agent.read_only:
+                _start_reindex(agent)
+        except Exception as e:
+            logger.error(f"Failed to start re-indexing: {e}")
+    yield
+    stop_sync.set()
+
+
 app = FastAPI(
     title="RAG PDF Chat API",
     description="A FastAPI backend server with RAG capabilities for PDF document processing and intelligent chat functionality",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Reject oversized uploads while the body is still arriving; added before CORS
+# so 413 responses still carry the CORS headers
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+app.add_middleware(UploadLimitMiddleware, paths=["/upload-pdf"], max_bytes=MAX_UPLOAD_BYTES)
+MAX_SPEECH_BYTES = int(os.getenv("MAX_SPEECH_MB", "25")) * 1024 * 1024
+app.add_middleware(UploadLimitMiddleware, paths=["/speech-to-text"], max_bytes=MAX_SPEECH_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,46 +70,368 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Added last so it is outermost: times the whole request, including the
+# middleware above, and tags every response with its trace id
+app.add_middleware(TraceMiddleware, slow_seconds=float(os.getenv("SLOW_REQUEST_SECONDS", "5")))
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Initialize RAG Agent with environment variable
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "cache", "embeddings.sqlite")
+)
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR",
+    os.path.join(os.path.dirname(__file__), "index")
+)
+
+# The agent, and with it langchain, langgraph and the OpenAI clients, is only
+# imported and built on first use of a RAG endpoint so cold starts stay cheap
+_rag_agent = None
+_rag_agent_initialized = False
+_rag_agent_lock = threading.Lock()
+
 
-if not OPENAI_API_KEY:
-    logger.error("OPENAI_API_KEY environment variable not set")
-    my_rag_agent = None
-else:
+def _create_rag_agent():
+    if not OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY environment variable not set")
+        return None
     try:
-        my_rag_agent = MyRAGAgent(openai_api_key=OPENAI_API_KEY)
+        from my_rag import MyRAGAgent
+        agent = MyRAGAgent(
+            openai_api_key=OPENAI_API_KEY,
+            embedding_cache_path=EMBEDDING_CACHE_PATH,
+            vector_store_path=VECTOR_INDEX_DIR,
+            openai_base_url=OPENAI_BASE_URL,
+            read_only=coordinator is not None and not coordinator.acquire_writer(),
+            sessions_path=coordinator.sessions_dir if coordinator is not None else None
+        )
         logger.info("RAG Agent initialized successfully")
+        return agent
     except Exception as e:
         logger.error(f"Failed to initialize RAG Agent: {e}")
-        my_rag_agent = None
+        return None
+
+
+def get_rag_agent():
+    """Return the RAG agent, building it on first call; None if it could not be initialized"""
+    global _rag_agent, _rag_agent_initialized
+    if not _rag_agent_initialized:
+        with _rag_agent_lock:
+            if not _rag_agent_initialized:
+                _rag_agent = _create_rag_agent()
+                _rag_agent_initialized = True
+    return _rag_agent
+
+
+# Like the agent, the speech recognizer is only built on first use
+_speech_streams = None
+_speech_initialized = False
+_speech_lock = threading.Lock()
+
+
+def get_speech_streams():
+    """Return the speech recognition streams, building them on first call; None if speech is unavailable"""
+    global _speech_streams, _speech_initialized
+    if not _speech_initialized:
+        with _speech_lock:
+            if not _speech_initialized:
+                recognizer = load_recognizer()
+                if recognizer is not None:
+                    _speech_streams = SpeechStreams(
+                        recognizer,
+                        max_streams=int(os.getenv("SPEECH_MAX_STREAMS", "8"))
+                    )
+                _speech_initialized = True
+    return _speech_streams
 
 # Create PDFs directory if it doesn't exist
-pdfs_dir = os.path.join(os.path.dirname(__file__), "pdfs")
+pdfs_dir = os.getenv("PDFS_DIR", os.path.join(os.path.dirname(__file__), "pdfs"))
 os.makedirs(pdfs_dir, exist_ok=True)
 logger.info(f"PDFs directory created at: {pdfs_dir}")
 
+# Background worker pool for PDF ingestion so uploads never block the event loop
+ingestion_queue = IngestionQueue(
+    max_workers=int(os.getenv("INGESTION_WORKERS", "2")),
+    max_pending=int(os.getenv("INGESTION_QUEUE_SIZE", "8"))
+)
+startup_jobs: List[IngestionJob] = []
+_startup_lock = threading.Lock()
+
+
+def _start_reindex(agent) -> None:
+    """Queue the re-indexing of the PDFs on disk, unless this worker already has"""
+    with _startup_lock:
+        if startup_jobs:
+            return
+        startup_jobs.extend(warm_restart(agent, ingestion_queue, pdfs_dir))
+        if coordinator is not None:
+            coordinator.publish_startup([job.id for job in startup_jobs])
+
+# With several worker processes (uvicorn --workers, gunicorn -w) every worker
+# maps the same on-disk index, so the page cache holds a single copy of it.
+# One worker holds the writer lease and runs every ingest, delete and reset;
+# the others hand those to it and pick up its changes in the background.
+# Chat sessions are shared through the same directory, so the turns of one
+# conversation need not all reach the same worker.
+MULTI_WORKER = (
+    os.getenv("MULTI_WORKER", "false").lower() == "true"
+    or int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+)
+coordinator = WorkerCoordinator(
+    os.path.join(VECTOR_INDEX_DIR, "workers"),
+    max_pending=int(os.getenv("INGESTION_QUEUE_SIZE", "8"))
+) if MULTI_WORKER else None
+WORKER_SYNC_SECONDS = float(os.getenv("WORKER_SYNC_SECONDS", "0.5"))
+WRITER_TIMEOUT_SECONDS = float(os.getenv("WRITER_TIMEOUT_SECONDS", "30"))
+
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "1000"))
+
+
+# Uploads of one filename are moved into place and indexed one at a time
+_upload_locks = [threading.Lock() for _ in range(64)]
+
+
+def _ingest_upload(agent, staging_path: str, file_path: str, job: IngestionJob):
+    """
+    Move an accepted upload from its staging file into place and index it.
+
+    Jobs for the same filename hold the same lock from the move until the
+    file has been read, so each one indexes the bytes it was uploaded with
+    """
+    with _upload_locks[hash(file_path) % len(_upload_locks)]:
+        # A request rerun after the previous writer exited may find its file
+        # already moved
+        if os.path.exists(staging_path):
+            os.replace(staging_path, file_path)
+            logger.info(f"PDF saved to: {file_path}")
+        return agent.load_documents([file_path], progress=job.advance)
+
+
+def _delete_document(agent, document_id: str):
+    """Delete a document and, unless another document still uses it, its file"""
+    record = agent.delete_document(document_id)
+    if record is not None and os.path.exists(record.path) and agent.documents.find_by_filename(record.filename) is None:
+        os.remove(record.path)
+    return record
+
+
+def _reset_documents(agent) -> None:
+    """Delete every PDF and clear the index and chat history"""
+    for filename in os.listdir(pdfs_dir):
+        if filename.lower().endswith('.pdf'):
+            os.remove(os.path.join(pdfs_dir, filename))
+    # The embedding cache is kept so re-uploading the same documents costs no
+    # embedding calls
+    agent.reset()
+
+
+def _run_worker_request(agent, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Carry out a write another worker handed to this one, the writer"""
+    if request["kind"] == "ingest":
+        ingestion_queue.submit(
+            request["filename"],
+            lambda job: _ingest_upload(agent, request["staging"], request["path"], job),
+            job_id=request["job_id"]
+        )
+        return None
+    if request["kind"] == "delete":
+        record = _delete_document(agent, request["document_id"])
+        return {"document": record.to_dict() if record is not None else None}
+    if request["kind"] == "reset":
+        _reset_documents(agent)
+        return {}
+    raise ValueError(f"Unknown worker request: {request['kind']}")
+
+
+def _sync_workers(stop: threading.Event) -> None:
+    """
+    Keep this worker in step with the others until ``stop`` is set: the writer
+    runs the requests handed to it and publishes job statuses, readers pick up
+    its changes to the index, and take over the writer lease if its holder exits.
+    A new writer first reruns what the previous one left unfinished
+    """
+    last_prune = 0.0
+    recovered = False
+    reindex = False
+    while not stop.wait(WORKER_SYNC_SECONDS):
+        try:
+            agent = _rag_agent
+            if coordinator.acquire_writer():
+                if not recovered:
+                    startup_ids = {job["job_id"] for job in coordinator.startup_jobs()}
+                    lost = coordinator.recover(lambda: [job.id for job in ingestion_queue.jobs()])
+                    # The re-indexing of the previous writer has to be done again
+                    reindex = bool(startup_ids.intersection(lost)) and os.getenv("WARM_START", "true").lower() == "true"
+                    recovered = True
+                if agent is None and (coordinator.pending_count() or reindex):
+                    agent = get_rag_agent()
+                if agent is None:
+                    continue
+                if agent.read_only:
+                    agent.promote()
+                if reindex:
+                    _start_reindex(agent)
+                    reindex = False
+                coordinator.drain(lambda request: _run_worker_request(agent, request))
+                coordinator.publish(job.to_dict() for job in ingestion_queue.jobs())
+                if time.time() - last_prune > 60:
+                    coordinator.prune()
+                    agent.sessions.prune()
+                    last_prune = time.time()
+            elif agent is not None:
+                agent.refresh()
+        except Exception as e:
+            logger.error(f"Failed to sync with the other workers: {e}")
+
+
+async def _run_on_writer(kind: str, filename: str, **payload: Any) -> Dict[str, Any]:
+    """Hand a write to the writer worker and wait for its result"""
+    job_id = coordinator.submit(kind, filename, **payload)
+    deadline = time.monotonic() + WRITER_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        job = coordinator.job(job_id)
+        if job is not None and job["status"] == IngestionJob.FAILED:
+            raise Exception(job["error"])
+        if job is not None and job["status"] == IngestionJob.COMPLETED:
+            return job["result"]
+        await asyncio.sleep(0.05)
+    raise HTTPException(
+        status_code=504,
+        detail=f"Timed out waiting for the writer worker (job {job_id})"
+    )
+
+
+def _agent_metric(collect):
+    """Wrap a scrape callback so it reads the agent only once built; a scrape never builds it."""
+    def callback():
+        return collect(_rag_agent) if _rag_agent is not None else {}
+    return callback
+
+
+def _cache_lookups(agent) -> Dict[tuple, float]:
+    values = {}
+    embedding = agent.get_embedding_cache_stats()
+    if embedding:
+        values[("embedding", "hit")] = embedding["hits"]
+        values[("embedding", "miss")] = embedding["misses"]
+    answer = agent.answer_cache.stats()
+    values[("answer", "hit")] = answer["exact_hits"] + answer["semantic_hits"]
+    values[("answer", "miss")] = answer["misses"]
+    return values
+
+
+# Values other components already count are read when /metrics is scraped
+CallbackMetric(
+    "rag_documents", "Documents indexed", "gauge",
+    _agent_metric(lambda agent: {(): len(agent.documents)})
+)
+CallbackMetric(
+    "rag_chunks", "Chunks in the vector store", "gauge",
+    _agent_metric(lambda agent: {(): agent.get_document_count()})
+)
+CallbackMetric(
+    "rag_chat_sessions", "Chat sessions held in memory", "gauge",
+    _agent_metric(lambda agent: {(): agent.sessions.stats()["sessions"]})
+)
+CallbackMetric(
+    "rag_cache_lookups_total", "Embedding and answer cache lookups by result", "counter",
+    _agent_metric(_cache_lookups), ["cache", "result"]
+)
+CallbackMetric(
+    "rag_embedding_requests_total", "Embedding API requests, retries and rate-limited responses", "counter",
+    _agent_metric(lambda agent: {
+        (kind,): agent.embedding_pipeline.stats()[kind] for kind in ("requests", "retries", "rate_limited")
+    }),
+    ["kind"]
+)
+CallbackMetric(
+    "rag_lexical_fallbacks_total", "Queries answered from the lexical index because embedding failed", "counter",
+    _agent_metric(lambda agent: {(): agent.lexical_fallbacks})
+)
+CallbackMetric(
+    "rag_ingestion_jobs", "Ingestion jobs queued or running", "gauge",
+    lambda: {(): ingestion_queue.pending_count()}
+)
+
 
 class ChatMessage(BaseModel):
     message: str
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: str
+    prompt_tokens: Optional[int] = None
+    cached: bool = False
     status: str = "success"
 
+class BatchChatRequest(BaseModel):
+    questions: List[str]
+    max_concurrency: Optional[int] = None
+
 class UploadResponse(BaseModel):
     message: str
     filename: str
-    status: str = "success"
+    job_id: Optional[str] = None
+    document_id: Optional[str] = None
+    size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    status: str = "queued"
+
+class DocumentResponse(BaseModel):
+    document_id: str
+    filename: str
+    sha256: str
+    size_bytes: int
+    chunks: int
+    pages: int
+    added_at: float
+
+class JobProgress(BaseModel):
+    pages_parsed: int
+    chunks_split: int
+    chunks_embedded: int
+
+class JobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    error: Optional[str] = None
+    progress: JobProgress
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
 
 class StatusResponse(BaseModel):
     status: str
     rag_agent_ready: bool
     pdfs_directory: str
     documents_loaded: int
+    chunks_indexed: int = 0
+    embedding_cache: Optional[Dict[str, int]] = None
+    embedding_pipeline: Optional[Dict[str, float]] = None
+    chat_sessions: Optional[Dict[str, int]] = None
+    checkpoints: Optional[Dict[str, int]] = None
+    answer_cache: Optional[Dict[str, float]] = None
+    query_cache: Optional[Dict[str, Any]] = None
+    retrieval: Optional[Dict[str, Any]] = None
+    prompt: Optional[Dict[str, Any]] = None
+    worker: Optional[Dict[str, Any]] = None
+    speech: Optional[Dict[str, int]] = None
+
+class SpeechRequest(BaseModel):
+    audio_data: str
+
+class SpeechResponse(BaseModel):
+    transcript: str
+    response: Optional[str] = None
+    session_id: Optional[str] = None
+    status: str = "success"
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -90,9 +444,9 @@ async def root():
         return HTMLResponse(content="<h1>RAG PDF Chat API</h1><p>Backend server is running. Use the API endpoints to interact with the service.</p>")
 
 
-@app.post("/upload-pdf", response_model=UploadResponse)
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process a PDF file for RAG"""
+@app.post("/upload-pdf", response_model=UploadResponse, status_code=202)
+async def upload_pdf(response: Response, file: UploadFile = File(...), my_rag_agent=Depends(get_rag_agent)):
+    """Upload a PDF file and queue it for RAG ingestion"""
     try:
         if my_rag_agent is None:
             raise HTTPException(
@@ -112,33 +466,66 @@ async def upload_pdf(file: UploadFile = File(...)):
                 detail="Only PDF files are allowed"
             )
         
-        # Validate file size (max 50MB)
-        content = await file.read()
-        if len(content) > 50 * 1024 * 1024:  # 50MB
+        # Stream the upload to a staging file in chunks, enforcing the size limit as it goes
+        file_path = os.path.join(pdfs_dir, file.filename)
+        staging_path = os.path.join(pdfs_dir, f".{uuid.uuid4().hex}.upload")
+        try:
+            size_bytes, sha256 = await save_upload(file, staging_path, MAX_UPLOAD_BYTES)
+        except UploadTooLargeError as e:
             raise HTTPException(
                 status_code=413,
-                detail="File too large. Maximum size is 50MB."
+                detail=str(e)
             )
         
-        # Reset file pointer for reading
-        await file.seek(0)
-        
-        # Save the uploaded file
-        file_path = os.path.join(pdfs_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-        
-        logger.info(f"PDF saved to: {file_path}")
-        
-        # Process only the uploaded file
-        my_rag_agent.load_documents([file_path])
+        # Identical content is already indexed: nothing to do
+        existing = my_rag_agent.documents.find_by_hash(sha256)
+        if existing is not None:
+            os.remove(staging_path)
+            response.status_code = 200
+            return UploadResponse(
+                message=f"{file.filename} is already indexed as {existing.filename}",
+                filename=file.filename,
+                document_id=existing.id,
+                size_bytes=size_bytes,
+                sha256=sha256,
+                status="unchanged"
+            )
         
-        logger.info(f"Successfully processed: {file.filename}")
+        # Process only the uploaded file on the ingestion worker pool, the
+        # writer worker's when this one only reads the index. The job moves
+        # the staging file into place itself, so nothing under pdfs/ changes
+        # unless the job was accepted
+        agent = my_rag_agent
+        try:
+            if agent.read_only:
+                job_id = coordinator.submit("ingest", file.filename, path=file_path, staging=staging_path)
+            else:
+                job = ingestion_queue.submit(
+                    file.filename,
+                    lambda job: _ingest_upload(agent, staging_path, file_path, job)
+                )
+                job_id = job.id
+                if coordinator is not None:
+                    coordinator.publish([job.to_dict()])
+        except QueueFullError as e:
+            os.remove(staging_path)
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": "5"}
+            )
+        except Exception:
+            os.remove(staging_path)
+            raise
         
         return UploadResponse(
-            message=f"Successfully uploaded and processed {file.filename}",
+            message=f"Successfully uploaded {file.filename}, processing has been queued",
             filename=file.filename,
-            status="success"
+            job_id=job_id,
+            document_id=sha256[:16],
+            size_bytes=size_bytes,
+            sha256=sha256,
+            status="queued"
         )
         
     except HTTPException:
@@ -151,8 +538,75 @@ async def upload_pdf(file: UploadFile = File(...)):
         )
 
 
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Get the status and progress of an ingestion job"""
+    job = ingestion_queue.get(job_id)
+    if job is not None:
+        return JobResponse(**job.to_dict())
+    # Jobs run by the writer worker, when there are several
+    data = coordinator.job(job_id) if coordinator is not None else None
+    if data is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job not found: {job_id}"
+        )
+    return JobResponse(**data)
+
+
+@app.get("/documents", response_model=List[DocumentResponse])
+async def list_documents(my_rag_agent=Depends(get_rag_agent)):
+    """List the indexed documents"""
+    if my_rag_agent is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="RAG Agent is not initialized. Please check server configuration."
+        )
+    return [
+        DocumentResponse(**record.to_dict())
+        for record in my_rag_agent.documents.list()
+    ]
+
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str, my_rag_agent=Depends(get_rag_agent)):
+    """Delete one document and its chunks, leaving every other document untouched"""
+    try:
+        if my_rag_agent is None:
+            raise HTTPException(
+                status_code=503, 
+                detail="RAG Agent is not initialized"
+            )
+        
+        if my_rag_agent.read_only:
+            record = (await _run_on_writer("delete", document_id, document_id=document_id))["document"]
+        else:
+            record = _delete_document(my_rag_agent, document_id)
+            record = record.to_dict() if record is not None else None
+        if record is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Document not found: {document_id}"
+            )
+        
+        return {
+            "message": f"Deleted {record['filename']} ({record['chunks']} chunks)",
+            "document_id": record["document_id"],
+            "status": "success"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting document: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to delete document: {str(e)}"
+        )
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, my_rag_agent=Depends(get_rag_agent)):
     """Chat with the RAG system about uploaded documents"""
     try:
         if my_rag_agent is None:
@@ -169,12 +623,16 @@ async def chat(message: ChatMessage):
         
         logger.info(f"Processing chat request: {message.message[:100]}...")
         
-        response = my_rag_agent.ask(message.message)
+        session_id = message.session_id or "default"
+        result = await my_rag_agent.aask_detailed(message.message, session_id=session_id)
         
         logger.info("Chat response generated successfully")
         
         return ChatResponse(
-            response=response,
+            response=result["answer"],
+            session_id=session_id,
+            prompt_tokens=result["prompt_tokens"],
+            cached=result["cached"],
             status="success"
         )
         
@@ -188,18 +646,116 @@ async def chat(message: ChatMessage):
         )
 
 
+@app.post("/chat/stream")
+async def chat_stream(message: ChatMessage, my_rag_agent=Depends(get_rag_agent)):
+    """Chat with the RAG system, streaming the answer as Server-Sent Events"""
+    if my_rag_agent is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="RAG Agent is not initialized. Please check server configuration."
+        )
+    
+    if not message.message.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Message cannot be empty"
+        )
+    
+    logger.info(f"Processing streaming chat request: {message.message[:100]}...")
+    session_id = message.session_id or "default"
+    
+    async def event_stream():
+        try:
+            async for event in my_rag_agent.astream_ask(message.message, session_id=session_id):
+                if event["event"] == "done":
+                    event["data"]["session_id"] = session_id
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            logger.error(f"Error in streaming chat: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': f'Failed to generate response: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchChatRequest, my_rag_agent=Depends(get_rag_agent)):
+    """Answer a batch of independent questions, streaming one NDJSON line per answer as each completes"""
+    if my_rag_agent is None:
+        raise HTTPException(
+            status_code=503, 
+            detail="RAG Agent is not initialized. Please check server configuration."
+        )
+    
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="Questions cannot be empty")
+    if len(request.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {MAX_BATCH_QUESTIONS} questions"
+        )
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    
+    logger.info(f"Processing batch chat request of {len(request.questions)} questions")
+    # Clients may lower the server's concurrency limit but not raise it
+    max_concurrency = min(request.max_concurrency or my_rag_agent.batch_concurrency, my_rag_agent.batch_concurrency)
+    
+    async def result_stream():
+        try:
+            async for result in my_rag_agent.aask_many(request.questions, max_concurrency=max_concurrency):
+                if "error" in result:
+                    line = {
+                        "index": result["index"],
+                        "question": result["question"],
+                        "status": "error",
+                        "detail": result["error"],
+                    }
+                else:
+                    line = {
+                        "index": result["index"],
+                        "question": result["question"],
+                        "response": result["answer"],
+                        "sources": result["sources"],
+                        "prompt_tokens": result["prompt_tokens"],
+                        "cached": result["cached"],
+                        "status": "success",
+                    }
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            logger.error(f"Error in batch chat: {e}")
+            yield json.dumps({"status": "error", "detail": f"Failed to generate responses: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/status", response_model=StatusResponse)
-async def get_status():
+async def get_status(my_rag_agent=Depends(get_rag_agent)):
     """Get server status and configuration"""
     try:
-        # Count PDF files in directory
-        pdf_count = len([f for f in os.listdir(pdfs_dir) if f.lower().endswith('.pdf')])
-        
         return StatusResponse(
             status="running",
             rag_agent_ready=my_rag_agent is not None,
             pdfs_directory=pdfs_dir,
-            documents_loaded=pdf_count
+            documents_loaded=len(my_rag_agent.documents) if my_rag_agent else 0,
+            chunks_indexed=my_rag_agent.get_document_count() if my_rag_agent else 0,
+            embedding_cache=my_rag_agent.get_embedding_cache_stats() if my_rag_agent else None,
+            embedding_pipeline=my_rag_agent.embedding_pipeline.stats() if my_rag_agent else None,
+            chat_sessions=my_rag_agent.sessions.stats() if my_rag_agent else None,
+            checkpoints=my_rag_agent.get_checkpoint_stats() if my_rag_agent else None,
+            answer_cache=my_rag_agent.answer_cache.stats() if my_rag_agent else None,
+            query_cache=my_rag_agent.query_cache.stats() if my_rag_agent else None,
+            retrieval=my_rag_agent.get_retrieval_stats() if my_rag_agent else None,
+            prompt=my_rag_agent.context_builder.stats() if my_rag_agent else None,
+            worker=coordinator.stats() if coordinator is not None else None,
+            speech=_speech_streams.stats() if _speech_streams is not None else None
         )
         
     except Exception as e:
@@ -210,16 +766,44 @@ async def get_status():
         )
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health")
 async def health_check():
     """Simple health check endpoint"""
     return {"status": "healthy", "service": "RAG PDF Chat API"}
 
 
+@app.get("/ready")
+async def readiness_check(my_rag_agent=Depends(get_rag_agent)):
+    """Readiness check: the RAG agent is initialized and the startup re-index has finished"""
+    jobs = [job.to_dict() for job in startup_jobs]
+    if my_rag_agent is not None and my_rag_agent.read_only:
+        jobs = coordinator.startup_jobs()
+    pending = [job for job in jobs if job["status"] not in (IngestionJob.COMPLETED, IngestionJob.FAILED)]
+    if my_rag_agent is None or pending:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "starting",
+                "rag_agent_ready": my_rag_agent is not None,
+                "startup_jobs": jobs,
+            }
+        )
+    return {
+        "status": "ready",
+        "documents_loaded": len(my_rag_agent.documents),
+        "startup_jobs_failed": sum(1 for job in jobs if job["status"] == IngestionJob.FAILED),
+    }
+
+
 @app.delete("/reset")
-async def reset_documents():
+async def reset_documents(my_rag_agent=Depends(get_rag_agent)):
     """Reset all documents and chat history"""
-    global my_rag_agent
     try:
         if my_rag_agent is None:
             raise HTTPException(
@@ -227,18 +811,13 @@ async def reset_documents():
                 detail="RAG Agent is not initialized"
             )
         
-        # Clear PDF files
-        for filename in os.listdir(pdfs_dir):
-            if filename.lower().endswith('.pdf'):
-                os.remove(os.path.join(pdfs_dir, filename))
-        
-        # Reinitialize RAG agent to clear vector store and chat history
-        if not OPENAI_API_KEY:
-            raise HTTPException(
-                status_code=503,
-                detail="OpenAI API key not available"
-            )
-        my_rag_agent = MyRAGAgent(openai_api_key=OPENAI_API_KEY)
+        # Clear PDF files, vector store and chat history; other workers find
+        # the shared sessions gone on their next turn
+        if my_rag_agent.read_only:
+            await _run_on_writer("reset", "reset")
+            my_rag_agent.reset_chat_history()
+        else:
+            _reset_documents(my_rag_agent)
         
         logger.info("Documents and chat history reset successfully")
         
@@ -269,41 +848,67 @@ async def internal_error_handler(request: Request, exc):
     )
 
 
+async def _single_chunk(data: bytes):
+    yield data
+
+
+async def _transcribe(speech_streams: SpeechStreams, audio) -> str:
+    """Recognize a whole clip and join its final transcripts"""
+    return "".join([transcript.text async for transcript in speech_streams.transcribe(audio) if transcript.is_final])
+
+
 @app.post("/speech-to-text", response_model=SpeechResponse)
-async def speech_to_text(request: SpeechRequest):
-    """Convert speech to text using Google Cloud Speech-to-Text"""
+async def speech_to_text(
+    request: Request,
+    chat: bool = False,
+    session_id: Optional[str] = None,
+    speech_streams=Depends(get_speech_streams)
+):
+    """
+    Convert speech to text. The audio is the raw request body (chunked transfer
+    encoding is fine), passed to the recognizer as it arrives; JSON with
+    base64 ``audio_data`` is still accepted. With ``chat=true`` the transcript
+    is also answered as a chat message in ``session_id``.
+    """
     try:
-        if speech_client is None:
+        if speech_streams is None:
             raise HTTPException(
                 status_code=503,
                 detail="Speech-to-Text service is not available"
             )
 
-        # Decode base64 audio data
-        audio_data = base64.b64decode(request.audio_data)
-
-        # Configure the recognition
-        audio = speech.RecognitionAudio(content=audio_data)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            sample_rate_hertz=48000,
-            language_code="en-US",
-            enable_automatic_punctuation=True,
-        )
-
-        # Perform the transcription
-        response = speech_client.recognize(config=config, audio=audio)
+        if request.headers.get("content-type", "").startswith("application/json"):
+            try:
+                body = SpeechRequest(**await request.json())
+                audio = _single_chunk(base64.b64decode(body.audio_data))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid speech request: {str(e)}")
+        else:
+            audio = request.stream()
 
-        # Get the transcript
-        transcript = ""
-        for result in response.results:
-            transcript += result.alternatives[0].transcript
+        transcript = await _transcribe(speech_streams, audio)
+        if not chat or not transcript.strip():
+            return SpeechResponse(transcript=transcript, status="success")
 
+        my_rag_agent = await asyncio.to_thread(get_rag_agent)
+        if my_rag_agent is None:
+            raise HTTPException(
+                status_code=503, 
+                detail="RAG Agent is not initialized. Please check server configuration."
+            )
+        session_id = session_id or "default"
+        result = await my_rag_agent.aask_detailed(transcript, session_id=session_id)
         return SpeechResponse(
             transcript=transcript,
+            response=result["answer"],
+            session_id=session_id,
             status="success"
         )
 
+    except HTTPException:
+        raise
+    except TooManyStreamsError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error in speech-to-text: {e}")
         raise HTTPException(
@@ -312,6 +917,78 @@ async def speech_to_text(request: SpeechRequest):
         )
 
 
+async def _close_with_error(websocket: WebSocket, detail: str, code: int) -> None:
+    try:
+        await websocket.send_json({"event": "error", "detail": detail})
+        await websocket.close(code=code)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+
+
+@app.websocket("/speech/stream")
+async def speech_stream(websocket: WebSocket, chat: bool = False, session_id: Optional[str] = None):
+    """
+    Stream speech over a WebSocket and receive transcripts as they are recognized.
+
+    The client sends audio as binary messages, then the text message "end".
+    The server sends JSON events: "partial" and "final" with a ``transcript``
+    as the recognizer produces them, then "transcript" with the whole
+    transcript once the audio has ended. With ``chat=true`` the transcript is
+    then answered in ``session_id`` and the answer streamed as the "token"
+    and "done" events of ``/chat/stream``. Errors are sent as an "error"
+    event before the socket is closed.
+    """
+    await websocket.accept()
+    speech_streams = await asyncio.to_thread(get_speech_streams)
+    if speech_streams is None:
+        await _close_with_error(websocket, "Speech-to-Text service is not available", 1011)
+        return
+
+    async def audio():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                yield message["bytes"]
+            elif (message.get("text") or "").strip() == "end":
+                return
+
+    try:
+        finals = []
+        async for transcript in speech_streams.transcribe(audio()):
+            if transcript.is_final:
+                finals.append(transcript.text)
+            await websocket.send_json({
+                "event": "final" if transcript.is_final else "partial",
+                "transcript": transcript.text
+            })
+        transcript = "".join(finals)
+        await websocket.send_json({"event": "transcript", "transcript": transcript})
+
+        if chat and transcript.strip():
+            my_rag_agent = await asyncio.to_thread(get_rag_agent)
+            if my_rag_agent is None:
+                await _close_with_error(
+                    websocket, "RAG Agent is not initialized. Please check server configuration.", 1011
+                )
+                return
+            session_id = session_id or "default"
+            async for event in my_rag_agent.astream_ask(transcript, session_id=session_id):
+                if event["event"] == "done":
+                    event["data"]["session_id"] = session_id
+                await websocket.send_json(event)
+        await websocket.close()
+
+    except WebSocketDisconnect:
+        logger.info("Speech stream client disconnected")
+    except TooManyStreamsError as e:
+        await _close_with_error(websocket, str(e), 1013)
+    except Exception as e:
+        logger.error(f"Error in speech stream: {e}")
+        await _close_with_error(websocket, f"Failed to process speech: {str(e)}", 1011)
+
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting RAG PDF Chat API server...")
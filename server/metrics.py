@@ -0,0 +1,298 @@
+from typing_extensions import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 8000, 16000, 32000)
+
+TRACE_HEADER = "x-trace-id"
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Set for the duration of each HTTP request by TraceMiddleware
+current_trace_id: ContextVar[Optional[str]] = ContextVar("current_trace_id", default=None)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """A set of metrics rendered together for ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> None:
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Failed to collect metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative ``le`` buckets, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (the last one is +Inf), sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the ``with`` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """
+    A counter or gauge read at scrape time, for values that other components
+    already track (queue depths, cache counters).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = REGISTRY
+    ):
+        """
+        Args:
+            kind (str): "counter" or "gauge"
+            callback (Callable[[], Dict[Tuple[str, ...], float]]): Returns the
+                current value per label value tuple; may return an empty dict
+        """
+        self.kind = kind
+        self.callback = callback
+        super().__init__(name, help, labelnames, registry)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.callback().items())
+        ]
+
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each RAG pipeline stage",
+    ["stage"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route and status, until the response is fully sent",
+    ["method", "route", "status"]
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens",
+    "Tokens per generation prompt",
+    buckets=TOKEN_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total",
+    "Tokens reported by the chat model, by direction",
+    ["direction"]
+)
+INGESTED_ITEMS = Counter(
+    "rag_ingested_items_total",
+    "Pages parsed and chunks split and embedded during ingestion",
+    ["stage"]
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and in the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the ``with`` block as one occurrence of ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class TraceMiddleware:
+    """
+    Times every HTTP request and tags it with a trace id.
+
+    The id is taken from an ``X-Trace-Id`` request header when one is sent,
+    generated otherwise, and returned in the ``X-Trace-Id`` response header.
+    Stages recorded while the request runs are returned in a
+    ``Server-Timing`` header, and requests slower than ``slow_seconds`` are
+    logged with their trace id and stage breakdown.
+    """
+
+    def __init__(self, app, slow_seconds: float = 5.0):
+        self.app = app
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = None
+        for name, value in scope.get("headers", []):
+            if name == TRACE_HEADER.encode("latin-1"):
+                candidate = value.decode("latin-1")
+                if _TRACE_ID_PATTERN.match(candidate):
+                    trace_id = candidate
+                break
+        trace_id = trace_id or uuid.uuid4().hex
+        timings: Dict[str, float] = {}
+        trace_token = current_trace_id.set(trace_id)
+        timings_token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace_id.encode("latin-1")))
+                if timings:
+                    server_timing = ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+                    headers.append((b"server-timing", server_timing.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=str(status))
+            if elapsed > self.slow_seconds:
+                breakdown = ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
+                logger.warning(
+                    f"Slow request {scope['method']} {scope['path']} took {elapsed:.2f}s "
+                    f"(trace_id={trace_id}; {breakdown or 'no stages recorded'})"
+                )
+            current_trace_id.reset(trace_token)
+            _request_timings.reset(timings_token)
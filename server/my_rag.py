@@ -1,67 +1,303 @@
 from langchain.chat_models import init_chat_model
 from langchain_openai import OpenAIEmbeddings
-from langchain_core.vectorstores import InMemoryVectorStore
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 from langgraph.graph import START, StateGraph
-from typing_extensions import List, TypedDict
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from typing_extensions import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, TypedDict
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langgraph.graph.message import MessagesState
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.runnables import RunnableLambda
 
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import asyncio
+import contextvars
+import multiprocessing
+import httpx
 import os
 import logging
 import shutil
+import threading
+import time
+
+from embedding_cache import CachedEmbeddings
+from embedding_pipeline import EmbeddingPipeline
+from answer_cache import AnswerCache, history_digest
+from checkpointing import BoundedMemorySaver, make_checkpointer
+from context_builder import BuiltPrompt, ContextBuilder, TokenCounter
+from documents import DocumentRecord, DocumentRegistry, file_digest
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from metrics import INGESTED_ITEMS, LLM_TOKENS, PROMPT_TOKENS, record_stage, timed
+from query_cache import QueryCache
+from retrieval import SearchEngine
+from sessions import SessionStore, SharedSessionStore
+from vector_store import MmapVectorStore
 
 logger = logging.getLogger(__name__)
 
+GENERATION_ERROR_MESSAGE = "I apologize, but I encountered an error while generating a response. Please try again."
+
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+
+
+_http_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+
+
+def _shared_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Return the process-wide pooled HTTP clients used for every OpenAI call, so
+    connections are reused across requests and agents instead of reopened.
+    """
+    global _http_clients
+    if _http_clients is None:
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+        )
+        timeout = httpx.Timeout(60.0, connect=10.0)
+        _http_clients = (
+            httpx.Client(limits=limits, timeout=timeout),
+            httpx.AsyncClient(limits=limits, timeout=timeout)
+        )
+    return _http_clients
+
+
+async def _acquire_lock(lock: threading.Lock) -> None:
+    """Acquire a thread lock from a coroutine without blocking the event loop."""
+    if lock.acquire(blocking=False):
+        return
+    acquired = asyncio.get_running_loop().run_in_executor(None, lock.acquire)
+    try:
+        await asyncio.shield(acquired)
+    except asyncio.CancelledError:
+        # The executor will still take the lock; hand it back once it does
+        acquired.add_done_callback(lambda _: lock.release())
+        raise
+
+
+def _record_usage(message: BaseMessage) -> None:
+    """Count the tokens the chat model reported for a response, if it reported any."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), direction="output")
+
+
+def _make_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build the text splitter used for document chunking."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, 
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+
+def _iter_page_splits(
+    pdf_path: str,
+    text_splitter: RecursiveCharacterTextSplitter,
+    timings: Dict[str, float]
+) -> Iterator[List[Document]]:
+    """Parse and split a PDF page by page, adding the seconds spent on each to ``timings``."""
+    pages = iter(PyPDFLoader(pdf_path).lazy_load())
+    while True:
+        started = time.perf_counter()
+        page = next(pages, None)
+        timings["pdf_parse"] = timings.get("pdf_parse", 0.0) + time.perf_counter() - started
+        if page is None:
+            return
+        started = time.perf_counter()
+        splits = text_splitter.split_documents([page])
+        timings["pdf_split"] = timings.get("pdf_split", 0.0) + time.perf_counter() - started
+        yield splits
+
+
+def _split_pdf(pdf_path: str, chunk_size: int, chunk_overlap: int) -> Tuple[int, List[Document], Dict[str, float]]:
+    """
+    Parse and split a single PDF page by page. Runs inside a worker process.
+    
+    Returns:
+        Tuple[int, List[Document], Dict[str, float]]: Number of pages parsed, the
+        resulting chunks, and the seconds spent parsing and splitting
+    """
+    text_splitter = _make_text_splitter(chunk_size, chunk_overlap)
+    timings: Dict[str, float] = {}
+    page_count = 0
+    splits = []
+    for page_splits in _iter_page_splits(pdf_path, text_splitter, timings):
+        page_count += 1
+        splits.extend(page_splits)
+    return page_count, splits, timings
+
+
 class MyRAGAgent:
     """
     A RAG (Retrieval-Augmented Generation) agent that processes PDF documents
     and provides intelligent chat responses using OpenAI and LangChain.
     """
     
-    def __init__(self, openai_api_key: str):
+    def __init__(
+        self,
+        openai_api_key: str,
+        llm: Optional[BaseChatModel] = None,
+        embeddings: Optional[Embeddings] = None,
+        parse_workers: Optional[int] = None,
+        embedding_cache_path: Optional[str] = None,
+        vector_store_path: Optional[str] = None,
+        openai_base_url: Optional[str] = None,
+        read_only: bool = False,
+        sessions_path: Optional[str] = None
+    ):
         """
         Initialize the RAG agent with OpenAI API key and set up components.
         
         Args:
             openai_api_key (str): OpenAI API key for embeddings and chat completion
+            llm (Optional[BaseChatModel]): Chat model to use instead of gpt-4o-mini
+            embeddings (Optional[Embeddings]): Embeddings model to use instead of
+                OpenAI's text-embedding-3-large
+            parse_workers (Optional[int]): Number of processes used to parse
+                multiple PDFs in parallel
+            embedding_cache_path (Optional[str]): Path of an on-disk embedding cache;
+                when set, chunks that were embedded before are never re-embedded
+            vector_store_path (Optional[str]): Directory of the persistent vector
+                store; a temporary store is used when omitted
+            openai_base_url (Optional[str]): Base URL of an OpenAI-compatible API
+                to use instead of api.openai.com
+            read_only (bool): Share a vector store another process writes to,
+                picking up its changes with ``refresh``; see ``promote``
+            sessions_path (Optional[str]): Directory through which chat sessions
+                are shared with other worker processes; sessions stay in this
+                process's memory when omitted
         """
         self.openai_api_key = openai_api_key
+        self.read_only = read_only
+        http_client, http_async_client = _shared_http_clients()
         
         try:
             # Initialize language model - using gpt-4o as the newest OpenAI model 
-            self.llm = init_chat_model(
+            self.llm = llm or init_chat_model(
                 "gpt-4o-mini", 
                 model_provider="openai", 
-                openai_api_key=self.openai_api_key
+                openai_api_key=self.openai_api_key,
+                base_url=openai_base_url,
+                http_client=http_client,
+                http_async_client=http_async_client
             )
             logger.info("Language model initialized successfully")
             
             # Initialize embeddings
-            self.embeddings = OpenAIEmbeddings(
+            self.embeddings = embeddings or OpenAIEmbeddings(
                 model="text-embedding-3-large", 
-                openai_api_key=self.openai_api_key
+                openai_api_key=self.openai_api_key,
+                base_url=openai_base_url,
+                # OpenAI-compatible servers expect raw strings, not tiktoken ids
+                check_embedding_ctx_length=openai_base_url is None,
+                # Retries are handled by the embedding pipeline
+                max_retries=0,
+                http_client=http_client,
+                http_async_client=http_async_client
             )
+            # Batch, parallelise and throttle document embedding requests
+            self.embedding_pipeline = EmbeddingPipeline(
+                self.embeddings,
+                batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+                max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", "4")),
+                tokens_per_minute=int(os.getenv("EMBEDDING_TPM", "0")) or None,
+                requests_per_minute=int(os.getenv("EMBEDDING_RPM", "0")) or None,
+                max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+            )
+            self.embeddings = self.embedding_pipeline
+            if embedding_cache_path:
+                self.embeddings = CachedEmbeddings(
+                    self.embeddings,
+                    path=embedding_cache_path,
+                    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_MB", "512")) * 1024 * 1024
+                )
             logger.info("Embeddings model initialized successfully")
             
-            # Initialize in-memory vector store
-            self.vector_store = InMemoryVectorStore(self.embeddings)
+            # Initialize the BM25 index, kept in step with every vector store append
+            self.lexical_index = LexicalIndex(
+                os.path.join(vector_store_path, "lexical.npz") if vector_store_path else None
+            )
+            self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid")
+            if self.retrieval_mode not in RETRIEVAL_MODES:
+                raise ValueError(f"RETRIEVAL_MODE must be one of {', '.join(RETRIEVAL_MODES)}")
+            self.query_embedding_timeout = float(os.getenv("QUERY_EMBEDDING_TIMEOUT_SECONDS", "2.0"))
+            self.lexical_fallbacks = 0
+            self.batch_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+            self._query_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="query-embed")
+            
+            # Initialize persistent, memory-mapped vector store
+            self.vector_store = MmapVectorStore(
+                self.embeddings,
+                path=vector_store_path,
+                search_engine=SearchEngine(
+                    ann_threshold=int(os.getenv("ANN_THRESHOLD", "50000")),
+                    first_pass_dim=int(os.getenv("VECTOR_FIRST_PASS_DIM", "0")) or None,
+                    first_pass_int8=os.getenv("VECTOR_FIRST_PASS_INT8", "false").lower() == "true",
+                    rerank_factor=int(os.getenv("VECTOR_RERANK_FACTOR", "8"))
+                ),
+                on_append=lambda start, texts, ids: self.lexical_index.add(start, texts, last_id=ids[-1]),
+                read_only=read_only
+            )
             logger.info("Vector store initialized successfully")
             
-            # Initialize text splitter for document chunking
-            self.text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000, 
-                chunk_overlap=200,
-                length_function=len,
-                separators=["\n\n", "\n", " ", ""]
+            # Initialize the registry of indexed documents, keyed by content hash
+            self.documents = DocumentRegistry(
+                os.path.join(vector_store_path, "documents.json") if vector_store_path else None
             )
+            self.compact_ratio = float(os.getenv("VECTOR_STORE_COMPACT_RATIO", "0.5"))
+            self._index_lock = threading.Lock()
+            self._active_loads = 0
+            if vector_store_path and not read_only and len(self.documents) == 0 and len(self.vector_store) > 0:
+                self._register_untracked_chunks()
+            self._sync_lexical_index()
+            
+            # Initialize text splitter for document chunking
+            self.chunk_size = 1000
+            self.chunk_overlap = 200
+            self.text_splitter = _make_text_splitter(self.chunk_size, self.chunk_overlap)
+            self.parse_workers = parse_workers or min(4, os.cpu_count() or 1)
             logger.info("Text splitter initialized successfully")
             
-            # Initialize chat history
-            self.chat_history = []
+            # Initialize the token-budgeted prompt builder
+            self.context_builder = ContextBuilder(
+                TokenCounter(os.getenv("PROMPT_TOKEN_ENCODING", "o200k_base")),
+                max_prompt_tokens=int(os.getenv("PROMPT_MAX_TOKENS", "3000")),
+                max_history_tokens=int(os.getenv("PROMPT_HISTORY_MAX_TOKENS", "1000")),
+                chunk_overlap=self.chunk_overlap
+            )
+            
+            # Initialize per-session chat history
+            session_limits = dict(
+                max_sessions=int(os.getenv("MAX_CHAT_SESSIONS", "1000")),
+                ttl_seconds=float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600")),
+                max_total_chars=int(os.getenv("CHAT_SESSIONS_MAX_CHARS", "20000000")),
+                on_evict=self._drop_checkpoints
+            )
+            self.sessions = (
+                SharedSessionStore(sessions_path, **session_limits) if sessions_path
+                else SessionStore(**session_limits)
+            )
+            
+            # Initialize answer cache, invalidated whenever the corpus changes
+            self.corpus_version = 0
+            self._corpus_lock = threading.Lock()
+            similarity = os.getenv("ANSWER_CACHE_SIMILARITY")
+            self.answer_cache = AnswerCache(
+                max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+                similarity_threshold=float(similarity) if similarity else None
+            )
+            
+            # Initialize query embedding and retrieval caches, shared by every session
+            self.query_cache = QueryCache(
+                max_embeddings=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2000")),
+                max_results=int(os.getenv("RETRIEVAL_CACHE_SIZE", "2000"))
+            )
             
             # Setup the conversation graph
             self._setup_graph()
@@ -71,106 +307,999 @@ class MyRAGAgent:
             logger.error(f"Failed to initialize RAG Agent: {e}")
             raise Exception(f"RAG Agent initialization failed: {e}")
 
-    def load_documents(self, pdf_paths: List[str]) -> None:
+    def load_documents(
+        self,
+        pdf_paths: List[str],
+        progress: Optional[Callable[[str, int], None]] = None,
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Load and process PDF documents into the vector store.
         
+        Pages are parsed lazily and split as they arrive, and chunks are embedded
+        in batches of ``batch_size`` so peak memory does not grow with document
+        size. When several files are given they are parsed across a process pool.
+        Each batch is embedded on a background stage, through the concurrent
+        embedding pipeline, while the next batch is being parsed.
+        
+        Every file is registered by content hash. Files whose content is already
+        indexed are skipped, and a file with the same name as an indexed document
+        replaces only that document's chunks, once the new ones are in place.
+        
         Args:
             pdf_paths (List[str]): List of paths to PDF files to process
+            progress (Optional[Callable[[str, int], None]]): Called with a stage name
+                ("pages_parsed", "chunks_split", "chunks_embedded") and an item count
+                as work completes
+            batch_size (Optional[int]): Number of chunks embedded per vector store
+                call; defaults to enough to keep every embedding worker busy
+        
+        Returns:
+            List[Dict[str, Any]]: Per file, the document id, filename and whether it
+            was "added", "replaced" or "unchanged", or "failed" with the ``error``
+            for a file that could not be read; no chunks of a failed file are kept
         """
+        def report(stage: str, count: int) -> None:
+            INGESTED_ITEMS.inc(count, stage=stage)
+            if progress is not None:
+                progress(stage, count)
+
         if not pdf_paths:
             logger.warning("No PDF paths provided for loading")
-            return
-            
-        docs = []
-        processed_files = []
+            return []
+        
+        def failure(pdf_path: str, error: str) -> Dict[str, Any]:
+            return {"document_id": None, "filename": os.path.basename(pdf_path), "status": "failed", "error": error}
         
+        results = []
+        valid_paths = {}
         for pdf_path in pdf_paths:
-            try:
-                if not os.path.exists(pdf_path):
-                    logger.error(f"PDF file not found: {pdf_path}")
-                    continue
-                    
-                if not pdf_path.lower().endswith('.pdf'):
-                    logger.error(f"File is not a PDF: {pdf_path}")
-                    continue
-                
-                logger.info(f"Loading PDF from {pdf_path}")
-                loader = PyPDFLoader(pdf_path)
-                loaded_docs = loader.load()
-                
-                if not loaded_docs:
-                    logger.warning(f"No content loaded from {pdf_path}")
-                    continue
-                
-                docs.extend(loaded_docs)
-                processed_files.append(pdf_path)
-                logger.info(f"Successfully loaded {len(loaded_docs)} pages from {pdf_path}")
+            if not os.path.exists(pdf_path):
+                logger.error(f"PDF file not found: {pdf_path}")
+                results.append(failure(pdf_path, "File not found"))
+                continue
                 
-            except Exception as e:
-                logger.error(f"Error loading PDF {pdf_path}: {e}")
+            if not pdf_path.lower().endswith('.pdf'):
+                logger.error(f"File is not a PDF: {pdf_path}")
+                results.append(failure(pdf_path, "File is not a PDF"))
+                continue
+            
+            size_bytes, sha256 = file_digest(pdf_path)
+            existing = self.documents.find_by_hash(sha256)
+            if existing is not None or sha256 in [digest for _, digest in valid_paths.values()]:
+                logger.info(f"Skipping {pdf_path}: identical content is already indexed")
+                results.append({
+                    "document_id": sha256[:16],
+                    "filename": os.path.basename(pdf_path),
+                    "status": "unchanged",
+                })
                 continue
+            
+            valid_paths[pdf_path] = (size_bytes, sha256)
+        
+        if not valid_paths:
+            return results
+        
+        batch_size = batch_size or self.embedding_pipeline.batch_size * self.embedding_pipeline.max_concurrency
+        pages_loaded = 0
+        chunks_added = 0
+        pending = []
+        pages: Dict[str, int] = {}
+        ranges: Dict[str, List[List[int]]] = {}
+        failed: Dict[str, str] = {}
+        
+        def flush(batch: List[Tuple[str, Document]]) -> None:
+            start, _ = self.vector_store.append_documents([doc for _, doc in batch])
+            for row, (pdf_path, _) in enumerate(batch, start):
+                path_ranges = ranges.setdefault(pdf_path, [])
+                if path_ranges and path_ranges[-1][1] == row:
+                    path_ranges[-1][1] = row + 1
+                else:
+                    path_ranges.append([row, row + 1])
+            self._bump_corpus_version()
+            report("chunks_embedded", len(batch))
         
-        if not docs:
-            logger.error("No documents were successfully loaded")
-            raise Exception("Failed to load any documents")
+        # At most one batch is embedded while the next one is parsed
+        embed_stage = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-stage")
+        in_flight: Optional[Future] = None
         
+        def submit(batch: List[Tuple[str, Document]]) -> None:
+            nonlocal in_flight
+            if in_flight is not None:
+                in_flight.result()
+            in_flight = embed_stage.submit(flush, batch)
+        
+        with self._index_lock:
+            self._active_loads += 1
+        started = time.perf_counter()
         try:
-            # Split documents into chunks
-            all_splits = self.text_splitter.split_documents(docs)
-            logger.info(f"Split documents into {len(all_splits)} chunks")
+            for pdf_path, page_count, splits in self._iter_pdf_splits(list(valid_paths), failed):
+                pages_loaded += page_count
+                pages[pdf_path] = pages.get(pdf_path, 0) + page_count
+                report("pages_parsed", page_count)
+                report("chunks_split", len(splits))
+                
+                pending.extend((pdf_path, split) for split in splits)
+                while len(pending) >= batch_size:
+                    submit(pending[:batch_size])
+                    chunks_added += batch_size
+                    pending = pending[batch_size:]
+            
+            if pages_loaded == 0:
+                logger.error("No documents were successfully loaded")
+                errors = "; ".join(f"{os.path.basename(path)}: {error}" for path, error in failed.items())
+                raise Exception(f"Failed to load any documents ({errors})" if errors else "Failed to load any documents")
+            
+            if pending:
+                submit(pending)
+                chunks_added += len(pending)
+            if in_flight is not None:
+                in_flight.result()
             
-            if not all_splits:
+            if chunks_added == 0:
                 raise Exception("Document splitting resulted in no chunks")
             
-            # Add documents to vector store
-            self.vector_store.add_documents(all_splits)
-            logger.info(f"Added {len(all_splits)} document chunks to vector store")
+            # A file that failed part-way through keeps none of its chunks
+            dropped = [r for pdf_path in failed for r in ranges.pop(pdf_path, [])]
+            if dropped:
+                self.vector_store.delete_rows(dropped)
+            results.extend(failure(pdf_path, error) for pdf_path, error in failed.items())
+            results.extend(self._register_documents(valid_paths, ranges, pages))
+            logger.info(f"Added {chunks_added} document chunks from {pages_loaded} pages to vector store")
             
         except Exception as e:
+            # Never leave chunks in the store that no document owns
+            embed_stage.shutdown(wait=True)
+            self.vector_store.delete_rows([r for path_ranges in ranges.values() for r in path_ranges])
             logger.error(f"Error processing documents: {e}")
             raise Exception(f"Document processing failed: {e}")
+        finally:
+            embed_stage.shutdown(wait=True)
+            with self._index_lock:
+                self._active_loads -= 1
+            record_stage("load_documents", time.perf_counter() - started)
+        
+        self.lexical_index.maybe_save()
+        self._maybe_compact()
+        return results
+
+    def _register_documents(
+        self,
+        paths: Dict[str, Tuple[int, str]],
+        ranges: Dict[str, List[List[int]]],
+        pages: Dict[str, int]
+    ) -> List[Dict[str, Any]]:
+        """
+        Register freshly indexed files and drop the chunks of the documents they replace.
+        
+        The duplicate check in ``load_documents`` runs before embedding and
+        without the index lock, so a concurrent load of the same content can
+        register it first; the chunks this load appended for such a file are
+        dropped again and the existing document is reported instead.
+        """
+        results = []
+        replaced = []
+        with self._index_lock:
+            for pdf_path, (size_bytes, sha256) in paths.items():
+                if pdf_path not in ranges:
+                    continue
+                filename = os.path.basename(pdf_path)
+                existing = self.documents.find_by_hash(sha256)
+                if existing is not None:
+                    logger.info(f"Dropping chunks of {pdf_path}: identical content was indexed concurrently")
+                    replaced.extend(ranges[pdf_path])
+                    results.append({"document_id": existing.id, "filename": filename, "status": "unchanged"})
+                    continue
+                previous = self.documents.find_by_filename(filename)
+                record = DocumentRecord(
+                    sha256=sha256,
+                    filename=filename,
+                    path=pdf_path,
+                    size_bytes=size_bytes,
+                    chunk_ranges=ranges[pdf_path],
+                    pages=pages.get(pdf_path, 0)
+                )
+                self.documents.add(record)
+                status = "added"
+                if previous is not None and previous.id != record.id:
+                    self.documents.remove(previous.id)
+                    replaced.extend(previous.chunk_ranges)
+                    status = "replaced"
+                logger.info(f"Document {record.id} ({filename}) {status} with {record.chunks} chunks")
+                results.append({"document_id": record.id, "filename": filename, "status": status})
+            if replaced:
+                self.vector_store.delete_rows(replaced)
+        if replaced:
+            self._bump_corpus_version()
+        return results
+
+    def delete_document(self, document_id: str) -> Optional[DocumentRecord]:
+        """
+        Remove one document's chunks from the vector store.
+        
+        Args:
+            document_id (str): Id of the document to delete
+        
+        Returns:
+            Optional[DocumentRecord]: The deleted document, or None if it was not found
+        """
+        try:
+            with self._index_lock:
+                record = self.documents.remove(document_id)
+                if record is None:
+                    return None
+                self.vector_store.delete_rows(record.chunk_ranges)
+            self._bump_corpus_version()
+            self._maybe_compact()
+            logger.info(f"Deleted document {document_id} ({record.filename}, {record.chunks} chunks)")
+            return record
+        except Exception as e:
+            logger.error(f"Error deleting document {document_id}: {e}")
+            raise Exception(f"Failed to delete document: {e}")
+
+    def _maybe_compact(self) -> None:
+        """Compact the vector store once deleted rows outweigh ``compact_ratio`` of it."""
+        with self._index_lock:
+            if self._active_loads or self.vector_store.deleted_count <= self.compact_ratio * len(self.vector_store):
+                return
+            remap = self.vector_store.compact()
+            if remap is not None:
+                self.documents.remap(remap)
+                last_row = len(self.vector_store) - 1
+                self.lexical_index.remap(remap, self.vector_store.get_id(last_row) if last_row >= 0 else None)
+                self.lexical_index.save()
 
-    def ask(self, question: str) -> str:
+    def _sync_lexical_index(self) -> None:
+        """Load the BM25 snapshot and index every chunk stored after it was taken."""
+        index = self.lexical_index
+        view = self.vector_store.snapshot()
+        row_count = len(view.rows)
+        if len(index) == 0 and index.load():
+            rows = len(index)
+            if rows > row_count or (rows and self.vector_store.get_id(rows - 1, view) != index.last_id):
+                logger.warning("Lexical index snapshot does not match the vector store; rebuilding it")
+                index.clear(remove_snapshot=not self.read_only)
+        indexed = index.sync(
+            row_count,
+            lambda start, end: self.vector_store.get_texts(start, end, view),
+            last_id=self.vector_store.get_id(row_count - 1, view) if row_count else None,
+            skip=view.deleted
+        )
+        if indexed:
+            logger.info(f"Indexed {indexed} chunks for lexical search")
+            if not self.read_only:
+                index.maybe_save()
+
+    def refresh(self) -> bool:
+        """
+        Pick up documents another process added to or deleted from the shared
+        vector store. Only agents created with ``read_only`` need this.
+
+        Returns:
+            bool: Whether the indexed documents changed
+        """
+        with self._index_lock:
+            change = self.vector_store.refresh()
+            if change == "rewritten":
+                # Row numbers changed: start over from the writer's snapshot
+                self.lexical_index.clear(remove_snapshot=False)
+            if change:
+                self._sync_lexical_index()
+            reloaded = self.documents.reload()
+        if change or reloaded:
+            self._bump_corpus_version()
+        return bool(change or reloaded)
+
+    def promote(self) -> None:
+        """Take over writing to the shared vector store from a process that has exited."""
+        with self._index_lock:
+            self.vector_store.promote()
+            self.read_only = False
+            self.lexical_index.clear(remove_snapshot=False)
+            self._sync_lexical_index()
+            self.documents.reload()
+        self._bump_corpus_version()
+        logger.info("RAG agent now writes to the shared vector store")
+
+    def _register_untracked_chunks(self) -> None:
+        """Build the registry for a store written before documents were tracked."""
+        ranges: Dict[str, List[List[int]]] = {}
+        for row in range(len(self.vector_store)):
+            source = self.vector_store.get_metadata(row).get("source", "")
+            path_ranges = ranges.setdefault(source, [])
+            if path_ranges and path_ranges[-1][1] == row:
+                path_ranges[-1][1] = row + 1
+            else:
+                path_ranges.append([row, row + 1])
+        orphaned = []
+        for source, path_ranges in ranges.items():
+            if not source or not os.path.exists(source):
+                orphaned.extend(path_ranges)
+                continue
+            size_bytes, sha256 = file_digest(source)
+            self.documents.add(DocumentRecord(
+                sha256=sha256,
+                filename=os.path.basename(source),
+                path=source,
+                size_bytes=size_bytes,
+                chunk_ranges=path_ranges
+            ))
+        self.vector_store.delete_rows(orphaned)
+        logger.info(f"Registered {len(self.documents)} previously indexed documents")
+
+    def _iter_pdf_splits(
+        self, pdf_paths: List[str], failed: Optional[Dict[str, str]] = None
+    ) -> Iterator[Tuple[str, int, List[Document]]]:
+        """
+        Yield ``(pdf_path, pages_parsed, chunks)`` triples for the given PDFs.
+        
+        A single file is streamed page by page in this process. Multiple files
+        are parsed and split in parallel worker processes, and each file's
+        chunks are yielded as soon as its worker finishes.
+        
+        Files that cannot be read, or have no content, are skipped and recorded
+        in ``failed`` with the reason; a file streamed page by page may already
+        have yielded some pages when it fails.
+        """
+        if failed is None:
+            failed = {}
+        if len(pdf_paths) > 1 and self.parse_workers > 1:
+            workers = min(self.parse_workers, len(pdf_paths))
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                futures = {
+                    pool.submit(_split_pdf, pdf_path, self.chunk_size, self.chunk_overlap): pdf_path
+                    for pdf_path in pdf_paths
+                }
+                for future in as_completed(futures):
+                    pdf_path = futures[future]
+                    try:
+                        page_count, splits, timings = future.result()
+                    except Exception as e:
+                        logger.error(f"Error loading PDF {pdf_path}: {e}")
+                        failed[pdf_path] = str(e)
+                        continue
+                    for stage, seconds in timings.items():
+                        record_stage(stage, seconds)
+                    if page_count == 0:
+                        logger.warning(f"No content loaded from {pdf_path}")
+                        failed[pdf_path] = "No content could be loaded"
+                        continue
+                    logger.info(f"Successfully loaded {page_count} pages from {pdf_path}")
+                    yield pdf_path, page_count, splits
+            return
+        
+        for pdf_path in pdf_paths:
+            logger.info(f"Loading PDF from {pdf_path}")
+            page_count = 0
+            timings: Dict[str, float] = {}
+            try:
+                for splits in _iter_page_splits(pdf_path, self.text_splitter, timings):
+                    page_count += 1
+                    yield pdf_path, 1, splits
+            except Exception as e:
+                logger.error(f"Error loading PDF {pdf_path}: {e}")
+                failed[pdf_path] = str(e)
+                continue
+            finally:
+                for stage, seconds in timings.items():
+                    record_stage(stage, seconds)
+            
+            if page_count == 0:
+                logger.warning(f"No content loaded from {pdf_path}")
+                failed[pdf_path] = "No content could be loaded"
+            else:
+                logger.info(f"Successfully loaded {page_count} pages from {pdf_path}")
+
+    def retrieve(self, question: str, k: int = 4) -> List[Document]:
+        """
+        Retrieve the chunks most relevant to a question.
+        
+        In "hybrid" mode the embedding and BM25 rankings are merged with
+        reciprocal rank fusion, so exact terms such as part numbers and section
+        ids are found even when the embedding misses them. If the query
+        embedding fails or takes longer than ``query_embedding_timeout``, the
+        BM25 ranking is used on its own. "lexical" mode always takes that fast
+        path and skips the embedding round-trip; "dense" mode never consults
+        the lexical index.
+        
+        Args:
+            question (str): The question to retrieve context for
+            k (int): Number of chunks to return
+            
+        Returns:
+            List[Document]: The retrieved chunks, most relevant first
+        """
+        with timed("retrieve"):
+            corpus_version = self.corpus_version
+            cached = self.query_cache.get_results(corpus_version, question, k)
+            if cached is not None:
+                return cached
+            embedding = None
+            if self.retrieval_mode == "dense":
+                embedding = self._embed_query(question)
+            elif self.retrieval_mode == "hybrid":
+                embedding = self.query_cache.get_embedding(question)
+                if embedding is None:
+                    # Run in the caller's context so stage timings reach the current request
+                    future = self._query_executor.submit(
+                        contextvars.copy_context().run, self._embed_query, question, False
+                    )
+                    try:
+                        embedding = future.result(timeout=self.query_embedding_timeout)
+                    except Exception as e:
+                        self._lexical_fallback(e)
+            started = time.perf_counter()
+            docs = self._rank(question, embedding, k)
+            self._cache_results(corpus_version, question, k, embedding, docs, time.perf_counter() - started)
+            return docs
+
+    async def aretrieve(self, question: str, k: int = 4) -> List[Document]:
+        """Asynchronous version of ``retrieve``."""
+        with timed("retrieve"):
+            corpus_version = self.corpus_version
+            cached = self.query_cache.get_results(corpus_version, question, k)
+            if cached is not None:
+                return cached
+            embedding = None
+            if self.retrieval_mode == "dense":
+                embedding = await self._aembed_query(question)
+            elif self.retrieval_mode == "hybrid":
+                embedding = self.query_cache.get_embedding(question)
+                if embedding is None:
+                    try:
+                        embedding = await asyncio.wait_for(
+                            self._aembed_query(question, False), self.query_embedding_timeout
+                        )
+                    except Exception as e:
+                        self._lexical_fallback(e)
+            started = time.perf_counter()
+            # Scoring a large corpus takes long enough to stall other requests
+            if len(self.vector_store) < 10000:
+                docs = self._rank(question, embedding, k)
+            else:
+                docs = await asyncio.to_thread(self._rank, question, embedding, k)
+            self._cache_results(corpus_version, question, k, embedding, docs, time.perf_counter() - started)
+            return docs
+
+    def _embed_query(self, question: str, lookup: bool = True) -> List[float]:
+        """Embed a question through the query embedding cache (``lookup=False`` when the caller already missed it)."""
+        embedding = self.query_cache.get_embedding(question) if lookup else None
+        if embedding is None:
+            started = time.perf_counter()
+            embedding = self.embeddings.embed_query(question)
+            self.query_cache.put_embedding(question, embedding, time.perf_counter() - started)
+        return embedding
+
+    async def _aembed_query(self, question: str, lookup: bool = True) -> List[float]:
+        """Asynchronous version of ``_embed_query``."""
+        embedding = self.query_cache.get_embedding(question) if lookup else None
+        if embedding is None:
+            started = time.perf_counter()
+            embedding = await self.embeddings.aembed_query(question)
+            self.query_cache.put_embedding(question, embedding, time.perf_counter() - started)
+        return embedding
+
+    def _embed_queries(self, questions: List[str]) -> List[List[float]]:
+        """Embed many questions, sending only those missing from the query embedding cache in one batch."""
+        embeddings = [self.query_cache.get_embedding(question) for question in questions]
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            started = time.perf_counter()
+            embedded = self.embeddings.embed_queries([questions[i] for i in misses])
+            seconds = (time.perf_counter() - started) / len(misses)
+            for i, embedding in zip(misses, embedded):
+                embeddings[i] = embedding
+                self.query_cache.put_embedding(questions[i], embedding, seconds)
+        return embeddings
+
+    def _cache_results(
+        self,
+        corpus_version: int,
+        question: str,
+        k: int,
+        embedding: Optional[List[float]],
+        docs: List[Document],
+        seconds: float
+    ) -> None:
+        """Remember retrieved chunks, unless they came from the lexical fallback of a hybrid search."""
+        if (embedding is None) == (self.retrieval_mode == "lexical"):
+            self.query_cache.put_results(corpus_version, question, k, docs, seconds)
+
+    def _retrieve_many(
+        self, questions: List[str], embeddings: Optional[List[List[float]]], k: int
+    ) -> List[List[Document]]:
+        """Retrieve for a batch of questions, ranking those missing from the retrieval cache together."""
+        corpus_version = self.corpus_version
+        results = [self.query_cache.get_results(corpus_version, question, k) for question in questions]
+        misses = [i for i, docs in enumerate(results) if docs is None]
+        if misses:
+            started = time.perf_counter()
+            ranked = self._rank_many(
+                [questions[i] for i in misses],
+                [embeddings[i] for i in misses] if embeddings is not None else None,
+                k
+            )
+            seconds = (time.perf_counter() - started) / len(misses)
+            for i, docs in zip(misses, ranked):
+                results[i] = docs
+                self._cache_results(
+                    corpus_version, questions[i], k, embeddings[i] if embeddings is not None else None, docs, seconds
+                )
+        return results
+
+    def _lexical_fallback(self, error: Exception) -> None:
+        self.lexical_fallbacks += 1
+        logger.warning(f"Query embedding unavailable ({str(error) or type(error).__name__}), using lexical retrieval")
+
+    def _rank(self, question: str, embedding: Optional[List[float]], k: int) -> List[Document]:
+        """Rank chunks by the query embedding and/or BM25 and return the top ``k``."""
+        view = self.vector_store.snapshot()
+        vector_rows = None
+        if embedding is not None:
+            with timed("vector_search"):
+                vector_rows, _ = self.vector_store.search_rows(embedding, self._vector_depth(k), view)
+        return self._fuse(question, vector_rows, k, view)
+
+    def _rank_many(
+        self, questions: List[str], embeddings: Optional[List[List[float]]], k: int
+    ) -> List[List[Document]]:
+        """Like ``_rank`` for a batch of questions, with their embeddings scored against the store together."""
+        view = self.vector_store.snapshot()
+        vector_rows = [None] * len(questions)
+        if embeddings is not None:
+            with timed("vector_search"):
+                results = self.vector_store.search_rows_many(embeddings, self._vector_depth(k), view)
+            vector_rows = [rows for rows, _ in results]
+        return [self._fuse(question, rows, k, view) for question, rows in zip(questions, vector_rows)]
+
+    def _vector_depth(self, k: int) -> int:
+        # Fuse deeper rankings than we return, so chunks ranked well by one
+        # retriever and moderately by the other can still make the cut
+        return k * 4 if self.retrieval_mode == "hybrid" else k
+
+    def _fuse(self, question: str, vector_rows: Optional[Any], k: int, view: Any) -> List[Document]:
+        """Fuse a vector ranking with the BM25 ranking of ``question`` and return the top ``k`` chunks."""
+        rankings = []
+        if vector_rows is not None:
+            rankings.append(vector_rows.tolist())
+        if self.retrieval_mode != "dense":
+            with timed("lexical_search"):
+                rows, _ = self.lexical_index.search(question, k * 4, deleted=view.deleted)
+            rankings.append([row for row in rows.tolist() if row < len(view.rows)])
+        return [self.vector_store.get_document(row, view) for row in reciprocal_rank_fusion(rankings)[:k]]
+
+    def get_retrieval_stats(self) -> Dict[str, Any]:
+        """Get the retrieval mode, the size of the lexical index and how often it stood in for embeddings."""
+        return {
+            "mode": self.retrieval_mode,
+            "lexical_rows": len(self.lexical_index),
+            "lexical_terms": self.lexical_index.term_count,
+            "lexical_fallbacks": self.lexical_fallbacks,
+            "vector_search": self.vector_store.search_engine.stats(),
+        }
+
+    def ask(self, question: str, session_id: str = "default") -> str:
         """
         Ask a question to the RAG system and get a response.
         
+        Turns within one session are serialised; different sessions run
+        concurrently without sharing any lock.
+        
         Args:
             question (str): The question to ask
+            session_id (str): Conversation the question belongs to
             
         Returns:
             str: The generated response
         """
+        return self.ask_detailed(question, session_id)["answer"]
+
+    def ask_detailed(self, question: str, session_id: str = "default") -> Dict[str, Any]:
+        """
+        Same as ``ask``, but also report how the answer was produced.
+        
+        Returns:
+            Dict[str, Any]: ``answer``, ``sources``, ``prompt_tokens`` (None when
+            the answer came from the cache) and ``cached``
+        """
         if not question.strip():
             raise ValueError("Question cannot be empty")
         
         try:
-            state = {
-                "messages": self.chat_history.copy(),
-                "question": question.strip(),
-                "context": [],
-                "answer": ""
+            question = question.strip()
+            corpus_version = self.corpus_version
+            embedding = self._embed_query(question) if self.answer_cache.semantic else None
+            
+            session = self.sessions.get(session_id)
+            with session.lock:
+                history = history_digest(session.messages)
+                cached = self.answer_cache.get(corpus_version, question, embedding, history)
+                if cached is not None:
+                    answer = cached["answer"]
+                    self.sessions.append(session, [HumanMessage(content=question), AIMessage(content=answer)])
+                    logger.info(f"Served cached response for question: {question[:50]}...")
+                    return {**cached, "prompt_tokens": None, "cached": True}
+                
+                state = {
+                    "messages": session.messages,
+                    "question": question,
+                    "context": [],
+                    "answer": ""
+                }
+                
+                config = {"configurable": {"thread_id": session_id}}
+                response = self.graph.invoke(state, config)
+                
+                # Update this session's history with the new messages
+                if "messages" in response and response["messages"]:
+                    self.sessions.append(session, response["messages"])
+            
+            answer = response.get("answer", "I apologize, but I couldn't generate a response.")
+            context_docs = response.get("context", [])
+            self._cache_answer(corpus_version, question, answer, context_docs, embedding, history)
+            logger.info(f"Generated response for question: {question[:50]}...")
+            
+            return {
+                "answer": answer,
+                "sources": [doc.metadata for doc in context_docs],
+                "prompt_tokens": response.get("prompt_tokens"),
+                "cached": False,
             }
             
-            config = {"configurable": {"thread_id": "session-1"}}
-            response = self.graph.invoke(state, config)
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            raise Exception(f"Failed to generate response: {e}")
+
+    async def aask(self, question: str, session_id: str = "default") -> str:
+        """
+        Asynchronous version of ``ask``: retrieval and generation await the
+        embeddings and chat APIs instead of blocking the event loop.
+        
+        Args:
+            question (str): The question to ask
+            session_id (str): Conversation the question belongs to
+            
+        Returns:
+            str: The generated response
+        """
+        return (await self.aask_detailed(question, session_id))["answer"]
+
+    async def aask_detailed(self, question: str, session_id: str = "default") -> Dict[str, Any]:
+        """Asynchronous version of ``ask_detailed``."""
+        if not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        try:
+            question = question.strip()
+            corpus_version = self.corpus_version
+            embedding = await self._aembed_query(question) if self.answer_cache.semantic else None
             
-            # Update chat history with new messages
-            if "messages" in response and response["messages"]:
-                self.chat_history.extend(response["messages"])
-                # Keep chat history manageable (last 20 messages)
-                if len(self.chat_history) > 20:
-                    self.chat_history = self.chat_history[-20:]
+            session = self.sessions.get(session_id)
+            await _acquire_lock(session.lock)
+            try:
+                history = history_digest(session.messages)
+                cached = self.answer_cache.get(corpus_version, question, embedding, history)
+                if cached is not None:
+                    answer = cached["answer"]
+                    self.sessions.append(session, [HumanMessage(content=question), AIMessage(content=answer)])
+                    logger.info(f"Served cached response for question: {question[:50]}...")
+                    return {**cached, "prompt_tokens": None, "cached": True}
+                
+                state = {
+                    "messages": session.messages,
+                    "question": question,
+                    "context": [],
+                    "answer": ""
+                }
+                
+                config = {"configurable": {"thread_id": session_id}}
+                response = await self.graph.ainvoke(state, config)
+                
+                if "messages" in response and response["messages"]:
+                    self.sessions.append(session, response["messages"])
+            finally:
+                session.lock.release()
             
             answer = response.get("answer", "I apologize, but I couldn't generate a response.")
+            context_docs = response.get("context", [])
+            self._cache_answer(corpus_version, question, answer, context_docs, embedding, history)
             logger.info(f"Generated response for question: {question[:50]}...")
             
-            return answer
+            return {
+                "answer": answer,
+                "sources": [doc.metadata for doc in context_docs],
+                "prompt_tokens": response.get("prompt_tokens"),
+                "cached": False,
+            }
             
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise Exception(f"Failed to generate response: {e}")
 
+    def _prepare_batch(
+        self, questions: List[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str, Optional[List[float]], List[Document]]]]:
+        """
+        Embed, look up and retrieve for a batch of questions; everything a batch does before generation.
+        
+        Returns:
+            Tuple: The results already known (empty questions, cached answers,
+            failures), and ``(index, question, embedding, context)`` for each
+            question left to generate
+        """
+        corpus_version = self.corpus_version
+        ready = []
+        pending = []
+        for index, question in enumerate(questions):
+            question = question.strip()
+            if question:
+                pending.append((index, question))
+            else:
+                ready.append({"index": index, "question": question, "error": "Question cannot be empty"})
+        if not pending:
+            return ready, []
+        
+        embeddings = None
+        if self.retrieval_mode != "lexical" or self.answer_cache.semantic:
+            try:
+                embeddings = self._embed_queries([question for _, question in pending])
+            except Exception as e:
+                if self.retrieval_mode == "dense":
+                    logger.error(f"Error embedding batch of {len(pending)} questions: {e}")
+                    ready.extend(
+                        {"index": index, "question": question, "error": f"Failed to generate response: {e}"}
+                        for index, question in pending
+                    )
+                    return ready, []
+                self._lexical_fallback(e)
+        
+        # Answer from the cache where possible, then retrieve the rest as one batch
+        uncached = []
+        for position, (index, question) in enumerate(pending):
+            embedding = embeddings[position] if embeddings is not None else None
+            cached = self.answer_cache.get(
+                corpus_version, question, embedding if self.answer_cache.semantic else None
+            )
+            if cached is not None:
+                ready.append({"index": index, "question": question, **cached, "prompt_tokens": None, "cached": True})
+            else:
+                uncached.append((index, question, embedding))
+        if not uncached:
+            return ready, []
+        
+        try:
+            with timed("retrieve"):
+                contexts = self._retrieve_many(
+                    [question for _, question, _ in uncached],
+                    (
+                        [embedding for _, _, embedding in uncached]
+                        if embeddings is not None and self.retrieval_mode != "lexical" else None
+                    ),
+                    4
+                )
+        except Exception as e:
+            logger.error(f"Error in batch retrieve step: {e}")
+            contexts = [[] for _ in uncached]
+        return ready, [(index, question, embedding, docs) for (index, question, embedding), docs in zip(uncached, contexts)]
+
+    def _batch_result(
+        self,
+        corpus_version: int,
+        index: int,
+        question: str,
+        embedding: Optional[List[float]],
+        context_docs: List[Document],
+        prompt: BuiltPrompt,
+        response: BaseMessage
+    ) -> Dict[str, Any]:
+        """Cache a generated batch answer and shape its result."""
+        _record_usage(response)
+        self._cache_answer(
+            corpus_version, question, response.content, context_docs,
+            embedding if self.answer_cache.semantic else None
+        )
+        return {
+            "index": index,
+            "question": question,
+            "answer": response.content,
+            "sources": [doc.metadata for doc in context_docs],
+            "prompt_tokens": prompt.stats["prompt_tokens"],
+            "cached": False,
+        }
+
+    async def aask_many(
+        self, questions: List[str], max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer a batch of independent questions, yielding each result as soon as it is ready.
+        
+        All questions are embedded in batched requests and retrieved with one
+        matrix product per block of questions; generation then fans out with
+        at most ``max_concurrency`` model calls in flight. Questions are
+        answered without chat history and leave every session untouched. The
+        answer cache is consulted and filled as for single questions.
+        
+        Args:
+            questions (List[str]): The questions to answer
+            max_concurrency (Optional[int]): Model calls in flight at once;
+                ``BATCH_MAX_CONCURRENCY`` when omitted
+            
+        Yields:
+            Dict[str, Any]: ``index`` (position in ``questions``) and ``question``,
+            with either ``answer``, ``sources``, ``prompt_tokens`` and ``cached``,
+            or ``error``
+        """
+        corpus_version = self.corpus_version
+        ready, to_generate = await asyncio.to_thread(self._prepare_batch, questions)
+        for result in ready:
+            yield result
+        if not to_generate:
+            return
+        
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        
+        async def answer(index, question, embedding, context_docs) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    prompt = self._build_prompt(question, context_docs, [])
+                    with timed("llm"):
+                        response = await self.llm.ainvoke([HumanMessage(content=prompt.text)])
+                except Exception as e:
+                    logger.error(f"Error generating response for batch question {index}: {e}")
+                    return {"index": index, "question": question, "error": f"Failed to generate response: {e}"}
+            return self._batch_result(corpus_version, index, question, embedding, context_docs, prompt, response)
+        
+        tasks = [asyncio.ensure_future(answer(*item)) for item in to_generate]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
+        logger.info(f"Answered batch of {len(questions)} questions ({len(to_generate)} generated)")
+
+    def ask_many(self, questions: List[str], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Blocking version of ``aask_many`` for scripts and evaluation runs.
+        
+        Generation runs on a pool of ``max_concurrency`` threads with the
+        model's synchronous client, so this works whether or not the agent
+        has been used from an event loop.
+        
+        Returns:
+            List[Dict[str, Any]]: One result per question, in the order of ``questions``
+        """
+        corpus_version = self.corpus_version
+        results, to_generate = self._prepare_batch(questions)
+        
+        def answer(index, question, embedding, context_docs) -> Dict[str, Any]:
+            try:
+                prompt = self._build_prompt(question, context_docs, [])
+                with timed("llm"):
+                    response = self.llm.invoke([HumanMessage(content=prompt.text)])
+            except Exception as e:
+                logger.error(f"Error generating response for batch question {index}: {e}")
+                return {"index": index, "question": question, "error": f"Failed to generate response: {e}"}
+            return self._batch_result(corpus_version, index, question, embedding, context_docs, prompt, response)
+        
+        if to_generate:
+            with ThreadPoolExecutor(
+                max_workers=min(max_concurrency or self.batch_concurrency, len(to_generate)),
+                thread_name_prefix="batch"
+            ) as pool:
+                results.extend(pool.map(lambda item: answer(*item), to_generate))
+            logger.info(f"Answered batch of {len(questions)} questions ({len(to_generate)} generated)")
+        return sorted(results, key=lambda result: result["index"])
+
+    async def astream_ask(self, question: str, session_id: str = "default") -> AsyncIterator[dict]:
+        """
+        Ask a question and stream the answer as the model produces it.
+        
+        Args:
+            question (str): The question to ask
+            session_id (str): Conversation the question belongs to
+            
+        Yields:
+            dict: ``{"event": "token", "data": <text>}`` for each generated chunk,
+            then ``{"event": "done", "data": {"answer": ..., "sources": [...]}}``
+        """
+        if not question.strip():
+            raise ValueError("Question cannot be empty")
+        
+        question = question.strip()
+        corpus_version = self.corpus_version
+        embedding = await self._aembed_query(question) if self.answer_cache.semantic else None
+        
+        session = self.sessions.get(session_id)
+        await _acquire_lock(session.lock)
+        try:
+            history = history_digest(session.messages)
+            cached = self.answer_cache.get(corpus_version, question, embedding, history)
+            if cached is not None:
+                self.sessions.append(session, [HumanMessage(content=question), AIMessage(content=cached["answer"])])
+                yield {"event": "token", "data": cached["answer"]}
+                yield {"event": "done", "data": {**cached, "cached": True}}
+                return
+            
+            try:
+                context_docs = await self.aretrieve(question, k=4)
+            except Exception as e:
+                logger.error(f"Error in retrieve step: {e}")
+                context_docs = []
+            
+            prompt = self._build_prompt(question, context_docs, session.messages)
+            
+            parts = []
+            started = time.perf_counter()
+            async for chunk in self.llm.astream([HumanMessage(content=prompt.text)]):
+                _record_usage(chunk)
+                if chunk.content:
+                    if not parts:
+                        record_stage("llm_first_token", time.perf_counter() - started)
+                    parts.append(chunk.content)
+                    yield {"event": "token", "data": chunk.content}
+            record_stage("llm", time.perf_counter() - started)
+            
+            answer = "".join(parts)
+            self.sessions.append(session, [HumanMessage(content=question), AIMessage(content=answer)])
+            self._cache_answer(corpus_version, question, answer, context_docs, embedding, history)
+            logger.info(f"Streamed response for question: {question[:50]}...")
+            
+            yield {
+                "event": "done",
+                "data": {
+                    "answer": answer,
+                    "sources": [doc.metadata for doc in context_docs],
+                    "prompt_tokens": prompt.stats["prompt_tokens"]
+                }
+            }
+        finally:
+            session.lock.release()
+
+    def _cache_answer(
+        self,
+        corpus_version: int,
+        question: str,
+        answer: str,
+        context_docs: List[Document],
+        embedding: Optional[List[float]],
+        history: str = ""
+    ) -> None:
+        """Remember a successful answer for the corpus version and conversation history it was generated against."""
+        if answer and answer != GENERATION_ERROR_MESSAGE:
+            self.answer_cache.put(
+                corpus_version,
+                question,
+                {"answer": answer, "sources": [doc.metadata for doc in context_docs]},
+                embedding,
+                history
+            )
+
+    def _bump_corpus_version(self) -> None:
+        """Mark the document set as changed, invalidating cached answers and retrieval results."""
+        with self._corpus_lock:
+            self.corpus_version += 1
+            self.answer_cache.clear()
+            self.query_cache.clear_results()
+
+    def _build_prompt(self, question: str, context_docs: List[Document], messages: List[BaseMessage]) -> BuiltPrompt:
+        """Pack retrieved documents and conversation history into the prompt's token budget."""
+        with timed("prompt_build"):
+            prompt = self.context_builder.build(question, context_docs, messages)
+        stats = prompt.stats
+        PROMPT_TOKENS.observe(stats["prompt_tokens"])
+        logger.info(
+            f"Built prompt of {stats['prompt_tokens']} tokens: {stats['chunks_used']} passages "
+            f"({stats['context_tokens']} tokens, {stats['chunks_deduplicated']} chunks merged), "
+            f"{stats['history_messages']} history messages ({stats['history_tokens']} tokens), "
+            f"{stats['tokens_trimmed']} tokens trimmed"
+        )
+        return prompt
+
     def _setup_graph(self):
         """Setup the conversation graph for RAG processing."""
         try:
@@ -179,6 +1308,7 @@ class MyRAGAgent:
                 question: str
                 context: List[Document]
                 answer: str
+                prompt_tokens: int
 
             def retrieve(state: State):
                 """Retrieve relevant documents based on the question."""
@@ -187,10 +1317,10 @@ class MyRAGAgent:
                     if not question:
                         return {"context": []}
                     
-                    # Perform similarity search
-                    retrieved_docs = self.vector_store.similarity_search(
+                    # Perform hybrid dense + lexical search
+                    retrieved_docs = self.retrieve(
                         question, 
-                        k=4  # Retrieve top 4 most similar documents
+                        k=4  # Retrieve top 4 most relevant documents
                     )
                     
                     logger.info(f"Retrieved {len(retrieved_docs)} documents for question")
@@ -210,65 +1340,87 @@ class MyRAGAgent:
                     # Create human message
                     human = HumanMessage(content=question)
                     
-                    # Prepare context from retrieved documents
-                    docs_content = ""
-                    if context_docs:
-                        docs_content = "\n\n".join(
-                            f"Document {i+1}:\n{doc.page_content[:800]}..." 
-                            if len(doc.page_content) > 800 
-                            else f"Document {i+1}:\n{doc.page_content}"
-                            for i, doc in enumerate(context_docs)
-                        )
-                    
-                    # Prepare conversation history
-                    history_text = ""
-                    if messages:
-                        history_text = "\n".join(
-                            f"{msg.type.capitalize()}: {msg.content}" 
-                            for msg in messages[-10:]  # Last 10 messages
-                        )
+                    prompt = self._build_prompt(question, context_docs, messages)
+
+                    # Generate response using the language model
+                    with timed("llm"):
+                        response = self.llm.invoke([HumanMessage(content=prompt.text)])
+                    _record_usage(response)
+                    ai = AIMessage(content=response.content)
                     
-                    # Create comprehensive prompt
-                    context_section = f"Relevant Information:\n{docs_content}\n\n" if docs_content else ""
-                    history_section = f"Recent Conversation:\n{history_text}\n\n" if history_text else ""
+                    return {
+                        "answer": response.content,
+                        "messages": [human, ai],
+                        "prompt_tokens": prompt.stats["prompt_tokens"]
+                    }
                     
-                    prompt_text = f"""You are a helpful AI assistant that answers questions based on provided documents and conversation context.
-
-{context_section}{history_section}Current Question: {question}
-
-Instructions:
-- Answer the question clearly and helpfully
-- Use information from the provided documents when relevant
-- If the documents don't contain relevant information, say so clearly
-- Be concise but comprehensive
-- Maintain conversation context when appropriate
+                except Exception as e:
+                    logger.error(f"Error in generate step: {e}")
+                    error_message = GENERATION_ERROR_MESSAGE
+                    return {
+                        "answer": error_message,
+                        "messages": [HumanMessage(content=question), AIMessage(content=error_message)]
+                    }
 
-Answer:"""
+            async def aretrieve(state: State):
+                """Retrieve relevant documents without blocking the event loop."""
+                try:
+                    question = state.get("question", "")
+                    if not question:
+                        return {"context": []}
+                    
+                    retrieved_docs = await self.aretrieve(question, k=4)
+                    
+                    logger.info(f"Retrieved {len(retrieved_docs)} documents for question")
+                    return {"context": retrieved_docs}
+                    
+                except Exception as e:
+                    logger.error(f"Error in retrieve step: {e}")
+                    return {"context": []}
 
-                    # Generate response using the language model
-                    response = self.llm.invoke([HumanMessage(content=prompt_text)])
-                    ai = AIMessage(content=response.content)
+            async def agenerate(state: State):
+                """Generate a response with the language model's async API."""
+                question = state.get("question", "")
+                try:
+                    prompt = self._build_prompt(
+                        question, state.get("context", []), state.get("messages", [])
+                    )
+                    with timed("llm"):
+                        response = await self.llm.ainvoke([HumanMessage(content=prompt.text)])
+                    _record_usage(response)
                     
                     return {
                         "answer": response.content,
-                        "messages": [human, ai]
+                        "messages": [HumanMessage(content=question), AIMessage(content=response.content)],
+                        "prompt_tokens": prompt.stats["prompt_tokens"]
                     }
                     
                 except Exception as e:
                     logger.error(f"Error in generate step: {e}")
-                    error_message = "I apologize, but I encountered an error while generating a response. Please try again."
+                    error_message = GENERATION_ERROR_MESSAGE
                     return {
                         "answer": error_message,
                         "messages": [HumanMessage(content=question), AIMessage(content=error_message)]
                     }
 
-            # Build the conversation graph
-            graph_builder = StateGraph(State).add_sequence([retrieve, generate])
+            # Build the conversation graph; each node has a sync and an async
+            # implementation so both invoke() and ainvoke() avoid blocking calls
+            graph_builder = StateGraph(State).add_sequence([
+                ("retrieve", RunnableLambda(retrieve, afunc=aretrieve)),
+                ("generate", RunnableLambda(generate, afunc=agenerate)),
+            ])
             graph_builder.add_edge(START, "retrieve")
             
-            # Add memory checkpointer for conversation persistence
-            checkpointer = MemorySaver()
-            self.graph = graph_builder.compile(checkpointer=checkpointer)
+            # Add a bounded checkpointer for conversation persistence; the
+            # sqlite mode archives to CHECKPOINT_ARCHIVE_PATH, by default a file
+            # next to the vector store
+            self.checkpointer = make_checkpointer(
+                mode=os.getenv("CHECKPOINT_MODE", "bounded"),
+                max_checkpoints=int(os.getenv("CHECKPOINT_KEEP", "2")),
+                archive_path=os.getenv("CHECKPOINT_ARCHIVE_PATH"),
+                data_dir=self.vector_store.path
+            )
+            self.graph = graph_builder.compile(checkpointer=self.checkpointer)
             
             logger.info("Conversation graph setup completed successfully")
             
@@ -276,25 +1428,55 @@ Answer:"""
             logger.error(f"Error setting up conversation graph: {e}")
             raise Exception(f"Graph setup failed: {e}")
 
-    def reset_chat_history(self):
-        """Reset the chat history."""
-        self.chat_history = []
+    def reset_chat_history(self, session_id: Optional[str] = None):
+        """
+        Reset the chat history.
+        
+        Args:
+            session_id (Optional[str]): Session to reset; every session when omitted
+        """
+        if session_id is None:
+            self.sessions.clear()
+        else:
+            self.sessions.delete(session_id)
         logger.info("Chat history reset")
 
+    def _drop_checkpoints(self, session_id: str) -> None:
+        """Delete the graph checkpoints of a session that is no longer live."""
+        checkpointer = getattr(self, "checkpointer", None)
+        if checkpointer is not None:
+            checkpointer.delete_thread(session_id)
+
+    def get_checkpoint_stats(self) -> Optional[dict]:
+        """Get the number of checkpoints held in memory, if the checkpointer is bounded."""
+        if isinstance(self.checkpointer, BoundedMemorySaver):
+            return self.checkpointer.stats()
+        return None
+
     def get_document_count(self) -> int:
-        """Get the number of documents in the vector store."""
+        """Get the number of chunks in the vector store."""
         try:
-            return len(self.vector_store.get_documents())
+            return self.vector_store.live_count
         except Exception as e:
             logger.error(f"Error getting document count: {e}")
             return 0
 
+    def get_embedding_cache_stats(self) -> Optional[dict]:
+        """Get hit/miss counters of the embedding cache, if one is configured."""
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.stats()
+        return None
+
     def reset(self):
         """Reset the RAG agent state."""
         try:
             # Clear the vector store
-            self.vector_store = InMemoryVectorStore(self.embeddings)
-            self.chat_history = []
+            with self._index_lock:
+                self.vector_store.clear()
+                self.documents.clear()
+                self.lexical_index.clear()
+            self._bump_corpus_version()
+            self.sessions.clear()
             logger.info("RAG agent state has been reset")
         except Exception as e:
             logger.error(f"Error resetting RAG agent: {e}")
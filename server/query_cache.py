@@ -0,0 +1,155 @@
+from langchain_core.documents import Document
+from typing_extensions import Any, Dict, List, Optional, Tuple
+
+from collections import OrderedDict
+import logging
+import threading
+
+import numpy as np
+
+from answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+
+class _LevelStats:
+    """Hit and miss counters of one cache level, with the time its misses took."""
+
+    __slots__ = ("hits", "misses", "miss_seconds")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    def to_dict(self, entries: int) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        mean_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mean_miss_ms": round(mean_miss * 1000, 3),
+            # Each hit is assumed to have cost what a miss costs on average
+            "saved_seconds": round(self.hits * mean_miss, 3),
+        }
+
+
+class QueryCache:
+    """
+    A two-level cache in front of retrieval, shared by every session.
+
+    The first level maps a normalised question to its embedding, so a
+    question asked again skips the embedding round-trip. Embeddings do not
+    depend on the documents, so these entries outlive corpus changes. The
+    second level maps a corpus version and normalised question to the
+    retrieved chunks, so it skips the search as well. It is cleared whenever
+    the corpus version changes. Chunks are kept rather than row numbers,
+    since compaction renumbers rows without changing the corpus.
+
+    Both levels are LRU-bounded. Each counts its hits and misses and the
+    time its misses took, from which the time saved by its hits is
+    estimated.
+    """
+
+    def __init__(self, max_embeddings: int = 2000, max_results: int = 2000):
+        """
+        Args:
+            max_embeddings (int): Maximum number of cached question embeddings
+            max_results (int): Maximum number of cached retrieval results
+        """
+        self.max_embeddings = max_embeddings
+        self.max_results = max_results
+        # Normalised question -> float32 embedding
+        self._embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # (corpus_version, normalised question, k) -> retrieved chunks
+        self._results: "OrderedDict[Tuple[int, str, int], List[Document]]" = OrderedDict()
+        self._embedding_stats = _LevelStats()
+        self._result_stats = _LevelStats()
+        self._lock = threading.Lock()
+
+    def get_embedding(self, question: str) -> Optional[List[float]]:
+        """Look up the embedding of a question, or None on a miss."""
+        key = normalize_question(question)
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is None:
+                self._embedding_stats.misses += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self._embedding_stats.hits += 1
+        return vector.tolist()
+
+    def put_embedding(self, question: str, embedding: List[float], seconds: float) -> None:
+        """
+        Cache the embedding of a question.
+
+        Args:
+            question (str): The question embedded
+            embedding (List[float]): Its embedding
+            seconds (float): How long embedding it took
+        """
+        if self.max_embeddings <= 0:
+            return
+        key = normalize_question(question)
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._embeddings[key] = vector
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+            self._embedding_stats.miss_seconds += seconds
+
+    def get_results(self, corpus_version: int, question: str, k: int) -> Optional[List[Document]]:
+        """Look up the chunks retrieved for a question against a corpus version, or None on a miss."""
+        key = (corpus_version, normalize_question(question), k)
+        with self._lock:
+            docs = self._results.get(key)
+            if docs is None:
+                self._result_stats.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self._result_stats.hits += 1
+            return list(docs)
+
+    def put_results(
+        self,
+        corpus_version: int,
+        question: str,
+        k: int,
+        docs: List[Document],
+        seconds: float
+    ) -> None:
+        """
+        Cache the chunks retrieved for a question.
+
+        Args:
+            corpus_version (int): Version of the document set searched
+            question (str): The question
+            k (int): Number of chunks requested
+            docs (List[Document]): The retrieved chunks, most relevant first
+            seconds (float): How long the search took
+        """
+        if self.max_results <= 0:
+            return
+        key = (corpus_version, normalize_question(question), k)
+        with self._lock:
+            self._results[key] = list(docs)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            self._result_stats.miss_seconds += seconds
+
+    def clear_results(self) -> None:
+        """Drop every cached retrieval result, e.g. because the corpus changed."""
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-level hit rates and the time their hits saved."""
+        with self._lock:
+            return {
+                "embeddings": self._embedding_stats.to_dict(len(self._embeddings)),
+                "results": self._result_stats.to_dict(len(self._results)),
+            }
@@ -0,0 +1,441 @@
+from typing_extensions import Any, Dict, List, Optional, Tuple, Union
+
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def exact_top_k(
+    matrix: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    deleted: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact top-k by inner product over a matrix of L2-normalised rows.
+
+    A single matmul scores every row and ``argpartition`` selects the top k in
+    linear time; only those k are then sorted.
+
+    Args:
+        matrix (np.ndarray): (n, dim) float32 matrix
+        query (np.ndarray): (dim,) float32 normalised query
+        k (int): Number of results
+        deleted (Optional[np.ndarray]): (n,) boolean mask of rows to skip
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row indices and scores, best first
+    """
+    scores = matrix @ query
+    if deleted is not None:
+        scores[deleted] = -np.inf
+        k = min(k, len(scores) - int(np.count_nonzero(deleted)))
+    return _top_k(scores, k)
+
+
+def _top_k(scores: np.ndarray, k: int, ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return (top if ids is None else ids[top]), scores[top]
+
+
+def _kmeans(sample: np.ndarray, n_clusters: int, iterations: int, seed: int) -> np.ndarray:
+    """Spherical k-means: centroids are kept on the unit sphere and assigned by inner product."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        empty = counts == 0
+        # Re-seed empty clusters with random points so every list stays useful
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    An inverted-file approximate nearest neighbour index.
+
+    Rows are clustered with spherical k-means; a query scores the centroids,
+    probes the ``n_probe`` closest inverted lists and ranks only their rows
+    exactly. Rows appended after training are assigned to their nearest list.
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, train_size: int = 65536, seed: int = 0):
+        """
+        Args:
+            n_lists (Optional[int]): Number of clusters; defaults to ~sqrt(n)
+            n_probe (int): Number of lists scanned per query
+            train_size (int): Maximum number of rows sampled for k-means
+            seed (int): Random seed for training
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        self.indexed_rows = 0
+        self.trained_rows = 0
+
+    def train(self, matrix: np.ndarray) -> None:
+        """Cluster ``matrix`` and rebuild every inverted list."""
+        n = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+        sample_ids = rng.choice(n, min(n, max(self.train_size, n_lists)), replace=False)
+        sample = np.asarray(matrix[np.sort(sample_ids)], dtype=np.float32)
+        self.centroids = _kmeans(sample, min(n_lists, len(sample)), iterations=10, seed=self.seed)
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self.indexed_rows = 0
+        self.trained_rows = n
+        self.add(matrix)
+
+    def add(self, matrix: np.ndarray, block_size: int = 65536) -> None:
+        """Assign rows of ``matrix`` that are not indexed yet to their nearest list."""
+        n = len(matrix)
+        new_ids = []
+        new_lists = []
+        for start in range(self.indexed_rows, n, block_size):
+            block = np.asarray(matrix[start:min(n, start + block_size)])
+            new_lists.append(np.argmax(block @ self.centroids.T, axis=1))
+            new_ids.append(np.arange(start, start + len(block), dtype=np.int64))
+        if not new_ids:
+            return
+        ids = np.concatenate(new_ids)
+        assignment = np.concatenate(new_lists)
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        for list_id in range(len(self.centroids)):
+            members = ids[order[bounds[list_id]:bounds[list_id + 1]]]
+            if len(members):
+                self.lists[list_id] = np.concatenate([self.lists[list_id], members])
+        self.indexed_rows = n
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        deleted: Optional[np.ndarray] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k over the probed lists, best first, ignoring rows from ``limit`` on."""
+        probe = _top_k(self.centroids @ query, self.n_probe)[0]
+        candidates = np.concatenate([self.lists[i] for i in probe])
+        # The index may be ahead of a matrix snapshot taken before a concurrent add
+        candidates = candidates[candidates < (len(matrix) if limit is None else limit)]
+        if deleted is not None:
+            candidates = candidates[~deleted[candidates]]
+        if len(candidates) == 0:
+            return _top_k(np.empty(0, dtype=np.float32), k)
+        candidates.sort()
+        return _top_k(matrix[candidates] @ query, k, ids=candidates)
+
+
+class CompressedMatrix:
+    """
+    A compact in-memory copy of a matrix of normalised embeddings, scanned in
+    place of the full matrix by the first pass of a search.
+
+    Rows keep only their first ``dim`` components, renormalised;
+    text-embedding-3 models are trained so that such a prefix is itself a
+    usable embedding. With ``int8`` each row is also scalar-quantized, with
+    one float32 scale per row, to a quarter of its float32 size. Indexing
+    returns dequantized float32 rows, so the copy can stand in for the full
+    matrix in :class:`IVFIndex`.
+    """
+
+    def __init__(self, dim: Optional[int] = None, int8: bool = False):
+        """
+        Args:
+            dim (Optional[int]): Number of leading components kept; all when omitted
+            int8 (bool): Quantize the kept components to int8
+        """
+        self.dim = dim
+        self.int8 = int8
+        # (rows, scales, size), replaced as a whole so a search reads the three
+        # consistently while ``add`` runs; scales is empty unless int8
+        self._state: Tuple[Optional[np.ndarray], np.ndarray, int] = (None, np.empty(0, dtype=np.float32), 0)
+
+    def __len__(self) -> int:
+        return self._state[2]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the rows added so far."""
+        data, scales, size = self._state
+        if data is None:
+            return 0
+        row_bytes = data.shape[1] * data.itemsize + (scales.itemsize if self.int8 else 0)
+        return size * row_bytes
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        """Truncate and renormalise full-dimension vectors (a query or a block of rows)."""
+        if self.dim is None or self.dim >= vectors.shape[-1]:
+            return np.asarray(vectors, dtype=np.float32)
+        truncated = np.asarray(vectors[..., :self.dim], dtype=np.float32)
+        norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+        return truncated / np.where(norms == 0, 1, norms)
+
+    def add(self, matrix: np.ndarray, block_size: int = 65536) -> None:
+        """Compress the rows of ``matrix`` that are not in the copy yet."""
+        data, scales, size = self._state
+        n = len(matrix)
+        if n <= size:
+            return
+        width = min(self.dim or matrix.shape[1], matrix.shape[1])
+        if data is None or len(data) < n:
+            # Grow geometrically so a stream of small appends stays linear
+            capacity = max(n, 2 * (len(data) if data is not None else 0), 1024)
+            grown = np.empty((capacity, width), dtype=np.int8 if self.int8 else np.float32)
+            grown_scales = np.empty(capacity if self.int8 else 0, dtype=np.float32)
+            if data is not None:
+                grown[:size] = data[:size]
+                grown_scales[:len(scales)] = scales
+            # Searches already running keep the arrays they started with
+            data, scales = grown, grown_scales
+        for start in range(size, n, block_size):
+            stop = min(n, start + block_size)
+            block = self.project(np.asarray(matrix[start:stop]))
+            if self.int8:
+                scale = np.abs(block).max(axis=1) / 127
+                scale[scale == 0] = 1
+                data[start:stop] = np.rint(block / scale[:, None])
+                scales[start:stop] = scale
+            else:
+                data[start:stop] = block
+            # Rows past the published size are never read, so filling them is safe
+            self._state = (data, scales, stop)
+
+    def __getitem__(self, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        """Rows of the copy as float32, dequantized."""
+        data, scales, size = self._state
+        data, scales = data[:size], scales[:size]
+        if not self.int8:
+            return data[rows]
+        return data[rows].astype(np.float32) * scales[rows][:, None]
+
+    def scores(self, query: np.ndarray, n: int) -> np.ndarray:
+        """
+        Approximate inner products of the first ``n`` rows with a projected
+        query, or with each row of a (b, dim) block of projected queries.
+
+        int8 rows are converted to float32 a block at a time into one reused
+        buffer sized to stay in cache, so the working set stays small however
+        large the copy is.
+
+        Returns:
+            np.ndarray: (n,) scores, or (b, n) for a block of queries
+        """
+        data, scales, _ = self._state
+        if data is None:
+            return np.empty(query.shape[:-1] + (0,), dtype=np.float32)
+        if not self.int8:
+            return query @ data[:n].T
+        block_size = max(64, (1 << 20) // data.shape[1])
+        buffer = np.empty((min(n, block_size), data.shape[1]), dtype=np.float32)
+        scores = np.empty(query.shape[:-1] + (n,), dtype=np.float32)
+        for start in range(0, n, block_size):
+            stop = min(n, start + block_size)
+            block = buffer[:stop - start]
+            np.copyto(block, data[start:stop], casting="unsafe")
+            np.matmul(query, block.T, out=scores[..., start:stop])
+        return scores * scales[:n]
+
+
+class SearchEngine:
+    """
+    Top-k search over a growing matrix of normalised embeddings.
+
+    Below ``ann_threshold`` rows every query is answered exactly. Above it an
+    :class:`IVFIndex` is trained and kept up to date incrementally; it is
+    retrained once the corpus has doubled since the last training.
+
+    With ``first_pass_dim`` or ``first_pass_int8`` set, both run over a
+    :class:`CompressedMatrix` instead, and the ``k * rerank_factor`` best
+    candidates are re-scored against the full-precision matrix. Only those
+    rows of the full matrix are read per query, so it can stay on disk.
+    """
+
+    def __init__(
+        self,
+        ann_threshold: int = 50000,
+        n_probe: int = 8,
+        first_pass_dim: Optional[int] = None,
+        first_pass_int8: bool = False,
+        rerank_factor: int = 8
+    ):
+        """
+        Args:
+            ann_threshold (int): Corpus size at which approximate search is used
+            n_probe (int): Number of IVF lists scanned per query
+            first_pass_dim (Optional[int]): Search a copy truncated to this many
+                dimensions first; full precision is used when omitted
+            first_pass_int8 (bool): Search an int8-quantized copy first
+            rerank_factor (int): Candidates re-scored at full precision per result
+        """
+        self.ann_threshold = ann_threshold
+        self.n_probe = n_probe
+        self.first_pass_dim = first_pass_dim
+        self.first_pass_int8 = first_pass_int8
+        self.rerank_factor = rerank_factor
+        self._compressed = self._new_compressed()
+        self._ivf: Optional[IVFIndex] = None
+        self._lock = threading.Lock()
+
+    def _new_compressed(self) -> Optional[CompressedMatrix]:
+        if not self.first_pass_dim and not self.first_pass_int8:
+            return None
+        return CompressedMatrix(self.first_pass_dim, self.first_pass_int8)
+
+    def update(self, matrix: np.ndarray) -> None:
+        """Bring the compressed copy and the approximate index up to date with ``matrix``."""
+        n = len(matrix)
+        with self._lock:
+            compressed = self._compressed
+            if compressed is not None:
+                compressed.add(matrix)
+                matrix = compressed
+            if n < self.ann_threshold:
+                self._ivf = None
+                return
+            ivf = self._ivf
+            if ivf is None or n >= 2 * ivf.trained_rows:
+                ivf = IVFIndex(n_probe=self.n_probe)
+                logger.info(f"Training IVF index over {n} vectors")
+                ivf.train(matrix)
+                self._ivf = ivf
+            elif ivf.indexed_rows < n:
+                ivf.add(matrix)
+
+    def reset(self) -> None:
+        """Drop the compressed copy and the approximate index, e.g. after rows were renumbered."""
+        with self._lock:
+            self._compressed = self._new_compressed()
+            self._ivf = None
+
+    def search(
+        self,
+        matrix: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        deleted: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the indices and scores of the top ``k`` rows, best first.
+
+        Args:
+            matrix (np.ndarray): (n, dim) matrix of normalised embeddings
+            query (np.ndarray): (dim,) normalised query embedding
+            k (int): Number of results
+            deleted (Optional[np.ndarray]): (n,) boolean mask of rows to skip
+        """
+        compressed = self._compressed
+        if compressed is None:
+            if len(matrix) < self.ann_threshold:
+                return exact_top_k(matrix, query, k, deleted)
+            return self._ivf_index(matrix).search(matrix, query, k, deleted)
+
+        if len(compressed) < len(matrix):
+            self.update(matrix)
+            compressed = self._compressed
+        projected = compressed.project(query)
+        depth = k * self.rerank_factor
+        if len(matrix) < self.ann_threshold:
+            scores = compressed.scores(projected, len(matrix))
+            if deleted is not None:
+                scores[deleted] = -np.inf
+                depth = min(depth, len(scores) - int(np.count_nonzero(deleted)))
+            candidates, _ = _top_k(scores, depth)
+        else:
+            candidates, _ = self._ivf_index(matrix).search(compressed, projected, depth, deleted, limit=len(matrix))
+        # Sorted, so the full-precision rows are read in file order
+        candidates.sort()
+        return _top_k(np.asarray(matrix[candidates]) @ query, k, ids=candidates)
+
+    def search_many(
+        self,
+        matrix: np.ndarray,
+        queries: np.ndarray,
+        k: int,
+        deleted: Optional[np.ndarray] = None,
+        max_scores_bytes: int = 64 << 20
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top ``k`` rows for each of a batch of queries; see :meth:`search`.
+
+        Below ``ann_threshold`` rows the queries are scored a block at a time,
+        one matrix product per block, so the matrix (or its compressed copy)
+        is streamed once per block rather than once per query. Blocks are
+        sized so their (b, n) score matrix stays under ``max_scores_bytes``.
+        Above the threshold each query probes the IVF index on its own.
+
+        Args:
+            matrix (np.ndarray): (n, dim) matrix of normalised embeddings
+            queries (np.ndarray): (b, dim) normalised query embeddings
+            k (int): Number of results per query
+            deleted (Optional[np.ndarray]): (n,) boolean mask of rows to skip
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: Row indices and scores, best first, per query
+        """
+        n = len(matrix)
+        if n >= self.ann_threshold:
+            return [self.search(matrix, query, k, deleted) for query in queries]
+
+        compressed = self._compressed
+        if compressed is not None and len(compressed) < n:
+            self.update(matrix)
+            compressed = self._compressed
+        depth = k if compressed is None else k * self.rerank_factor
+        depth = min(depth, n - (int(np.count_nonzero(deleted)) if deleted is not None else 0))
+        block_size = max(1, max_scores_bytes // (4 * max(n, 1)))
+
+        results = []
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            if compressed is None:
+                scores = block @ matrix.T
+            else:
+                scores = compressed.scores(compressed.project(block), n)
+            if deleted is not None:
+                scores[:, deleted] = -np.inf
+            for query, query_scores in zip(block, scores):
+                candidates, candidate_scores = _top_k(query_scores, depth)
+                if compressed is None:
+                    results.append((candidates, candidate_scores))
+                else:
+                    candidates.sort()
+                    results.append(_top_k(np.asarray(matrix[candidates]) @ query, k, ids=candidates))
+        return results
+
+    def _ivf_index(self, matrix: np.ndarray) -> IVFIndex:
+        ivf = self._ivf
+        if ivf is None or ivf.indexed_rows < len(matrix):
+            self.update(matrix)
+            ivf = self._ivf
+        return ivf
+
+    def stats(self) -> Dict[str, Any]:
+        """First-pass configuration and the memory its compressed copy takes."""
+        compressed = self._compressed
+        return {
+            "first_pass": (
+                "float32" if compressed is None
+                else f"{'int8' if self.first_pass_int8 else 'float32'}x{self.first_pass_dim or 'full'}"
+            ),
+            "first_pass_bytes": compressed.nbytes if compressed is not None else 0,
+            "rerank_factor": self.rerank_factor if compressed is not None else None,
+            "ann": self._ivf is not None,
+        }
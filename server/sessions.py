@@ -0,0 +1,319 @@
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from typing_extensions import Callable, Dict, List, Optional, Tuple
+
+from collections import OrderedDict
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    Conversation state for a single chat session.
+
+    ``lock`` serialises turns within the session; different sessions never
+    contend with each other.
+    """
+
+    __slots__ = ("id", "messages", "lock", "last_access", "size_chars", "stamp")
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.messages: List[BaseMessage] = []
+        self.lock = threading.Lock()
+        self.last_access = time.monotonic()
+        self.size_chars = 0
+        # (mtime_ns, size) of the shared file the messages were last read from
+        # or written to; see SharedSessionStore
+        self.stamp: Optional[Tuple[int, int]] = None
+
+
+class SessionStore:
+    """
+    A bounded, thread-safe store of chat sessions.
+
+    Sessions idle for longer than ``ttl_seconds`` expire, and the least recently
+    used sessions are evicted when either ``max_sessions`` or the total message
+    size budget ``max_total_chars`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 3600,
+        max_total_chars: int = 20_000_000,
+        max_messages: int = 20,
+        on_evict: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            max_sessions (int): Maximum number of live sessions
+            ttl_seconds (float): Idle time after which a session expires
+            max_total_chars (int): Budget for message content across all sessions
+            max_messages (int): Number of most recent messages kept per session
+            on_evict (Optional[Callable[[str], None]]): Called with the id of every
+                session that is removed, e.g. to drop its graph checkpoints
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_total_chars = max_total_chars
+        self.max_messages = max_messages
+        self.on_evict = on_evict
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._total_chars = 0
+        self._evicted = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """Return the session with the given id, creating it if needed."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._new_session(session_id)
+                self._sessions[session_id] = session
+                self._evict(keep=session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+            return session
+
+    def append(self, session: Session, messages: List[BaseMessage]) -> None:
+        """
+        Add messages to a session, keeping only the most recent ``max_messages``.
+
+        The caller must hold ``session.lock``.
+        """
+        history = session.messages + list(messages)
+        if len(history) > self.max_messages:
+            history = history[-self.max_messages:]
+        self._set_messages(session, history)
+
+    def _new_session(self, session_id: str) -> Session:
+        return Session(session_id)
+
+    def _set_messages(self, session: Session, history: List[BaseMessage]) -> None:
+        size = sum(len(str(message.content)) for message in history)
+        with self._lock:
+            session.messages = history
+            if self._sessions.get(session.id) is session:
+                self._total_chars += size - session.size_chars
+            session.size_chars = size
+            session.last_access = time.monotonic()
+            self._evict(keep=session.id)
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session. Returns True if it existed."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._total_chars -= session.size_chars
+        self._notify([session_id])
+        return True
+
+    def clear(self) -> None:
+        """Remove every session."""
+        with self._lock:
+            removed = list(self._sessions)
+            self._sessions.clear()
+            self._total_chars = 0
+        self._notify(removed)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of live sessions and their memory footprint."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "total_chars": self._total_chars,
+                "evicted": self._evicted,
+            }
+
+    def _notify(self, session_ids: List[str]) -> None:
+        if self.on_evict is None:
+            return
+        for session_id in session_ids:
+            try:
+                self.on_evict(session_id)
+            except Exception as e:
+                logger.error(f"Error cleaning up chat session {session_id}: {e}")
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl_seconds
+        # Sessions are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_access >= deadline:
+                break
+            self._remove_oldest()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_chars > self.max_total_chars
+        ):
+            if next(iter(self._sessions)) == keep:
+                self._sessions.move_to_end(keep)
+            self._remove_oldest()
+
+    def _remove_oldest(self) -> None:
+        _, session = self._sessions.popitem(last=False)
+        self._total_chars -= session.size_chars
+        self._evicted += 1
+        logger.info(f"Evicted chat session {session.id}")
+        self._notify([session.id])
+
+
+class _SharedSessionLock:
+    """
+    The lock of a shared session: serialises its turns across worker processes.
+
+    Takes a thread lock, then an exclusive lock on the session's lock file,
+    and once both are held brings the session up to date with the turns other
+    workers have added. Supports the parts of the ``threading.Lock`` interface
+    the agent uses.
+    """
+
+    def __init__(self, store: "SharedSessionStore", session: Session):
+        self._store = store
+        self._session = session
+        self._thread_lock = threading.Lock()
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if not self._thread_lock.acquire(blocking):
+            return False
+        try:
+            f = open(self._store._path(self._session.id, ".lock"), "a")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                self._thread_lock.release()
+                return False
+            # Marks the session as in use, so prune leaves its lock file alone
+            os.utime(f.fileno())
+            self._file = f
+            self._store._load(self._session)
+        except BaseException:
+            self.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class SharedSessionStore(SessionStore):
+    """
+    A :class:`SessionStore` shared by the worker processes of a deployment
+    through a directory.
+
+    Every turn writes the session's messages to a JSON file, and a worker
+    taking a session's lock first re-reads them if another worker changed
+    them since, so a conversation keeps its history whichever worker serves
+    each turn. Turns of one session are serialised across processes by a
+    lock file. Memory limits apply to each worker's copy as for a plain
+    store; the files of a session are removed when it is deleted, or by
+    :meth:`prune` once it has been idle for ``ttl_seconds``.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        """
+        Args:
+            path (str): Directory shared by every worker
+            **kwargs: Limits of this worker's copy; see :class:`SessionStore`
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _path(self, session_id: str, suffix: str) -> str:
+        # Session ids come from clients, so they never appear in file names
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.path, name + suffix)
+
+    def _new_session(self, session_id: str) -> Session:
+        session = Session(session_id)
+        session.lock = _SharedSessionLock(self, session)
+        return session
+
+    def _load(self, session: Session) -> None:
+        """Re-read a session's messages if its file changed; the caller holds its lock."""
+        path = self._path(session.id, ".json")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stamp = None
+        else:
+            expired = time.time() - stat.st_mtime > self.ttl_seconds
+            stamp = None if expired else (stat.st_mtime_ns, stat.st_size)
+        if stamp == session.stamp:
+            return
+        messages = []
+        if stamp is not None:
+            try:
+                with open(path) as f:
+                    messages = messages_from_dict(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load chat session {session.id}: {e}")
+        session.stamp = stamp
+        self._set_messages(session, messages[-self.max_messages:])
+
+    def append(self, session: Session, messages: List[BaseMessage]) -> None:
+        """Add messages to a session and write it to the shared directory; the caller holds its lock."""
+        super().append(session, messages)
+        path = self._path(session.id, ".json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(messages_to_dict(session.messages), f)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        session.stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def delete(self, session_id: str) -> bool:
+        """Remove a session from every worker. Returns True if it existed."""
+        removed = super().delete(session_id)
+        try:
+            os.remove(self._path(session_id, ".json"))
+            removed = True
+        except FileNotFoundError:
+            pass
+        return removed
+
+    def clear(self) -> None:
+        """Remove every session from every worker."""
+        super().clear()
+        for name in os.listdir(self.path):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except FileNotFoundError:
+                    pass
+
+    def prune(self) -> None:
+        """Remove the files of sessions idle for longer than ``ttl_seconds``."""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,251 @@
+from typing_extensions import AsyncIterator, Iterator, NamedTuple, Optional
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import importlib
+import logging
+import os
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Transcript(NamedTuple):
+    """A piece of recognized speech; a partial one may still be revised by later audio."""
+    text: str
+    is_final: bool
+
+
+class TooManyStreamsError(Exception):
+    """Raised when every recognition stream is in use."""
+
+
+class SpeechRecognizer:
+    """
+    Interface of the recognizers behind the speech endpoints.
+
+    :meth:`stream` is blocking: it consumes audio chunks as the caller
+    produces them and yields transcripts as soon as the recognizer has them.
+    :class:`SpeechStreams` runs it on a worker thread, never on the event
+    loop. Any object with this method can be plugged in through
+    ``SPEECH_RECOGNIZER``, e.g. a local fake for tests.
+    """
+
+    def stream(self, audio: Iterator[bytes]) -> Iterator[Transcript]:
+        """
+        Recognize speech in a stream of audio.
+
+        Args:
+            audio (Iterator[bytes]): Audio chunks, ending when the speaker is done
+
+        Yields:
+            Transcript: Partial transcripts, and a final one per finished utterance
+        """
+        raise NotImplementedError
+
+
+class GoogleSpeechRecognizer(SpeechRecognizer):
+    """Google Cloud Speech-to-Text streaming recognition with interim results."""
+
+    # Google rejects streaming requests that carry more audio than this
+    MAX_REQUEST_BYTES = 25000
+
+    def __init__(
+        self,
+        language_code: str = "en-US",
+        sample_rate_hertz: int = 48000,
+        encoding: str = "WEBM_OPUS",
+        client=None
+    ):
+        """
+        Args:
+            language_code (str): BCP-47 language of the speech
+            sample_rate_hertz (int): Sample rate of the audio
+            encoding (str): Name of a ``RecognitionConfig.AudioEncoding``
+            client: A ``speech.SpeechClient``; one is created when omitted
+        """
+        from google.cloud import speech
+
+        self._speech = speech
+        self.client = client or speech.SpeechClient()
+        self.config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=getattr(speech.RecognitionConfig.AudioEncoding, encoding),
+                sample_rate_hertz=sample_rate_hertz,
+                language_code=language_code,
+                enable_automatic_punctuation=True,
+            ),
+            interim_results=True,
+        )
+
+    def stream(self, audio: Iterator[bytes]) -> Iterator[Transcript]:
+        speech = self._speech
+
+        def requests():
+            for chunk in audio:
+                for start in range(0, len(chunk), self.MAX_REQUEST_BYTES):
+                    yield speech.StreamingRecognizeRequest(audio_content=chunk[start:start + self.MAX_REQUEST_BYTES])
+
+        for response in self.client.streaming_recognize(config=self.config, requests=requests()):
+            partial = []
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                if result.is_final:
+                    yield Transcript(result.alternatives[0].transcript, True)
+                else:
+                    partial.append(result.alternatives[0].transcript)
+            if partial:
+                yield Transcript("".join(partial), False)
+
+
+def load_recognizer(spec: Optional[str] = None) -> Optional[SpeechRecognizer]:
+    """
+    Build the recognizer named by ``spec``, or by ``SPEECH_RECOGNIZER`` when omitted.
+
+    Args:
+        spec (Optional[str]): "google" (the default), "none", or "module:factory"
+            for any callable returning a recognizer
+
+    Returns:
+        Optional[SpeechRecognizer]: The recognizer, or None if it is disabled
+        or could not be created
+    """
+    spec = spec or os.getenv("SPEECH_RECOGNIZER", "google")
+    if spec == "none":
+        return None
+    try:
+        if spec == "google":
+            return GoogleSpeechRecognizer(
+                language_code=os.getenv("SPEECH_LANGUAGE", "en-US"),
+                sample_rate_hertz=int(os.getenv("SPEECH_SAMPLE_RATE", "48000")),
+                encoding=os.getenv("SPEECH_ENCODING", "WEBM_OPUS"),
+            )
+        module_name, _, factory = spec.partition(":")
+        return getattr(importlib.import_module(module_name), factory)()
+    except Exception as e:
+        logger.error(f"Failed to initialize speech recognizer {spec}: {e}")
+        return None
+
+
+class SpeechStreams:
+    """
+    Runs recognition streams on a bounded pool of threads, fed by async audio.
+
+    Each stream holds one thread for as long as it lasts, since recognizers
+    block on both their audio and their results. Audio is handed over through
+    a bounded queue, so a stalled recognizer pushes back on the client rather
+    than buffering without limit, and transcripts come back to the event loop
+    as they are produced.
+    """
+
+    def __init__(self, recognizer: SpeechRecognizer, max_streams: int = 8, max_buffered_chunks: int = 64):
+        """
+        Args:
+            recognizer (SpeechRecognizer): Recognizer every stream is sent to
+            max_streams (int): Streams recognized at once; more are refused
+            max_buffered_chunks (int): Audio chunks queued per stream before the sender waits
+        """
+        self.recognizer = recognizer
+        self.max_streams = max_streams
+        self.max_buffered_chunks = max_buffered_chunks
+        self._executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="speech")
+        self._lock = threading.Lock()
+        self.active = 0
+
+    async def transcribe(self, audio: AsyncIterator[bytes]) -> AsyncIterator[Transcript]:
+        """
+        Recognize ``audio`` as it arrives, yielding transcripts as soon as they are ready.
+
+        Args:
+            audio (AsyncIterator[bytes]): Audio chunks, ending when the speaker is done
+
+        Yields:
+            Transcript: Partial and final transcripts, in the recognizer's order
+
+        Raises:
+            TooManyStreamsError: If ``max_streams`` streams are already running
+        """
+        with self._lock:
+            if self.active >= self.max_streams:
+                raise TooManyStreamsError("Too many speech streams, please retry later")
+            self.active += 1
+
+        loop = asyncio.get_running_loop()
+        chunks: "queue.Queue[Optional[bytes]]" = queue.Queue(self.max_buffered_chunks)
+        results: asyncio.Queue = asyncio.Queue()
+        finished = threading.Event()
+        end = object()
+
+        def audio_chunks() -> Iterator[bytes]:
+            while not finished.is_set():
+                try:
+                    chunk = chunks.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if chunk is None:
+                    return
+                yield chunk
+
+        def deliver(item) -> None:
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, item)
+            except RuntimeError:
+                # The event loop is gone; nobody is waiting for the result
+                finished.set()
+
+        def recognize() -> None:
+            try:
+                for transcript in self.recognizer.stream(audio_chunks()):
+                    if finished.is_set():
+                        return
+                    deliver(transcript)
+            except Exception as e:
+                deliver(e)
+            else:
+                deliver(end)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        async def put(chunk: Optional[bytes]) -> None:
+            while not finished.is_set():
+                try:
+                    chunks.put_nowait(chunk)
+                    return
+                except queue.Full:
+                    await asyncio.sleep(0.01)
+
+        async def feed() -> None:
+            try:
+                async for chunk in audio:
+                    if chunk:
+                        await put(chunk)
+            finally:
+                await put(None)
+
+        try:
+            loop.run_in_executor(self._executor, recognize)
+        except BaseException:
+            with self._lock:
+                self.active -= 1
+            raise
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while True:
+                item = await results.get()
+                if item is end:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            if feeder.done() and not feeder.cancelled() and feeder.exception() is not None:
+                raise feeder.exception()
+        finally:
+            # Ends the recognizer's audio if it is still reading, and stops feeding
+            finished.set()
+            feeder.cancel()
+
+    def stats(self) -> dict:
+        return {"active_streams": self.active, "max_streams": self.max_streams}
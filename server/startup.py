@@ -0,0 +1,68 @@
+from typing_extensions import List
+
+import logging
+import os
+
+from ingestion import IngestionJob, IngestionQueue
+
+logger = logging.getLogger(__name__)
+
+
+def find_pdfs(directory: str) -> List[str]:
+    """Return the paths of the PDF files in ``directory``, sorted by name."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf")
+    )
+
+
+def warm_restart(agent, queue: IngestionQueue, pdfs_dir: str) -> List[IngestionJob]:
+    """
+    Bring the index in line with the PDFs already on disk.
+
+    Documents whose file has disappeared are deleted right away. The PDFs are
+    then split evenly across the ingestion workers and indexed in the
+    background; ``load_documents`` skips files whose content is already
+    indexed, and the embedding cache serves chunks embedded before, so a
+    restart only pays for what actually changed. A job fails, naming the
+    files, if any of its PDFs could not be indexed.
+
+    Args:
+        agent (MyRAGAgent): The agent whose index is rebuilt
+        queue (IngestionQueue): Worker pool the indexing jobs run on
+        pdfs_dir (str): Directory holding the uploaded PDFs
+
+    Returns:
+        List[IngestionJob]: The queued jobs; the index is ready once all are done
+    """
+    for record in agent.documents.list():
+        if not os.path.exists(record.path):
+            logger.info(f"Removing {record.filename} from the index: file no longer exists")
+            agent.delete_document(record.id)
+
+    paths = find_pdfs(pdfs_dir)
+    if not paths:
+        return []
+
+    def reindex(job: IngestionJob, group: List[str]) -> None:
+        results = agent.load_documents(group, progress=job.advance)
+        failed = [result for result in results if result["status"] == "failed"]
+        if failed:
+            # The other files of the group are indexed, but the job reports the failures
+            raise Exception(
+                f"Failed to index {len(failed)} of {len(group)} PDFs: "
+                + "; ".join(f"{result['filename']}: {result['error']}" for result in failed)
+            )
+
+    groups = [paths[i::queue.max_workers] for i in range(min(queue.max_workers, len(paths)))]
+    jobs = []
+    for i, group in enumerate(groups):
+        jobs.append(queue.submit(
+            f"startup {i + 1}/{len(groups)} ({len(group)} PDFs)",
+            lambda job, group=group: reindex(job, group)
+        ))
+    logger.info(f"Re-indexing {len(paths)} PDFs from {pdfs_dir} in {len(jobs)} background jobs")
+    return jobs
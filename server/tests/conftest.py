@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+CV_PATH = os.path.join(SERVER_DIR, "pdfs", "Akshay_Fullstack_AI_CV.pdf")
+
+
+def make_agent(tmp_path):
+    """An agent over an empty index in ``tmp_path``, with fake embeddings."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from my_rag import MyRAGAgent
+
+    return MyRAGAgent(
+        openai_api_key="sk-test",
+        embeddings=DeterministicFakeEmbedding(size=64),
+        vector_store_path=str(tmp_path / "index")
+    )
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """The app module, imported with its state directories in a temporary directory."""
+    state_dir = tmp_path_factory.mktemp("server")
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-test",
+        "WARM_START": "false",
+        "MULTI_WORKER": "false",
+        "PDFS_DIR": str(state_dir / "pdfs"),
+        "VECTOR_INDEX_DIR": str(state_dir / "index"),
+        "EMBEDDING_CACHE_PATH": str(state_dir / "cache" / "embeddings.sqlite"),
+    })
+    # The static files are mounted relative to the working directory
+    os.chdir(SERVER_DIR)
+    import main
+    return main
+
+
+@pytest.fixture(scope="session")
+def rag_agent(tmp_path_factory):
+    """An agent over the sample CV with fake embeddings; tests set ``llm`` themselves."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from my_rag import MyRAGAgent
+
+    agent = MyRAGAgent(
+        openai_api_key="sk-test",
+        embeddings=DeterministicFakeEmbedding(size=64),
+        vector_store_path=str(tmp_path_factory.mktemp("agent") / "index")
+    )
+    agent.load_documents([CV_PATH])
+    return agent
+
+
+@pytest.fixture
+def client(main_module, rag_agent):
+    from fastapi.testclient import TestClient
+
+    main_module.app.dependency_overrides[main_module.get_rag_agent] = lambda: rag_agent
+    yield TestClient(main_module.app)
+    main_module.app.dependency_overrides.clear()
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from benchmarks.fakes import FakeStreamingChatModel
+
+
+def test_ask_many_returns_results_in_order(rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=2, token_delay=0)
+
+    results = rag_agent.ask_many(["Batch question one?", "  ", "Batch question two?"])
+
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["answer"] == "token0 token1 "
+    assert results[0]["sources"]
+    assert results[1]["error"] == "Question cannot be empty"
+    assert results[2]["cached"] is False
+
+
+def test_ask_many_inside_running_loop(rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=2, token_delay=0)
+
+    async def caller():
+        # Also uses the agent from this loop first, as a server would
+        async for _ in rag_agent.astream_ask("Loop question?", session_id="batch-loop"):
+            pass
+        return rag_agent.ask_many(["Asked from a running loop?"])
+
+    results = asyncio.run(caller())
+
+    assert "error" not in results[0]
+    assert results[0]["answer"] == "token0 token1 "
+
+
+def test_chat_batch_streams_ndjson(client, rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=3, token_delay=0)
+
+    response = client.post("/chat/batch", json={"questions": ["Endpoint question one?", "", "Endpoint question two?"]})
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    by_index = {line["index"]: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[0]["status"] == "success"
+    assert by_index[0]["response"] == "token0 token1 token2 "
+    assert by_index[1]["status"] == "error"
+
+
+def test_chat_batch_rejects_bad_concurrency(client):
+    response = client.post("/chat/batch", json={"questions": ["Anything?"], "max_concurrency": 0})
+
+    assert response.status_code == 400
@@ -0,0 +1,87 @@
+import json
+
+from benchmarks.fakes import FakeStreamingChatModel
+
+
+class FailingChatModel(FakeStreamingChatModel):
+    """Fails after streaming its first token."""
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+            raise RuntimeError("model unavailable")
+
+
+def stream_events(client, payload):
+    """POST to /chat/stream and parse the Server-Sent Events of the response."""
+    response = client.post("/chat/stream", json=payload)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_tokens_then_done(client, rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=5, token_delay=0)
+
+    events = stream_events(client, {"message": "Which projects are listed?", "session_id": "stream-tokens"})
+
+    names = [name for name, _ in events]
+    assert names == ["token"] * 5 + ["done"]
+    done = events[-1][1]
+    assert done["answer"] == "".join(data for name, data in events if name == "token")
+    assert done["session_id"] == "stream-tokens"
+    assert done["sources"] and all("source" in source for source in done["sources"])
+    assert done["prompt_tokens"] > 0
+
+
+def test_stream_defaults_session_id(client, rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=2, token_delay=0)
+
+    events = stream_events(client, {"message": "Where did the candidate study?"})
+
+    assert events[-1][0] == "done"
+    assert events[-1][1]["session_id"] == "default"
+
+
+def test_stream_records_history(client, rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=3, token_delay=0)
+
+    stream_events(client, {"message": "What languages does the candidate know?", "session_id": "stream-history"})
+
+    messages = rag_agent.sessions.get("stream-history").messages
+    assert [message.type for message in messages] == ["human", "ai"]
+    assert messages[1].content == "token0 token1 token2 "
+
+
+def test_stream_serves_cached_answer(client, rag_agent):
+    rag_agent.llm = FakeStreamingChatModel(answer_tokens=4, token_delay=0)
+    question = "What frameworks has the candidate used?"
+    first = stream_events(client, {"message": question, "session_id": "stream-cache-1"})
+
+    second = stream_events(client, {"message": question, "session_id": "stream-cache-2"})
+
+    assert [name for name, _ in second] == ["token", "done"]
+    assert second[0][1] == first[-1][1]["answer"]
+    assert second[-1][1]["cached"] is True
+    assert second[-1][1]["session_id"] == "stream-cache-2"
+
+
+def test_stream_sends_error_event(client, rag_agent):
+    rag_agent.llm = FailingChatModel(answer_tokens=5, token_delay=0)
+
+    events = stream_events(client, {"message": "Summarise the work experience", "session_id": "stream-error"})
+
+    assert [name for name, _ in events] == ["token", "error"]
+    assert "model unavailable" in events[-1][1]["detail"]
+
+
+def test_stream_rejects_empty_message(client, rag_agent):
+    response = client.post("/chat/stream", json={"message": "   "})
+
+    assert response.status_code == 400
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from checkpointing import BoundedMemorySaver, make_checkpointer
+
+
+def test_sqlite_mode_archives_under_data_dir(tmp_path):
+    checkpointer = make_checkpointer("sqlite", data_dir=str(tmp_path))
+
+    assert isinstance(checkpointer, BoundedMemorySaver)
+    assert checkpointer.archive_path == os.path.join(str(tmp_path), "checkpoints.sqlite")
+    assert os.path.exists(checkpointer.archive_path)
+
+
+def test_sqlite_mode_prefers_explicit_archive_path(tmp_path):
+    archive_path = str(tmp_path / "archive" / "threads.sqlite")
+
+    checkpointer = make_checkpointer("sqlite", archive_path=archive_path, data_dir=str(tmp_path))
+
+    assert checkpointer.archive_path == archive_path
+
+
+def test_sqlite_mode_needs_somewhere_to_archive():
+    with pytest.raises(ValueError):
+        make_checkpointer("sqlite")
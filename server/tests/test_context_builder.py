@@ -0,0 +1,75 @@
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+from context_builder import ContextBuilder, TokenCounter, deduplicate_chunks
+
+
+def chunks(count, words=40):
+    return [
+        Document(page_content=" ".join(f"word{i}-{j}" for j in range(words)), metadata={"source": "cv.pdf", "page": i})
+        for i in range(count)
+    ]
+
+
+def test_whole_prompts_are_not_memoised():
+    counter = TokenCounter()
+    builder = ContextBuilder(counter=counter)
+    docs = chunks(3)
+
+    builder.build("question 0", docs, [])
+    cached = counter._cached_count.cache_info().currsize
+    for turn in range(1, 50):
+        builder.build(f"question {turn}", docs, [])
+
+    # Each new turn adds only its question section to the cache
+    assert counter._cached_count.cache_info().currsize == cached + 49
+
+
+def conversation(turns, words=60):
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=f"question {turn} " + "ask " * words))
+        messages.append(AIMessage(content=f"answer {turn} " + "reply " * words))
+    return messages
+
+
+def test_prompt_stays_within_budget():
+    builder = ContextBuilder(max_prompt_tokens=600, max_history_tokens=200)
+    count = builder.counter.count
+
+    for turns, docs in ((0, chunks(2)), (3, chunks(20)), (20, chunks(50, words=200))):
+        prompt = builder.build("What does the document say?", docs, conversation(turns))
+
+        assert prompt.stats["prompt_tokens"] == count(prompt.text, cache=False)
+        assert prompt.stats["prompt_tokens"] <= 600
+        assert prompt.stats["history_tokens"] <= 200
+        assert "Current Question: What does the document say?" in prompt.text
+    assert prompt.stats["tokens_trimmed"] > 0
+    assert builder.stats()["max_prompt_tokens"] <= 600
+
+
+def test_newest_history_and_most_relevant_chunks_are_kept():
+    builder = ContextBuilder(max_prompt_tokens=800, max_history_tokens=150)
+    docs = chunks(30)
+
+    prompt = builder.build("question", docs, conversation(10))
+
+    assert "answer 9" in prompt.text
+    assert "question 0 " not in prompt.text
+    assert docs[0].page_content in prompt.text
+    assert docs[-1].page_content not in prompt.text
+    assert 0 < prompt.stats["chunks_used"] < len(docs)
+
+
+def test_overlapping_neighbours_are_sent_once():
+    text = " ".join(f"word{i}" for i in range(200))
+    first = Document(page_content=text[:600], metadata={"source": "cv.pdf", "page": 0})
+    second = Document(page_content=text[400:1000], metadata={"source": "cv.pdf", "page": 0})
+    other_page = Document(page_content=text[400:1000], metadata={"source": "cv.pdf", "page": 1})
+
+    passages = deduplicate_chunks([first, second, other_page], max_overlap=200)
+
+    assert [p.page_content for p in passages] == [text[:1000], text[400:1000]]
+    prompt = ContextBuilder(chunk_overlap=200).build("question", [first, second], [])
+    assert prompt.stats["chunks_deduplicated"] == 1
+    assert prompt.text.count(text[400:600]) == 1
@@ -0,0 +1,106 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import CV_PATH, make_agent
+from documents import DocumentRecord, DocumentRegistry
+
+
+def copy_pdf(path, suffix=b""):
+    """A copy of the sample CV; a suffix after its end changes the hash, not the text."""
+    shutil.copy(CV_PATH, path)
+    if suffix:
+        with open(path, "ab") as f:
+            f.write(suffix)
+    return str(path)
+
+
+def record(sha256, filename, chunk_ranges):
+    return DocumentRecord(sha256=sha256, filename=filename, path=f"/pdfs/{filename}", size_bytes=1, chunk_ranges=chunk_ranges)
+
+
+def test_registry_persists_adds_and_removes(tmp_path):
+    path = str(tmp_path / "documents.json")
+    registry = DocumentRegistry(path)
+    registry.add(record("a" * 64, "a.pdf", [[0, 3]]))
+    registry.add(record("b" * 64, "b.pdf", [[3, 5]]))
+    registry.remove("a" * 16)
+
+    reopened = DocumentRegistry(path)
+
+    assert [r.filename for r in reopened.list()] == ["b.pdf"]
+    assert reopened.find_by_hash("b" * 64).chunk_ranges == [[3, 5]]
+    assert reopened.find_by_filename("a.pdf") is None
+    assert reopened.total_chunks == 2
+
+
+def test_registry_remaps_ranges_after_compaction(tmp_path):
+    registry = DocumentRegistry(str(tmp_path / "documents.json"))
+    registry.add(record("a" * 64, "a.pdf", [[0, 2], [5, 7]]))
+    registry.add(record("b" * 64, "b.pdf", [[2, 5]]))
+    # Rows 0-1 were deleted: everything shifts down by two
+    remap = np.array([-1, -1, 0, 1, 2, 3, 4], dtype=np.int64)
+
+    registry.remap(remap)
+
+    assert registry.get("a" * 16).chunk_ranges == [[3, 5]]
+    assert registry.get("b" * 16).chunk_ranges == [[0, 3]]
+
+
+def test_same_name_replaces_only_that_document(tmp_path):
+    agent = make_agent(tmp_path)
+    first = copy_pdf(tmp_path / "cv.pdf")
+    other = copy_pdf(tmp_path / "other.pdf", b"\n% other\n")
+    agent.load_documents([first, other])
+    before = {r.filename: r for r in agent.documents.list()}
+
+    copy_pdf(tmp_path / "cv.pdf", b"\n% revised\n")
+    results = agent.load_documents([first])
+
+    assert results[0]["status"] == "replaced"
+    after = {r.filename: r for r in agent.documents.list()}
+    assert after["cv.pdf"].id != before["cv.pdf"].id
+    assert after["other.pdf"].chunk_ranges == before["other.pdf"].chunk_ranges
+    assert agent.vector_store.live_count == agent.documents.total_chunks
+    assert agent.load_documents([first])[0]["status"] == "unchanged"
+
+
+def test_delete_keeps_other_documents(tmp_path):
+    agent = make_agent(tmp_path)
+    agent.load_documents([copy_pdf(tmp_path / "cv.pdf"), copy_pdf(tmp_path / "other.pdf", b"\n% other\n")])
+    doomed = agent.documents.find_by_filename("cv.pdf")
+    kept = agent.documents.find_by_filename("other.pdf")
+
+    assert agent.delete_document(doomed.id).id == doomed.id
+
+    assert agent.delete_document(doomed.id) is None
+    assert [r.id for r in agent.documents.list()] == [kept.id]
+    assert agent.vector_store.live_count == kept.chunks
+    sources = {agent.vector_store.get_metadata(row)["source"] for start, end in kept.chunk_ranges for row in range(start, end)}
+    assert sources == {kept.path}
+
+
+@pytest.fixture
+def documents_client(main_module, tmp_path):
+    from fastapi.testclient import TestClient
+
+    agent = make_agent(tmp_path)
+    main_module.app.dependency_overrides[main_module.get_rag_agent] = lambda: agent
+    yield TestClient(main_module.app), agent
+    main_module.app.dependency_overrides.clear()
+
+
+def test_delete_endpoint_removes_the_document_and_its_file(documents_client, tmp_path):
+    client, agent = documents_client
+    path = copy_pdf(tmp_path / "cv.pdf")
+    agent.load_documents([path, copy_pdf(tmp_path / "other.pdf", b"\n% other\n")])
+    document_id = agent.documents.find_by_filename("cv.pdf").id
+
+    response = client.delete(f"/documents/{document_id}")
+
+    assert response.status_code == 200
+    assert response.json()["document_id"] == document_id
+    assert not (tmp_path / "cv.pdf").exists()
+    assert [d["filename"] for d in client.get("/documents").json()] == ["other.pdf"]
+    assert client.delete(f"/documents/{document_id}").status_code == 404
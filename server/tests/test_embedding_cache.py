@@ -0,0 +1,28 @@
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings
+
+
+def stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+
+def test_replaced_entries_are_not_counted_twice(tmp_path):
+    cache = CachedEmbeddings(DeterministicFakeEmbedding(size=16), path=str(tmp_path / "cache.sqlite"))
+    vectors = {cache._key("chunk"): [0.5] * 16, cache._key("other"): [0.25] * 16}
+
+    # Two loads that both missed the same chunks store them twice
+    cache._store(vectors)
+    cache._store(vectors)
+
+    assert cache.stats()["size_bytes"] == stored_bytes(cache) == 2 * 16 * 4
+
+
+def test_size_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = CachedEmbeddings(DeterministicFakeEmbedding(size=16), path=path)
+    cache.embed_documents(["a", "b", "a"])
+
+    reopened = CachedEmbeddings(DeterministicFakeEmbedding(size=16), path=path)
+
+    assert reopened.stats()["size_bytes"] == cache.stats()["size_bytes"] == 2 * 16 * 4
@@ -0,0 +1,98 @@
+import numpy as np
+
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "The XR-2041-B valve is rated for high pressure",
+    "Section 4.2.1 covers valve maintenance",
+    "Quarterly revenue grew in the third quarter",
+    "Maintenance schedules for pumps and valves",
+    "Nothing relevant here at all",
+]
+
+
+def rows_for(index, query, k=10, deleted=None):
+    return index.search(query, k, deleted=deleted)[0].tolist()
+
+
+def test_compound_tokens_match_whole_and_in_parts():
+    assert tokenize("The XR-2041-B valve") == ["xr-2041-b", "xr", "2041", "b", "valve"]
+
+    index = LexicalIndex()
+    index.add(0, TEXTS)
+
+    assert rows_for(index, "xr-2041-b") == [0]
+    assert rows_for(index, "XR 2041") == [0]
+    assert rows_for(index, "4.2.1") == [1]
+
+
+def test_search_ranks_by_bm25_and_skips_deleted_rows():
+    index = LexicalIndex()
+    index.add(0, TEXTS)
+
+    # Row 1 has both terms; rows 3 and 0 one each, and the shorter row 3 scores higher
+    assert rows_for(index, "valve maintenance") == [1, 3, 0]
+    # Rows sharing no term are never returned
+    assert rows_for(index, "unrelated words") == []
+    deleted = np.array([False, True, False, False, False])
+    assert rows_for(index, "valve maintenance", deleted=deleted) == [3, 0]
+
+
+def test_skipped_rows_are_indexed_empty():
+    index = LexicalIndex()
+    index.add(0, TEXTS[:2])
+    index.add(4, TEXTS[2:3])
+
+    assert len(index) == 5
+    assert rows_for(index, "revenue") == [4]
+
+
+def test_remap_follows_compaction():
+    index = LexicalIndex()
+    index.add(0, TEXTS, last_id="c4")
+    remap = np.array([-1, 0, 1, -1, 2], dtype=np.int64)
+
+    index.remap(remap, last_id="c4")
+
+    assert len(index) == 3
+    assert rows_for(index, "valve maintenance") == [0]
+    assert rows_for(index, "revenue") == [1]
+    assert rows_for(index, "xr-2041-b") == []
+    compacted = LexicalIndex()
+    compacted.add(0, [TEXTS[1], TEXTS[2], TEXTS[4]])
+    for query in ("maintenance", "quarter revenue", "relevant"):
+        np.testing.assert_allclose(index.search(query, 5)[1], compacted.search(query, 5)[1])
+
+
+def test_snapshot_round_trip_then_sync(tmp_path):
+    path = str(tmp_path / "lexical.npz")
+    index = LexicalIndex(path)
+    index.add(0, TEXTS[:3], last_id="c2")
+    index.save()
+
+    loaded = LexicalIndex(path)
+    assert loaded.load() is True
+    assert len(loaded) == 3
+    assert loaded.last_id == "c2"
+    for query in ("valve", "maintenance", "revenue"):
+        assert loaded.search(query, 5)[0].tolist() == index.search(query, 5)[0].tolist()
+
+    # Rows appended after the snapshot are read back from the store
+    indexed = loaded.sync(5, lambda start, end: TEXTS[start:end], last_id="c4")
+    assert indexed == 2
+    assert loaded.last_id == "c4"
+    assert rows_for(loaded, "pumps") == [3]
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "lexical.npz"
+    path.write_bytes(b"not a snapshot")
+
+    index = LexicalIndex(str(path))
+
+    assert index.load() is False
+    assert len(index) == 0
+
+
+def test_reciprocal_rank_fusion_favours_rows_ranked_by_both():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]]) == [1, 3, 2, 4]
@@ -0,0 +1,64 @@
+import shutil
+
+from langchain_core.documents import Document
+
+from conftest import CV_PATH, make_agent
+from query_cache import QueryCache
+
+QUESTION = "Which projects are listed?"
+
+
+def test_results_are_keyed_on_the_corpus_version():
+    cache = QueryCache()
+    docs = [Document(page_content="chunk", metadata={"source": "cv.pdf"})]
+    cache.put_results(1, QUESTION, 4, docs, seconds=0.01)
+
+    assert cache.get_results(1, "  which projects are LISTED? ", 4) == docs
+    assert cache.get_results(2, QUESTION, 4) is None
+    assert cache.get_results(1, QUESTION, 8) is None
+    stats = cache.stats()["results"]
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_clearing_results_keeps_embeddings():
+    cache = QueryCache()
+    cache.put_embedding(QUESTION, [0.5, 0.5], seconds=0.01)
+    cache.put_results(1, QUESTION, 4, [], seconds=0.01)
+
+    cache.clear_results()
+
+    assert cache.get_results(1, QUESTION, 4) is None
+    assert cache.get_embedding(QUESTION) == [0.5, 0.5]
+
+
+def test_levels_are_lru_bounded():
+    cache = QueryCache(max_embeddings=2, max_results=0)
+    for i in range(3):
+        cache.put_embedding(f"question {i}", [float(i)], seconds=0.01)
+        cache.put_results(1, f"question {i}", 4, [], seconds=0.01)
+
+    assert cache.get_embedding("question 0") is None
+    assert cache.get_embedding("question 2") == [2.0]
+    assert cache.stats()["results"]["entries"] == 0
+
+
+def test_corpus_changes_invalidate_retrieval_results(tmp_path):
+    agent = make_agent(tmp_path)
+    other = tmp_path / "other.pdf"
+    shutil.copy(CV_PATH, other)
+    with open(other, "ab") as f:
+        f.write(b"\n% other\n")
+    agent.load_documents([CV_PATH, str(other)])
+    # Both files hold the same text, so retrieval draws on both
+    assert {doc.metadata["source"] for doc in agent.retrieve(QUESTION, k=8)} == {CV_PATH, str(other)}
+    agent.retrieve(QUESTION, k=8)
+    assert agent.query_cache.stats()["results"]["hits"] == 1
+
+    agent.delete_document(agent.documents.find_by_filename("other.pdf").id)
+    docs = agent.retrieve(QUESTION, k=8)
+
+    assert {doc.metadata["source"] for doc in docs} == {CV_PATH}
+    stats = agent.query_cache.stats()
+    assert stats["results"]["hits"] == 1
+    # The question's embedding does not depend on the documents and is reused
+    assert stats["embeddings"]["hits"] >= 1
@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+from retrieval import CompressedMatrix
+
+
+def normalised(rows, dim, seed=0):
+    matrix = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_int8_scores_match_dequantized_rows():
+    matrix = normalised(3000, 32)
+    compressed = CompressedMatrix(dim=16, int8=True)
+    compressed.add(matrix)
+    queries = compressed.project(normalised(3, 32, seed=1))
+
+    scores = compressed.scores(queries, len(compressed))
+
+    assert scores.shape == (3, 3000)
+    np.testing.assert_allclose(scores, queries @ compressed[:].T, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(scores, queries @ compressed.project(matrix).T, atol=0.05)
+
+
+def test_scores_stay_consistent_while_rows_are_added():
+    matrix = normalised(20000, 16)
+    compressed = CompressedMatrix(int8=True)
+    compressed.add(matrix[:100])
+    query = matrix[0]
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            n = len(compressed)
+            try:
+                scores = compressed.scores(query, n)
+                assert scores.shape == (n,)
+                assert abs(scores[0] - 1) < 0.05
+            except Exception as e:
+                errors.append(e)
+                return
+
+    reader = threading.Thread(target=search)
+    reader.start()
+    # Many small appends, each of which may reallocate the arrays
+    for stop in range(200, len(matrix) + 1, 100):
+        compressed.add(matrix[:stop], block_size=50)
+    done.set()
+    reader.join()
+
+    assert errors == []
+    assert len(compressed) == len(matrix)
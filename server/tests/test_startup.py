@@ -0,0 +1,36 @@
+import shutil
+
+from conftest import CV_PATH, make_agent
+from ingestion import IngestionJob, IngestionQueue
+from startup import warm_restart
+
+
+def test_unreadable_pdfs_are_reported_failed(tmp_path):
+    agent = make_agent(tmp_path)
+    bad_path = tmp_path / "broken.pdf"
+    bad_path.write_bytes(b"not a pdf at all")
+
+    results = agent.load_documents([CV_PATH, str(bad_path)])
+
+    by_name = {result["filename"]: result for result in results}
+    assert by_name["broken.pdf"]["status"] == "failed"
+    assert by_name["broken.pdf"]["error"]
+    assert by_name["Akshay_Fullstack_AI_CV.pdf"]["status"] == "added"
+    assert [record.filename for record in agent.documents.list()] == ["Akshay_Fullstack_AI_CV.pdf"]
+
+
+def test_warm_restart_fails_jobs_with_unreadable_pdfs(tmp_path):
+    pdfs_dir = tmp_path / "pdfs"
+    pdfs_dir.mkdir()
+    shutil.copy(CV_PATH, pdfs_dir / "cv.pdf")
+    (pdfs_dir / "broken.pdf").write_bytes(b"not a pdf at all")
+    agent = make_agent(tmp_path)
+    queue = IngestionQueue(max_workers=1)
+
+    jobs = warm_restart(agent, queue, str(pdfs_dir))
+    queue.shutdown(wait=True)
+
+    assert len(jobs) == 1
+    assert jobs[0].status == IngestionJob.FAILED
+    assert "broken.pdf" in jobs[0].error
+    assert [record.filename for record in agent.documents.list()] == ["cv.pdf"]
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from conftest import CV_PATH, make_agent
+from ingestion import IngestionJob, QueueFullError
+from uploads import MULTIPART_OVERHEAD, UploadLimitMiddleware, UploadTooLargeError, save_upload
+
+
+@pytest.fixture
+def upload_client(main_module, tmp_path, monkeypatch):
+    """A client over an empty agent whose ingestion jobs are queued but not run."""
+    from fastapi.testclient import TestClient
+
+    agent = make_agent(tmp_path)
+    queued = []
+
+    def submit(filename, func, job_id=None):
+        job = IngestionJob(filename, job_id)
+        queued.append((job, func))
+        return job
+
+    monkeypatch.setattr(main_module.ingestion_queue, "submit", submit)
+    main_module.app.dependency_overrides[main_module.get_rag_agent] = lambda: agent
+    yield TestClient(main_module.app), queued
+    main_module.app.dependency_overrides.clear()
+
+
+def upload(client, filename, content):
+    return client.post("/upload-pdf", files={"file": (filename, content, "application/pdf")})
+
+
+def pdf_bytes(suffix=b""):
+    with open(CV_PATH, "rb") as f:
+        return f.read() + suffix
+
+
+def staging_files(pdfs_dir):
+    return [name for name in os.listdir(pdfs_dir) if name.endswith(".upload")]
+
+
+def test_rejected_upload_leaves_pdfs_untouched(main_module, upload_client, monkeypatch):
+    client, _ = upload_client
+    file_path = os.path.join(main_module.pdfs_dir, "rejected.pdf")
+    with open(file_path, "wb") as f:
+        f.write(b"previous version")
+
+    def full(filename, func, job_id=None):
+        raise QueueFullError("Ingestion queue is full, please retry later")
+
+    monkeypatch.setattr(main_module.ingestion_queue, "submit", full)
+    response = upload(client, "rejected.pdf", pdf_bytes())
+
+    assert response.status_code == 429
+    with open(file_path, "rb") as f:
+        assert f.read() == b"previous version"
+    assert staging_files(main_module.pdfs_dir) == []
+
+
+def test_each_job_indexes_its_own_upload(main_module, upload_client):
+    client, queued = upload_client
+    first = upload(client, "versions.pdf", pdf_bytes())
+    second = upload(client, "versions.pdf", pdf_bytes(b"\n% revised\n"))
+    assert first.status_code == second.status_code == 202
+    # Nothing is moved into place before the jobs run
+    assert not os.path.exists(os.path.join(main_module.pdfs_dir, "versions.pdf"))
+
+    (first_job, first_run), (second_job, second_run) = queued
+    added = first_run(first_job)
+    replaced = second_run(second_job)
+
+    assert added[0]["status"] == "added"
+    assert added[0]["document_id"] == first.json()["sha256"][:16]
+    assert replaced[0]["status"] == "replaced"
+    assert replaced[0]["document_id"] == second.json()["sha256"][:16]
+    assert staging_files(main_module.pdfs_dir) == []
+
+
+def test_save_upload_streams_to_disk_in_chunks(tmp_path):
+    data = os.urandom(10_000)
+    dest = tmp_path / "upload.pdf"
+
+    upload = UploadFile(io.BytesIO(data), filename="a.pdf")
+
+    size, sha256 = asyncio.run(save_upload(upload, str(dest), 20_000, chunk_size=1024))
+
+    assert (size, sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert dest.read_bytes() == data
+
+
+def test_save_upload_rejects_oversized_files_without_leftovers(tmp_path):
+    dest = tmp_path / "upload.pdf"
+    upload = UploadFile(io.BytesIO(b"x" * 5000), filename="a.pdf")
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(upload, str(dest), 4096, chunk_size=1024))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_endpoint_answers_413(main_module, upload_client, monkeypatch):
+    client, queued = upload_client
+    monkeypatch.setattr(main_module, "MAX_UPLOAD_BYTES", 1024)
+
+    response = upload(client, "big.pdf", pdf_bytes())
+
+    assert response.status_code == 413
+    assert queued == []
+    assert staging_files(main_module.pdfs_dir) == []
+
+
+@pytest.fixture
+def limited_client():
+    """A client for an app whose /upload body may hold at most 1000 bytes of file."""
+    app = FastAPI()
+    received = []
+
+    @app.post("/upload")
+    @app.post("/other")
+    async def echo(request: Request):
+        received.append(len(await request.body()))
+        return {"received": received[-1]}
+
+    app.add_middleware(UploadLimitMiddleware, paths=["/upload"], max_bytes=1000)
+    return TestClient(app), received
+
+
+def test_middleware_rejects_declared_oversized_bodies_unread(limited_client):
+    client, received = limited_client
+    body = b"x" * (1000 + MULTIPART_OVERHEAD + 1)
+
+    response = client.post("/upload", content=body)
+
+    assert response.status_code == 413
+    assert "Maximum size" in response.json()["detail"]
+    assert received == []
+    assert client.post("/upload", content=b"x" * 1000).status_code == 200
+    assert client.post("/other", content=body).status_code == 200
+
+
+def test_middleware_stops_chunked_bodies_at_the_limit(limited_client):
+    client, received = limited_client
+
+    def chunks():
+        for _ in range(100):
+            yield b"x" * 4096
+
+    response = client.post("/upload", content=chunks())
+
+    assert response.status_code == 413
+    assert received == []
@@ -0,0 +1,198 @@
+import os
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vector_store import MmapVectorStore
+
+
+def make_store(path, **kwargs):
+    return MmapVectorStore(DeterministicFakeEmbedding(size=16), path=str(path), **kwargs)
+
+
+def docs(start, count, source="cv.pdf"):
+    return [
+        Document(page_content=f"chunk {i} of the document", metadata={"source": source, "page": i})
+        for i in range(start, start + count)
+    ]
+
+
+def open_handles(store):
+    """Descriptors this process holds on the store's texts.bin and ids.bin."""
+    names = {os.path.join(store.path, "texts.bin"), os.path.join(store.path, "ids.bin")}
+    count = 0
+    for fd in os.listdir("/proc/self/fd"):
+        try:
+            count += os.readlink(f"/proc/self/fd/{fd}").removesuffix(" (deleted)") in names
+        except OSError:
+            pass
+    return count
+
+
+def test_appends_and_deletes_share_file_handles(tmp_path):
+    store = make_store(tmp_path)
+    store.append_documents(docs(0, 2))
+    # Views held by searches in flight while the store changes
+    views = [store.snapshot()]
+
+    for i in range(50):
+        start, _ = store.append_documents(docs(2 + i, 1))
+        views.append(store.snapshot())
+        store.delete_rows([(start, start + 1)])
+        views.append(store.snapshot())
+
+    assert open_handles(store) == 2
+    assert store.get_text(1, views[0]) == "chunk 1 of the document"
+
+
+def test_compaction_keeps_older_views_readable(tmp_path):
+    store = make_store(tmp_path)
+    store.append_documents(docs(0, 4))
+    store.delete_rows([(0, 2)])
+    before = store.snapshot()
+
+    store.compact()
+
+    assert store.get_text(0) == "chunk 2 of the document"
+    assert store.get_text(0, before) == "chunk 0 of the document"
+    # The replaced files stay open only while a view still holds them
+    assert open_handles(store) == 4
+    del before
+    assert open_handles(store) == 2
+
+
+def overlapping_chunks(count, size=120, overlap=40):
+    text = " ".join(f"token{i}" for i in range(count * size // 7 + 50))
+    step = size - overlap
+    return [
+        Document(page_content=text[i * step:i * step + size], metadata={"source": "cv.pdf", "page": i // 3, "page_label": str(i // 3 + 1)})
+        for i in range(count)
+    ]
+
+
+def contents(store):
+    return [store.get_document(row) for row in range(len(store))]
+
+
+def test_appended_chunks_survive_reopening(tmp_path):
+    store = make_store(tmp_path)
+    chunks = overlapping_chunks(20) + docs(0, 3, source="other.pdf")
+    store.append_documents(chunks)
+
+    reopened = make_store(tmp_path)
+
+    assert len(reopened) == len(chunks)
+    assert [(doc.page_content, doc.metadata) for doc in contents(reopened)] == [
+        (doc.page_content, doc.metadata) for doc in chunks
+    ]
+    assert reopened.similarity_search(chunks[5].page_content, k=1)[0].page_content == chunks[5].page_content
+
+
+def test_overlapping_chunks_share_their_text(tmp_path):
+    store = make_store(tmp_path)
+    chunks = overlapping_chunks(20)
+
+    store.append_documents(chunks[:10])
+    store.append_documents(chunks[10:])
+
+    stored = os.path.getsize(tmp_path / "texts.bin")
+    assert stored < sum(len(doc.page_content) for doc in chunks) * 0.75
+    assert [doc.page_content for doc in contents(make_store(tmp_path))] == [doc.page_content for doc in chunks]
+
+
+def test_deleted_rows_stay_deleted_after_reopening(tmp_path):
+    store = make_store(tmp_path)
+    chunks = docs(0, 6)
+    store.append_documents(chunks)
+
+    assert store.delete_rows([(1, 3)]) == 2
+    assert store.delete_rows([(2, 4)]) == 1
+    reopened = make_store(tmp_path)
+
+    assert len(reopened) == 6
+    assert reopened.live_count == 3
+    found = reopened.similarity_search(chunks[2].page_content, k=6)
+    assert {doc.page_content for doc in found} == {chunks[i].page_content for i in (0, 4, 5)}
+
+
+def test_compaction_drops_deleted_rows(tmp_path):
+    store = make_store(tmp_path)
+    chunks = overlapping_chunks(12)
+    store.append_documents(chunks)
+    store.delete_rows([(0, 2), (5, 8)])
+
+    remap = store.compact()
+
+    assert remap.tolist() == [-1, -1, 0, 1, 2, -1, -1, -1, 3, 4, 5, 6]
+    assert store.compact() is None
+    reopened = make_store(tmp_path)
+    assert reopened.deleted_count == 0
+    kept = [chunks[i] for i in (2, 3, 4, 8, 9, 10, 11)]
+    assert [(doc.page_content, doc.metadata) for doc in contents(reopened)] == [
+        (doc.page_content, doc.metadata) for doc in kept
+    ]
+
+
+def test_interrupted_compaction_is_finished_on_open(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    chunks = docs(0, 5)
+    store.append_documents(chunks)
+    store.delete_rows([(0, 2)])
+
+    # The process dies once the compacted files are complete, before they are swapped in
+    def crash():
+        raise SystemExit
+    monkeypatch.setattr(store, "_finish_compaction", crash)
+    try:
+        store.compact()
+    except SystemExit:
+        pass
+    assert os.path.exists(tmp_path / "compact.ready")
+
+    reopened = make_store(tmp_path)
+
+    assert len(reopened) == 3
+    assert reopened.deleted_count == 0
+    assert [doc.page_content for doc in contents(reopened)] == [doc.page_content for doc in chunks[2:]]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith((".compact", ".ready"))]
+
+
+def test_unfinished_compaction_files_are_discarded(tmp_path):
+    store = make_store(tmp_path)
+    chunks = docs(0, 3)
+    store.append_documents(chunks)
+    store.delete_rows([(0, 1)])
+    for name in ("rows.bin", "texts.bin"):
+        (tmp_path / f"{name}.compact").write_bytes(b"partial")
+
+    reopened = make_store(tmp_path)
+
+    assert len(reopened) == 3
+    assert reopened.deleted_count == 1
+    assert [doc.page_content for doc in contents(reopened)] == [doc.page_content for doc in chunks]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".compact")]
+
+
+def test_torn_append_is_ignored_and_overwritten(tmp_path):
+    store = make_store(tmp_path)
+    chunks = docs(0, 3)
+    store.append_documents(chunks)
+    # An append that died part-way: texts, ids and vectors written, rows.bin only partly
+    with open(tmp_path / "texts.bin", "ab") as f:
+        f.write(b"orphaned text")
+    with open(tmp_path / "ids.bin", "ab") as f:
+        f.write(b"orphaned-id")
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 16 * 4)
+    with open(tmp_path / "rows.bin", "ab") as f:
+        f.write(b"\1" * 10)
+
+    reopened = make_store(tmp_path)
+    assert len(reopened) == 3
+    more = docs(3, 2)
+    reopened.append_documents(more)
+
+    again = make_store(tmp_path)
+    assert len(again) == 5
+    assert [doc.page_content for doc in contents(again)] == [doc.page_content for doc in chunks + more]
+    assert again.similarity_search(more[1].page_content, k=1)[0].page_content == more[1].page_content
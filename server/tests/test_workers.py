@@ -0,0 +1,124 @@
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from ingestion import IngestionJob
+from sessions import SharedSessionStore
+from workers import WorkerCoordinator
+
+
+def turn(store, session_id, question, answer):
+    session = store.get(session_id)
+    with session.lock:
+        store.append(session, [HumanMessage(content=question), AIMessage(content=answer)])
+
+
+def history(store, session_id):
+    session = store.get(session_id)
+    with session.lock:
+        return [message.content for message in session.messages]
+
+
+def test_shared_sessions_follow_turns_across_workers(tmp_path):
+    first = SharedSessionStore(str(tmp_path))
+    second = SharedSessionStore(str(tmp_path))
+
+    turn(first, "chat", "q1", "a1")
+    turn(second, "chat", "q2", "a2")
+
+    assert history(first, "chat") == ["q1", "a1", "q2", "a2"]
+    assert history(second, "other") == []
+
+
+def test_shared_sessions_delete_and_clear_reach_every_worker(tmp_path):
+    first = SharedSessionStore(str(tmp_path))
+    second = SharedSessionStore(str(tmp_path))
+    turn(first, "a", "q", "a")
+    turn(first, "b", "q", "a")
+    assert history(second, "a") == ["q", "a"]
+
+    assert second.delete("a") is True
+    assert history(first, "a") == []
+    second.clear()
+    assert history(first, "b") == []
+
+
+def test_shared_session_lock_is_held_across_processes(tmp_path):
+    first = SharedSessionStore(str(tmp_path))
+    second = SharedSessionStore(str(tmp_path))
+
+    session = first.get("chat")
+    with session.lock:
+        assert second.get("chat").lock.acquire(blocking=False) is False
+    lock = second.get("chat").lock
+    assert lock.acquire(blocking=False) is True
+    lock.release()
+
+
+def test_new_writer_requeues_claimed_requests(tmp_path):
+    reader = WorkerCoordinator(str(tmp_path))
+    writer = WorkerCoordinator(str(tmp_path))
+    job_id = reader.submit("ingest", "cv.pdf", path="/pdfs/cv.pdf")
+    # The writer queues the ingestion, then exits before it finishes
+    writer.drain(lambda request: None)
+    writer.publish([{**reader.job(job_id), "status": IngestionJob.RUNNING}])
+    assert reader.pending_count() == 0
+
+    successor = WorkerCoordinator(str(tmp_path))
+    assert successor.recover(lambda: []) == []
+
+    assert successor.pending_count() == 1
+    handled = []
+    successor.drain(lambda request: handled.append(request) or {})
+    assert handled[0]["path"] == "/pdfs/cv.pdf"
+    assert successor.job(job_id)["status"] == IngestionJob.COMPLETED
+
+
+def test_new_writer_fails_jobs_it_cannot_rerun(tmp_path):
+    writer = WorkerCoordinator(str(tmp_path))
+    lost = IngestionJob("startup 1/1 (1 PDFs)")
+    lost.status = IngestionJob.RUNNING
+    mine = IngestionJob("startup 1/1 (1 PDFs)")
+    done = IngestionJob("cv.pdf")
+    done.status = IngestionJob.COMPLETED
+    writer.publish([lost.to_dict(), mine.to_dict(), done.to_dict()])
+    waiting = writer.submit("delete", "cv.pdf", document_id="abc")
+
+    successor = WorkerCoordinator(str(tmp_path))
+    assert successor.recover(lambda: [mine.id]) == [lost.id]
+
+    assert successor.job(lost.id)["status"] == IngestionJob.FAILED
+    assert successor.job(lost.id)["error"]
+    assert successor.job(mine.id)["status"] == IngestionJob.QUEUED
+    assert successor.job(done.id)["status"] == IngestionJob.COMPLETED
+    assert successor.job(waiting)["status"] == IngestionJob.QUEUED
+
+
+def test_finished_requests_leave_claimed(tmp_path):
+    writer = WorkerCoordinator(str(tmp_path))
+    job_id = writer.submit("ingest", "cv.pdf", path="/pdfs/cv.pdf")
+    writer.drain(lambda request: None)
+    assert os.listdir(writer.claimed_dir)
+
+    writer.publish([{**writer.job(job_id), "status": IngestionJob.COMPLETED}])
+
+    assert os.listdir(writer.claimed_dir) == []
+
+
+def test_prune_keeps_unfinished_jobs(tmp_path):
+    writer = WorkerCoordinator(str(tmp_path), job_ttl_seconds=60)
+    queued = writer.submit("ingest", "queued.pdf", path="/pdfs/queued.pdf")
+    running = IngestionJob("running.pdf")
+    running.status = IngestionJob.RUNNING
+    done = IngestionJob("done.pdf")
+    done.status = IngestionJob.COMPLETED
+    writer.publish([running.to_dict(), done.to_dict()])
+    old = os.path.getmtime(writer.jobs_dir) - 3600
+    for name in os.listdir(writer.jobs_dir):
+        os.utime(os.path.join(writer.jobs_dir, name), (old, old))
+
+    writer.prune()
+
+    assert writer.job(queued)["status"] == IngestionJob.QUEUED
+    assert writer.job(running.id)["status"] == IngestionJob.RUNNING
+    assert writer.job(done.id) is None
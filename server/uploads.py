@@ -0,0 +1,129 @@
+from typing_extensions import Iterable, Tuple
+
+import hashlib
+import logging
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Headroom for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds its size limit."""
+
+
+async def save_upload(
+    upload: UploadFile,
+    dest_path: str,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> Tuple[int, str]:
+    """
+    Stream an uploaded file to disk in fixed-size chunks.
+
+    The file is written to a temporary file next to ``dest_path`` and only
+    moved into place once it has been received completely, so a rejected or
+    interrupted upload never leaves a partial file behind.
+
+    Args:
+        upload (UploadFile): The uploaded file
+        dest_path (str): Where to store the file
+        max_bytes (int): Maximum accepted size
+        chunk_size (int): Number of bytes read and written per step
+
+    Returns:
+        Tuple[int, str]: The size in bytes and the SHA-256 hex digest
+
+    Raises:
+        UploadTooLargeError: As soon as more than ``max_bytes`` have been read
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path) or ".", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(
+                        f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+                    )
+                digest.update(chunk)
+                buffer.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return size, digest.hexdigest()
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized request bodies on upload routes.
+
+    Requests with a ``Content-Length`` above the limit are answered with 413
+    before any of the body is read. Bodies without one (chunked transfer
+    encoding) are counted as they arrive and aborted with 413 as soon as
+    they cross the limit, before the multipart parser spools the rest.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int):
+        """
+        Args:
+            app: The wrapped ASGI application
+            paths (Iterable[str]): Request paths the limit applies to
+            max_bytes (int): Maximum accepted request body size
+        """
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)}MB."
+        limit = self.max_bytes + MULTIPART_OVERHEAD
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.info(f"Rejected upload of {int(content_length)} bytes to {scope['path']}")
+            body = ('{"detail": "%s"}' % detail).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
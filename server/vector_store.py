@@ -0,0 +1,875 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from typing_extensions import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+from retrieval import SearchEngine
+
+logger = logging.getLogger(__name__)
+
+STORE_FILES = ("rows.bin", "texts.bin", "ids.bin", "vectors.f32")
+# Files of the version 1 format, migrated when such a store is opened
+LEGACY_FILES = ("records.jsonl", "offsets.i64")
+
+# One fixed-size record per chunk. Texts and ids are addressed by offset into
+# texts.bin and ids.bin; metadata dicts are interned in metadata.jsonl, except
+# the page number and label, which change on every page and are kept per row
+ROW_DTYPE = np.dtype([
+    ("text_start", "<i8"),
+    ("id_start", "<i8"),
+    ("text_length", "<i4"),
+    ("id_length", "<i4"),
+    ("metadata", "<i4"),
+    ("page", "<i4"),
+    ("page_label", "<i4"),
+])
+NO_PAGE = -1
+# page_label values: absent, or "str(page + 1)" as PyPDFLoader sets it; any
+# other label stays in the interned metadata dict
+LABEL_NONE = 0
+LABEL_FROM_PAGE = 1
+
+# Overlapping neighbours share text bytes only when at least this much overlaps
+MIN_SHARED_BYTES = 16
+MAX_SHARED_BYTES = 4096
+
+
+def _pread(f, length: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), length, offset)
+    f.seek(offset)
+    return f.read(length)
+
+
+def _shared_prefix(tail: bytes, data: bytes) -> int:
+    """Length of the longest suffix of ``tail`` that is also a prefix of ``data``."""
+    window = tail[-MAX_SHARED_BYTES:]
+    probe = data[:MIN_SHARED_BYTES]
+    if len(probe) < MIN_SHARED_BYTES:
+        return 0
+    position = window.find(probe)
+    while position != -1:
+        # The first match that runs to the end of ``tail`` is the longest overlap
+        if data.startswith(window[position:]):
+            return len(window) - position
+        position = window.find(probe, position + 1)
+    return 0
+
+
+def _split_page(metadata: dict) -> Tuple[dict, int, int]:
+    """
+    Separate the per-page fields from a chunk's metadata so the rest can be interned.
+
+    Only trailing ``page`` (and ``page_label`` equal to ``str(page + 1)``)
+    keys, as PyPDFLoader writes them, are split out, so the metadata can be
+    rebuilt with its keys in their original order.
+    """
+    keys = list(metadata)
+    page = metadata.get("page")
+    if type(page) is not int or not 0 <= page < 2 ** 31 - 1:
+        return metadata, NO_PAGE, LABEL_NONE
+    if keys[-1] == "page":
+        return {key: metadata[key] for key in keys[:-1]}, page, LABEL_NONE
+    if keys[-2:] == ["page", "page_label"] and metadata["page_label"] == str(page + 1):
+        return {key: metadata[key] for key in keys[:-2]}, page, LABEL_FROM_PAGE
+    return metadata, NO_PAGE, LABEL_NONE
+
+
+class _ReadHandle:
+    """
+    A read-only handle on one version of a store file.
+
+    Appends only grow a file, so every view of it shares one handle until a
+    compaction or clear replaces the file. The handle is closed when the last
+    view holding it is dropped, so readers of an older view can finish first.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self.inode = os.fstat(self._file.fileno()).st_ino
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def seek(self, offset: int) -> int:
+        return self._file.seek(offset)
+
+    def read(self, length: int) -> bytes:
+        return self._file.read(length)
+
+    def __del__(self):
+        if hasattr(self, "_file"):
+            self._file.close()
+
+
+class _StoreView(NamedTuple):
+    """A consistent snapshot of the mapped store files."""
+    vectors: np.ndarray
+    rows: np.ndarray
+    deleted: Optional[np.ndarray]
+    texts: Any
+    ids: Any
+    metadata: List[dict]
+
+
+class MmapVectorStore(VectorStore):
+    """
+    A persistent vector store that keeps embeddings as packed float32 rows in a
+    memory-mapped file, with chunk text and metadata in compact sidecar files.
+
+    Directory layout:
+        meta.json      -- embedding dimension and format version
+        vectors.f32    -- contiguous (count, dim) float32 matrix, L2-normalised
+        rows.bin       -- one ``ROW_DTYPE`` record per chunk
+        texts.bin      -- chunk texts as UTF-8; a chunk that starts with the end
+                          of the previous one (the splitter's overlap) shares
+                          those bytes instead of repeating them
+        ids.bin        -- chunk ids as UTF-8
+        metadata.jsonl -- distinct metadata dicts, without page number and label
+        tombstones.i64 -- row indices of deleted chunks
+        generation     -- bumped whenever row numbers change (compaction, clear,
+                          migration)
+        store.lock     -- advisory lock shared by every process using the store
+
+    Opening a store only maps the files and reads the interned metadata, so
+    startup cost does not depend on the number of chunks, and only the chunks
+    asked for are ever materialised as ``Document`` objects. Adds are
+    append-only; ``rows.bin`` is written last so a crash mid-append never
+    exposes a partially written chunk. Deletes only record tombstones, so their
+    cost scales with the number of deleted rows; :meth:`compact` rewrites the
+    files without them. Stores in the version 1 format (one JSON record per
+    chunk) are converted when opened.
+
+    Several processes can share one store: one opens it for writing and the
+    others with ``read_only=True``, mapping the same files (and so the same page
+    cache) and calling :meth:`refresh` to pick up the writer's changes. The
+    writer holds ``store.lock`` exclusively while it changes the files and
+    readers hold it shared while they re-map them, so a reader never sees a
+    half-finished append or compaction.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        path: Optional[str] = None,
+        dim: Optional[int] = None,
+        ann_threshold: int = 50000,
+        on_append: Optional[Callable[[int, List[str], List[str]], None]] = None,
+        read_only: bool = False,
+        search_engine: Optional[SearchEngine] = None
+    ):
+        """
+        Open (or create) a store.
+
+        Args:
+            embedding (Embeddings): Embeddings model used for texts and queries
+            path (Optional[str]): Directory holding the store files; a temporary
+                directory is used when omitted
+            dim (Optional[int]): Embedding dimension; inferred from the first add
+                when omitted
+            ann_threshold (int): Corpus size above which searches use an
+                approximate IVF index instead of an exact scan
+            on_append (Optional[Callable[[int, List[str], List[str]], None]]): Called
+                with the first row, texts and ids of every append, in row order
+            read_only (bool): Open the store without writing to it, for processes
+                that share a store another process writes to
+            search_engine (Optional[SearchEngine]): Engine answering vector
+                searches, e.g. one with a compressed first pass; an exact/IVF
+                engine using ``ann_threshold`` when omitted
+        """
+        self.embedding = embedding
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix="vector_store_")
+            path = self._tmpdir.name
+        self.path = path
+        self.dim = dim
+        self._lock = threading.Lock()
+        self.search_engine = search_engine or SearchEngine(ann_threshold=ann_threshold)
+        self.on_append = on_append
+        # Interned metadata dicts, and the index of each by its JSON encoding
+        self._metadata: List[dict] = []
+        self._metadata_index: Dict[str, int] = {}
+        # Text of the last chunk written and the texts.bin offset it ends at
+        self._tail: Optional[Tuple[bytes, int]] = None
+        self.read_only = read_only
+        # Sizes of rows.bin and tombstones.i64 when last mapped, to detect changes
+        self._file_sizes = (0, 0)
+        # Handles on texts.bin and ids.bin shared by the views of their current version
+        self._readers: Dict[str, _ReadHandle] = {}
+
+        os.makedirs(path, exist_ok=True)
+        self._lock_file = open(self._file("store.lock"), "ab")
+        with self._file_lock(exclusive=not read_only):
+            version = self._read_meta()
+            if read_only:
+                # A store still in the version 1 format stays empty here until
+                # the writer has migrated it and bumped the generation
+                if version == self.FORMAT_VERSION:
+                    self._load_metadata()
+            else:
+                self._recover(version)
+            self._generation = self._read_generation()
+            self._open()
+        logger.info(f"Opened vector store at {path} with {len(self)} chunks" + (" (read-only)" if read_only else ""))
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool) -> Iterator[None]:
+        """Hold ``store.lock``, exclusively to change the files or shared to map them."""
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise RuntimeError(f"Vector store at {self.path} is open read-only")
+
+    def _read_meta(self) -> int:
+        """Read the dimension from ``meta.json`` and return the format version."""
+        meta_path = self._file("meta.json")
+        if not os.path.exists(meta_path):
+            return self.FORMAT_VERSION
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if self.dim is not None and meta["dim"] != self.dim:
+            raise ValueError(f"Vector store at {self.path} has dimension {meta['dim']}, expected {self.dim}")
+        self.dim = meta["dim"]
+        return meta.get("version", 1)
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self._file("generation")) as f:
+                return int(f.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _bump_generation(self) -> None:
+        self._generation = self._read_generation() + 1
+        tmp_path = self._file("generation.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(str(self._generation))
+        os.replace(tmp_path, self._file("generation"))
+
+    def _recover(self, version: int) -> None:
+        """Finish or discard work interrupted by a crash, and migrate old formats."""
+        if os.path.exists(self._file("compact.ready")):
+            self._finish_compaction()
+            self._bump_generation()
+        for name in STORE_FILES + LEGACY_FILES:
+            for suffix in (".compact", ".migrate"):
+                if os.path.exists(self._file(name + suffix)):
+                    os.remove(self._file(name + suffix))
+        if version < self.FORMAT_VERSION and os.path.exists(self._file("offsets.i64")):
+            self._migrate_legacy()
+            self._bump_generation()
+        else:
+            self._load_metadata()
+        for name in LEGACY_FILES:
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+
+    def _write_meta(self) -> None:
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "version": self.FORMAT_VERSION}, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _load_metadata(self) -> None:
+        """Read the interned metadata dicts, dropping a line left half-written by a crash."""
+        self._metadata = []
+        self._metadata_index = {}
+        metadata_path = self._file("metadata.jsonl")
+        if not os.path.exists(metadata_path):
+            return
+        with open(metadata_path, "rb") as f:
+            data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data) and not self.read_only:
+            os.truncate(metadata_path, complete)
+        for line in data[:complete].splitlines():
+            key = line.decode("utf-8")
+            self._metadata_index[key] = len(self._metadata)
+            self._metadata.append(json.loads(key))
+
+    def _intern(self, metadatas: List[dict], f) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Intern the metadata of a batch of chunks, appending new dicts to ``f``.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The metadata index, page and
+            page label flag of each chunk
+        """
+        indices = np.empty(len(metadatas), dtype=np.int32)
+        pages = np.empty(len(metadatas), dtype=np.int32)
+        labels = np.empty(len(metadatas), dtype=np.int32)
+        for i, metadata in enumerate(metadatas):
+            base, pages[i], labels[i] = _split_page(metadata)
+            key = json.dumps(base)
+            index = self._metadata_index.get(key)
+            if index is None:
+                f.write(key.encode("utf-8") + b"\n")
+                index = self._metadata_index[key] = len(self._metadata)
+                self._metadata.append(json.loads(key))
+            indices[i] = index
+        return indices, pages, labels
+
+    def _write_texts(self, texts: List[bytes], f, tail: Optional[bytes]) -> Tuple[np.ndarray, Optional[bytes]]:
+        """
+        Append texts to the open ``texts.bin`` handle ``f``, sharing overlaps
+        with the text written just before each.
+
+        Returns:
+            Tuple[np.ndarray, Optional[bytes]]: The start offset of each text and the last text
+        """
+        starts = np.empty(len(texts), dtype=np.int64)
+        end = f.tell()
+        for i, data in enumerate(texts):
+            shared = _shared_prefix(tail, data) if tail else 0
+            starts[i] = end - shared
+            f.write(data[shared:])
+            end += len(data) - shared
+            tail = data
+        return starts, tail
+
+    @staticmethod
+    def _write_ids(ids: List[bytes], f) -> np.ndarray:
+        starts = np.empty(len(ids), dtype=np.int64)
+        end = f.tell()
+        for i, data in enumerate(ids):
+            starts[i] = end
+            f.write(data)
+            end += len(data)
+        return starts
+
+    def _encode_rows(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        texts_file,
+        ids_file,
+        metadata_file,
+        tail: Optional[bytes]
+    ) -> Tuple[np.ndarray, Optional[bytes]]:
+        """Write the texts, ids and new metadata of a batch of chunks and return their rows."""
+        encoded_texts = [text.encode("utf-8") for text in texts]
+        encoded_ids = [chunk_id.encode("utf-8") for chunk_id in ids]
+        rows = np.empty(len(texts), dtype=ROW_DTYPE)
+        rows["text_start"], tail = self._write_texts(encoded_texts, texts_file, tail)
+        rows["text_length"] = [len(data) for data in encoded_texts]
+        rows["id_start"] = self._write_ids(encoded_ids, ids_file)
+        rows["id_length"] = [len(data) for data in encoded_ids]
+        rows["metadata"], rows["page"], rows["page_label"] = self._intern(metadatas, metadata_file)
+        return rows, tail
+
+    def _migrate_legacy(self) -> None:
+        """
+        Convert a version 1 store, which kept one JSON record per chunk, in place.
+
+        Row numbers, vectors and tombstones are unchanged. The new files are
+        written under temporary names, and ``meta.json`` is rewritten only
+        after they are in place, so an interrupted migration is redone.
+        """
+        started = time.perf_counter()
+        offsets = np.fromfile(self._file("offsets.i64"), dtype=np.int64).reshape(-1, 2)
+        if os.path.exists(self._file("metadata.jsonl")):
+            os.remove(self._file("metadata.jsonl"))
+        self._load_metadata()
+        tail = None
+        with open(self._file("records.jsonl"), "rb") as records, \
+                open(self._file("texts.bin.migrate"), "wb") as texts_file, \
+                open(self._file("ids.bin.migrate"), "wb") as ids_file, \
+                open(self._file("rows.bin.migrate"), "wb") as rows_file, \
+                open(self._file("metadata.jsonl"), "ab") as metadata_file:
+            for block in range(0, len(offsets), 4096):
+                block_offsets = offsets[block:block + 4096]
+                low = int(block_offsets[:, 0].min())
+                data = _pread(records, int((block_offsets[:, 0] + block_offsets[:, 1]).max()) - low, low)
+                records_block = [
+                    json.loads(data[start - low:start - low + length])
+                    for start, length in block_offsets.tolist()
+                ]
+                rows, tail = self._encode_rows(
+                    [record["id"] for record in records_block],
+                    [record["text"] for record in records_block],
+                    [record["metadata"] for record in records_block],
+                    texts_file, ids_file, metadata_file, tail
+                )
+                rows_file.write(rows.tobytes())
+        for name in ("texts.bin", "ids.bin", "rows.bin"):
+            os.replace(self._file(name + ".migrate"), self._file(name))
+        self._write_meta()
+        logger.info(
+            f"Migrated vector store at {self.path} with {len(offsets)} chunks to format "
+            f"version {self.FORMAT_VERSION} in {time.perf_counter() - started:.1f}s"
+        )
+
+    def _open(self) -> None:
+        """(Re)map the store files without reading them."""
+        rows_path = self._file("rows.bin")
+        tombstones_path = self._file("tombstones.i64")
+        self._file_sizes = tuple(
+            os.path.getsize(path) if os.path.exists(path) else 0 for path in (rows_path, tombstones_path)
+        )
+        count = self._file_sizes[0] // ROW_DTYPE.itemsize
+        if count == 0 or self.dim is None:
+            self._readers = {}
+            self._view = _StoreView(
+                vectors=np.empty((0, self.dim or 0), dtype=np.float32),
+                rows=np.empty(0, dtype=ROW_DTYPE),
+                deleted=None,
+                texts=None,
+                ids=None,
+                metadata=self._metadata
+            )
+            return
+        deleted = None
+        if self._file_sizes[1]:
+            deleted = np.zeros(count, dtype=bool)
+            deleted[np.fromfile(tombstones_path, dtype=np.int64)] = True
+        # Views keep the handles they were created with, so a compaction
+        # swapping the files underneath them never mixes old rows with new texts
+        self._view = _StoreView(
+            vectors=np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(count, self.dim)),
+            rows=np.memmap(rows_path, dtype=ROW_DTYPE, mode="r", shape=(count,)),
+            deleted=deleted,
+            texts=self._reader("texts.bin"),
+            ids=self._reader("ids.bin"),
+            metadata=self._metadata
+        )
+
+    def _reader(self, name: str) -> _ReadHandle:
+        """The handle on a store file, reopened only once the file has been replaced."""
+        handle = self._readers.get(name)
+        # The open handle keeps the old file's inode in use, so a replacement
+        # always has a different one
+        if handle is None or handle.inode != os.stat(self._file(name)).st_ino:
+            handle = self._readers[name] = _ReadHandle(self._file(name))
+        return handle
+
+    def __len__(self) -> int:
+        """Number of rows, including deleted ones."""
+        return self._view.rows.shape[0]
+
+    @property
+    def live_count(self) -> int:
+        """Number of chunks that have not been deleted."""
+        view = self._view
+        return len(view.rows) - (int(view.deleted.sum()) if view.deleted is not None else 0)
+
+    @property
+    def deleted_count(self) -> int:
+        return len(self) - self.live_count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The (count, dim) matrix of L2-normalised embeddings."""
+        return self._view.vectors
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Embed and append texts to the store."""
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        """Embed and append documents to the store."""
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+            ids=kwargs.get("ids"),
+        )
+
+    def append_documents(self, documents: List[Document]) -> Tuple[int, int]:
+        """
+        Embed and append documents to the store.
+
+        Args:
+            documents (List[Document]): Chunks to add
+
+        Returns:
+            Tuple[int, int]: The ``[start, end)`` range of rows they occupy
+        """
+        texts = [doc.page_content for doc in documents]
+        vectors = self.embedding.embed_documents(texts)
+        return self._append(texts, vectors, [doc.metadata for doc in documents], None)[1]
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Append pre-computed embeddings to the store.
+
+        Args:
+            texts (List[str]): Chunk texts
+            embeddings (List[List[float]]): One embedding per text
+            metadatas (Optional[List[dict]]): One metadata dict per text
+            ids (Optional[List[str]]): Chunk ids; generated when omitted
+
+        Returns:
+            List[str]: The ids of the added chunks
+        """
+        return self._append(texts, embeddings, metadatas, ids)[0]
+
+    def _append(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]],
+        ids: Optional[List[str]]
+    ) -> Tuple[List[str], Tuple[int, int]]:
+        if not texts:
+            return [], (len(self), len(self))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+
+        self._check_writable()
+        with self._lock, self._file_lock(exclusive=True):
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._write_meta()
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Expected embeddings of dimension {self.dim}, got {matrix.shape[1]}")
+
+            start = len(self)
+            with open(self._file("texts.bin"), "ab") as texts_file, \
+                    open(self._file("ids.bin"), "ab") as ids_file, \
+                    open(self._file("metadata.jsonl"), "ab") as metadata_file:
+                # Share the overlap with the previous chunk only while its text
+                # is still the last thing in texts.bin
+                tail = None
+                if self._tail is not None and self._tail[1] == texts_file.tell():
+                    tail = self._tail[0]
+                elif start:
+                    row = self._view.rows[start - 1]
+                    if int(row["text_start"] + row["text_length"]) == texts_file.tell():
+                        tail = _pread(self._view.texts, int(row["text_length"]), int(row["text_start"]))
+                rows, tail = self._encode_rows(ids, texts, metadatas, texts_file, ids_file, metadata_file, tail)
+                self._tail = (tail, texts_file.tell())
+            # Drop any rows left behind by an interrupted append before writing;
+            # a partly written row would shift every row appended after it
+            vectors_path = self._file("vectors.f32")
+            rows_path = self._file("rows.bin")
+            if os.path.exists(vectors_path):
+                os.truncate(vectors_path, start * self.dim * 4)
+            if os.path.exists(rows_path):
+                os.truncate(rows_path, start * ROW_DTYPE.itemsize)
+            with open(vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(rows_path, "ab") as f:
+                f.write(rows.tobytes())
+            self._open()
+            # Under the lock, so secondary indexes see appends in row order
+            if self.on_append is not None:
+                self.on_append(start, texts, ids)
+        self.search_engine.update(self.vectors)
+
+        return ids, (start, start + len(texts))
+
+    def delete_rows(self, ranges: Iterable[Tuple[int, int]]) -> int:
+        """
+        Delete the chunks in the given ``[start, end)`` row ranges.
+
+        Rows are tombstoned rather than removed, so this costs time proportional
+        to the number of deleted rows, not the size of the store.
+
+        Returns:
+            int: Number of rows newly deleted
+        """
+        self._check_writable()
+        with self._lock, self._file_lock(exclusive=True):
+            view = self._view
+            rows = np.concatenate(
+                [np.arange(start, end, dtype=np.int64) for start, end in ranges] or [np.empty(0, dtype=np.int64)]
+            )
+            rows = rows[(rows >= 0) & (rows < len(view.rows))]
+            if view.deleted is not None:
+                rows = rows[~view.deleted[rows]]
+            rows = np.unique(rows)
+            if len(rows) == 0:
+                return 0
+            with open(self._file("tombstones.i64"), "ab") as f:
+                f.write(rows.tobytes())
+            self._open()
+        logger.info(f"Deleted {len(rows)} chunks from vector store at {self.path}")
+        return len(rows)
+
+    def compact(self) -> Optional[np.ndarray]:
+        """
+        Rewrite the store without deleted rows.
+
+        The compacted files are written next to the live ones and swapped in
+        behind a ``compact.ready`` marker, so an interrupted compaction is
+        either rolled forward or discarded the next time the store is opened.
+
+        Returns:
+            Optional[np.ndarray]: For every old row its new index, or -1 if it
+            was deleted; None when there was nothing to compact
+        """
+        self._check_writable()
+        with self._lock, self._file_lock(exclusive=True):
+            view = self._view
+            if view.deleted is None or not view.deleted.any():
+                return None
+            keep = np.flatnonzero(~view.deleted)
+            remap = np.full(len(view.rows), -1, dtype=np.int64)
+            remap[keep] = np.arange(len(keep), dtype=np.int64)
+
+            # Metadata indices stay valid, so only texts and ids are rewritten
+            rows = np.array(view.rows[keep])
+            tail = None
+            with open(self._file("texts.bin.compact"), "wb") as texts_file, \
+                    open(self._file("ids.bin.compact"), "wb") as ids_file:
+                for block in range(0, len(keep), 4096):
+                    block_rows = rows[block:block + 4096]
+                    texts = [
+                        _pread(view.texts, length, start)
+                        for start, length in zip(block_rows["text_start"].tolist(), block_rows["text_length"].tolist())
+                    ]
+                    ids = [
+                        _pread(view.ids, length, start)
+                        for start, length in zip(block_rows["id_start"].tolist(), block_rows["id_length"].tolist())
+                    ]
+                    block_rows["text_start"], tail = self._write_texts(texts, texts_file, tail)
+                    block_rows["id_start"] = self._write_ids(ids, ids_file)
+                    rows[block:block + 4096] = block_rows
+            with open(self._file("rows.bin.compact"), "wb") as f:
+                f.write(rows.tobytes())
+            with open(self._file("vectors.f32.compact"), "wb") as f:
+                for block in range(0, len(keep), 65536):
+                    f.write(np.ascontiguousarray(view.vectors[keep[block:block + 65536]]).tobytes())
+            with open(self._file("compact.ready"), "w"):
+                pass
+            self._finish_compaction()
+            self._bump_generation()
+            self._tail = None
+            self._open()
+        self.search_engine.reset()
+        self.search_engine.update(self.vectors)
+        logger.info(f"Compacted vector store at {self.path}: {len(remap)} -> {len(keep)} rows")
+        return remap
+
+    def _finish_compaction(self) -> None:
+        for name in STORE_FILES + LEGACY_FILES:
+            if os.path.exists(self._file(name + ".compact")):
+                os.replace(self._file(name + ".compact"), self._file(name))
+        for name in ("tombstones.i64", "compact.ready"):
+            if os.path.exists(self._file(name)):
+                os.remove(self._file(name))
+
+    def get_text(self, index: int, view: Optional[_StoreView] = None) -> str:
+        """Read the text of the chunk stored at row ``index``."""
+        view = view or self._view
+        row = view.rows[index]
+        return _pread(view.texts, int(row["text_length"]), int(row["text_start"])).decode("utf-8")
+
+    def get_texts(self, start: int, end: int, view: Optional[_StoreView] = None) -> List[str]:
+        """Read the texts of rows ``start`` to ``end - 1`` with a single read."""
+        view = view or self._view
+        rows = view.rows[start:end]
+        if len(rows) == 0:
+            return []
+        starts = rows["text_start"].tolist()
+        lengths = rows["text_length"].tolist()
+        low = min(starts)
+        data = _pread(view.texts, max(s + n for s, n in zip(starts, lengths)) - low, low)
+        return [data[s - low:s - low + n].decode("utf-8") for s, n in zip(starts, lengths)]
+
+    def get_id(self, index: int, view: Optional[_StoreView] = None) -> str:
+        """Read the id of the chunk stored at row ``index``."""
+        view = view or self._view
+        row = view.rows[index]
+        return _pread(view.ids, int(row["id_length"]), int(row["id_start"])).decode("utf-8")
+
+    def get_metadata(self, index: int, view: Optional[_StoreView] = None) -> dict:
+        """Rebuild the metadata of the chunk stored at row ``index`` as a new dict."""
+        view = view or self._view
+        row = view.rows[index]
+        metadata = dict(view.metadata[int(row["metadata"])])
+        page = int(row["page"])
+        if page != NO_PAGE:
+            metadata["page"] = page
+            if row["page_label"] == LABEL_FROM_PAGE:
+                metadata["page_label"] = str(page + 1)
+        return metadata
+
+    def get_document(self, index: int, view: Optional[_StoreView] = None) -> Document:
+        """Materialise the chunk stored at row ``index``."""
+        view = view or self._view
+        return Document(
+            id=self.get_id(index, view),
+            page_content=self.get_text(index, view),
+            metadata=self.get_metadata(index, view)
+        )
+
+    def snapshot(self) -> _StoreView:
+        """The current view of the store; rows read through it stay consistent across compactions."""
+        return self._view
+
+    def search_rows(
+        self, embedding: List[float], k: int = 4, view: Optional[_StoreView] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the rows and cosine similarities of the ``k`` chunks closest to ``embedding``."""
+        view = view or self._view
+        if len(view.vectors) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        return self.search_engine.search(view.vectors, query, k, deleted=view.deleted)
+
+    def search_rows_many(
+        self, embeddings: List[List[float]], k: int = 4, view: Optional[_StoreView] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Like :meth:`search_rows` for a batch of embeddings, scored together against the store."""
+        view = view or self._view
+        if len(view.vectors) == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in embeddings]
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        return self.search_engine.search_many(view.vectors, queries, k, deleted=view.deleted)
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4
+    ) -> List[Tuple[Document, float]]:
+        """Return the ``k`` chunks with the highest cosine similarity to ``embedding``."""
+        view = self._view
+        indices, scores = self.search_rows(embedding, k, view)
+        return [(self.get_document(int(i), view), float(score)) for i, score in zip(indices, scores)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Embed the query asynchronously, then search off the event loop for large corpora."""
+        embedding = await self.embedding.aembed_query(query)
+        if len(self) < 10000:
+            return self.similarity_search_with_score_by_vector(embedding, k)
+        return await asyncio.to_thread(self.similarity_search_with_score_by_vector, embedding, k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    def clear(self) -> None:
+        """Delete every chunk in the store."""
+        self._check_writable()
+        with self._lock, self._file_lock(exclusive=True):
+            for name in STORE_FILES + LEGACY_FILES + ("metadata.jsonl", "tombstones.i64", "compact.ready", "meta.json"):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._bump_generation()
+            self.dim = None
+            self._load_metadata()
+            self._tail = None
+            self._open()
+            self.search_engine.reset()
+        logger.info(f"Cleared vector store at {self.path}")
+
+    def refresh(self) -> Optional[str]:
+        """
+        Re-map the store if another process changed it since it was last mapped.
+
+        Only read-only stores need this; a writer always sees its own changes.
+
+        Returns:
+            Optional[str]: "rewritten" when row numbers changed (the store was
+            compacted, cleared or migrated), "changed" when rows were appended
+            or deleted, or None when nothing changed
+        """
+        with self._lock, self._file_lock(exclusive=False):
+            generation = self._read_generation()
+            sizes = tuple(
+                os.path.getsize(path) if os.path.exists(path) else 0
+                for path in (self._file("rows.bin"), self._file("tombstones.i64"))
+            )
+            if generation == self._generation and sizes == self._file_sizes:
+                return None
+            rewritten = generation != self._generation
+            if rewritten:
+                self.dim = None
+            self._generation = generation
+            self._read_meta()
+            self._load_metadata()
+            self._open()
+        if rewritten:
+            self.search_engine.reset()
+        self.search_engine.update(self.vectors)
+        return "rewritten" if rewritten else "changed"
+
+    def promote(self) -> None:
+        """
+        Start writing to a store opened read-only, after the process that wrote
+        to it has gone. Work it left unfinished is recovered first.
+        """
+        with self._lock, self._file_lock(exclusive=True):
+            self.read_only = False
+            self.dim = None
+            self._recover(self._read_meta())
+            self._generation = self._read_generation()
+            self._tail = None
+            self._open()
+        self.search_engine.reset()
+        self.search_engine.update(self.vectors)
+        logger.info(f"Vector store at {self.path} is now writable with {len(self)} chunks")
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        path: Optional[str] = None,
+        **kwargs: Any
+    ) -> "MmapVectorStore":
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas=metadatas)
+        return store
@@ -0,0 +1,321 @@
+from typing_extensions import Any, Callable, Dict, Iterable, List, Optional
+
+import fcntl
+import json
+import logging
+import os
+import time
+
+from ingestion import IngestionJob, QueueFullError
+
+logger = logging.getLogger(__name__)
+
+
+class WriterLease:
+    """
+    An exclusive lock file naming the one worker process allowed to write to
+    the shared index.
+
+    The lock is taken without blocking and held until the process exits, when
+    the operating system releases it, so another worker retrying
+    :meth:`acquire` takes over from a writer that crashed.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Lock file shared by every worker
+        """
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        """
+        Take the lease if no other process holds it.
+
+        Returns:
+            bool: Whether this process holds the lease
+        """
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        f.truncate(0)
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        logger.info(f"Worker {os.getpid()} holds the writer lease")
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class WorkerCoordinator:
+    """
+    Coordinates the worker processes of a multi-worker deployment through a
+    directory next to the index.
+
+    Every worker answers queries from the shared, memory-mapped index, but
+    only the holder of the :class:`WriterLease` changes it. The others write
+    their ingest, delete and reset requests to ``inbox/``, which the writer
+    drains in order; job statuses are published to ``jobs/`` so that any
+    worker can answer a status lookup. Requests the writer has started but
+    not finished wait in ``claimed/``, from where a worker taking over the
+    lease puts them back (see :meth:`recover`). Files are written under a
+    temporary name and renamed, so a reader never sees one half-written.
+
+    Directory layout:
+        writer.lock   -- the writer lease
+        inbox/        -- one JSON file per pending request, oldest first
+        claimed/      -- requests the writer is still running
+        jobs/         -- the latest status of every job, by job id
+        sessions/     -- chat sessions; see ``SharedSessionStore``
+        startup.json  -- ids of the writer's startup re-index jobs
+    """
+
+    def __init__(self, path: str, max_pending: int = 8, job_ttl_seconds: float = 3600):
+        """
+        Create (or join) the coordination directory.
+
+        Args:
+            path (str): Directory shared by every worker
+            max_pending (int): Number of requests allowed to wait in the inbox
+            job_ttl_seconds (float): How long finished job statuses are kept
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.job_ttl_seconds = job_ttl_seconds
+        self.inbox_dir = os.path.join(path, "inbox")
+        self.claimed_dir = os.path.join(path, "claimed")
+        self.jobs_dir = os.path.join(path, "jobs")
+        self.sessions_dir = os.path.join(path, "sessions")
+        os.makedirs(self.inbox_dir, exist_ok=True)
+        os.makedirs(self.claimed_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.lease = WriterLease(os.path.join(path, "writer.lock"))
+        # Last status published for each job, to skip rewriting unchanged ones
+        self._published: Dict[str, Dict[str, Any]] = {}
+        # Job id -> claimed request file, for the requests this writer is running
+        self._claimed: Dict[str, str] = {}
+
+    @property
+    def role(self) -> str:
+        return "writer" if self.lease.held else "reader"
+
+    def acquire_writer(self) -> bool:
+        """Try to become the writer; see :meth:`WriterLease.acquire`."""
+        return self.lease.acquire()
+
+    def _write_json(self, path: str, data: Any) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _create_json(self, path: str, data: Any) -> bool:
+        """Write ``path`` unless it already exists; returns whether it was written."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        try:
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _pending(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.inbox_dir) if name.endswith(".json"))
+
+    def pending_count(self) -> int:
+        """Number of requests waiting for the writer."""
+        return len(self._pending())
+
+    def submit(self, kind: str, filename: str, **payload: Any) -> str:
+        """
+        Hand a request to the writer.
+
+        Args:
+            kind (str): "ingest", "delete" or "reset"
+            filename (str): Name the job is reported under
+            **payload: Arguments of the request
+
+        Returns:
+            str: Id of the job tracking the request
+
+        Raises:
+            QueueFullError: If ``max_pending`` requests are already waiting
+        """
+        if self.pending_count() >= self.max_pending:
+            raise QueueFullError("Ingestion queue is full, please retry later")
+        job = IngestionJob(filename)
+        request = {"kind": kind, "job_id": job.id, "filename": filename, "created_at": job.created_at, **payload}
+        self._write_json(os.path.join(self.inbox_dir, f"{time.time_ns():020d}-{job.id}.json"), request)
+        # The request is written first, so a queued job always has one to run;
+        # the writer may already have published a newer status
+        status = job.to_dict()
+        if self._create_json(os.path.join(self.jobs_dir, f"{job.id}.json"), status):
+            self._published[job.id] = status
+        return job.id
+
+    def drain(self, handle: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> int:
+        """
+        Run the pending requests in order; called by the writer.
+
+        ``handle`` either finishes a request and returns its result, published
+        with the job as completed, or returns None after queueing the work,
+        whose job then reports its own status; such a request is kept in
+        ``claimed/`` until its job finishes. A request that raises
+        :class:`QueueFullError` stays in the inbox and is retried on the next
+        call; any other error fails its job.
+
+        Returns:
+            int: Number of requests taken out of the inbox
+        """
+        drained = 0
+        for name in self._pending():
+            path = os.path.join(self.inbox_dir, name)
+            with open(path) as f:
+                request = json.load(f)
+            job = IngestionJob(request["filename"], request["job_id"])
+            job.created_at = request["created_at"]
+            job.started_at = time.time()
+            try:
+                result = handle(request)
+            except QueueFullError:
+                break
+            except Exception as e:
+                logger.error(f"Worker request {request['kind']} {job.id} failed: {e}")
+                job.status, job.error = IngestionJob.FAILED, str(e)
+                job.finished_at = time.time()
+                self.publish([job.to_dict()])
+            else:
+                if result is None:
+                    claimed_path = os.path.join(self.claimed_dir, name)
+                    os.replace(path, claimed_path)
+                    self._claimed[job.id] = claimed_path
+                    drained += 1
+                    continue
+                job.status = IngestionJob.COMPLETED
+                job.finished_at = time.time()
+                self.publish([{**job.to_dict(), "result": result}])
+            os.remove(path)
+            drained += 1
+        return drained
+
+    def recover(self, active: Callable[[], Iterable[str]]) -> List[str]:
+        """
+        Clean up after a writer that exited mid-work; called by a worker that
+        has just taken the writer lease.
+
+        Requests the previous writer had started but not finished are moved
+        back to the inbox to run again. Any other job still reported as queued
+        or running, with no request in the inbox and not run by this worker,
+        can no longer finish and is marked failed.
+
+        Args:
+            active (Callable[[], Iterable[str]]): Returns the ids of the jobs this
+                worker runs itself; called after the statuses are read, so a
+                job it starts meanwhile is never taken for a lost one
+
+        Returns:
+            List[str]: Ids of the jobs marked failed
+        """
+        for name in sorted(os.listdir(self.claimed_dir)):
+            if name.endswith(".json"):
+                os.replace(os.path.join(self.claimed_dir, name), os.path.join(self.inbox_dir, name))
+                logger.info(f"Requeued request {name} left unfinished by the previous writer")
+
+        unfinished = [
+            job for job in (self.job(name[:-len(".json")]) for name in os.listdir(self.jobs_dir) if name.endswith(".json"))
+            if job is not None and job["status"] in (IngestionJob.QUEUED, IngestionJob.RUNNING)
+        ]
+        waiting = {name[:-len(".json")].split("-", 1)[1] for name in self._pending()}
+        running = set(active())
+        failed = []
+        for job in unfinished:
+            if job["job_id"] in waiting or job["job_id"] in running:
+                continue
+            logger.warning(f"Job {job['job_id']} ({job['filename']}) was lost with the previous writer")
+            self.publish([{
+                **job,
+                "status": IngestionJob.FAILED,
+                "error": "The worker running this job exited before it finished",
+                "finished_at": time.time(),
+            }])
+            failed.append(job["job_id"])
+        return failed
+
+    def publish(self, jobs: Iterable[Dict[str, Any]]) -> None:
+        """Publish the status of jobs whose status changed since last published."""
+        for job in jobs:
+            if self._published.get(job["job_id"]) == job:
+                continue
+            self._write_json(os.path.join(self.jobs_dir, f"{job['job_id']}.json"), job)
+            self._published[job["job_id"]] = job
+            if job["status"] in (IngestionJob.COMPLETED, IngestionJob.FAILED) and job["job_id"] in self._claimed:
+                try:
+                    os.remove(self._claimed.pop(job["job_id"]))
+                except FileNotFoundError:
+                    pass
+
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look up the last published status of a job."""
+        if not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_dir, f"{job_id}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def publish_startup(self, job_ids: List[str]) -> None:
+        """Record the writer's startup re-index jobs, so every worker can report readiness."""
+        self._write_json(os.path.join(self.path, "startup.json"), job_ids)
+
+    def startup_jobs(self) -> List[Dict[str, Any]]:
+        """Statuses of the writer's startup re-index jobs."""
+        try:
+            with open(os.path.join(self.path, "startup.json")) as f:
+                job_ids = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+        return [job for job in map(self.job, job_ids) if job is not None]
+
+    def prune(self) -> None:
+        """
+        Forget job statuses that finished more than ``job_ttl_seconds`` ago.
+
+        Queued and running jobs are kept however old they are, so a job
+        waiting behind a long queue never loses its status.
+        """
+        cutoff = time.time() - self.job_ttl_seconds
+        for name in os.listdir(self.jobs_dir):
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                # Left-over temporary files have no job and go too
+                job = self.job(name[:-len(".json")]) if name.endswith(".json") else None
+                if job is not None and job["status"] not in (IngestionJob.COMPLETED, IngestionJob.FAILED):
+                    continue
+                os.remove(path)
+                self._published.pop(name[:-len(".json")], None)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "role": self.role, "pending_requests": self.pending_count()}